@@ -12,15 +12,21 @@ CombatantListDataTable: Invoked to retrieve a list of combatant data formatted
 """
 
 # standard library imports
+import hashlib
 
 # third-party imports
-from flask import request, jsonify, current_app
+from flask import request, current_app
 from flask_restful import Resource, fields
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 
 # application imports
 from emol.decorators import login_required
-from emol.models import Combatant
+from emol.models import Combatant, CombatantListEntry
+from emol.utility.database import LIKE_ESCAPE, like_pattern
+from emol.utility.datatables import DataTablesRequest
 from emol.utility.date import string_to_date
+from emol.utility.hash import BlindIndex
 
 @current_app.api.route('/api/combatant/<string:uuid>')
 class CombatantApi(Resource):
@@ -191,6 +197,14 @@ class CombatantListDataTable(Resource):
 
     """
 
+    # DataTables column => column to sort on
+    sort_columns = {
+        'sca_name': CombatantListEntry.sca_name,
+        'legal_name': CombatantListEntry.legal_name_order,
+        'card_id': CombatantListEntry.card_id,
+        'accepted_privacy_policy': CombatantListEntry.accepted_privacy_policy
+    }
+
     @classmethod
     @login_required
     def get(cls):
@@ -203,20 +217,90 @@ class CombatantListDataTable(Resource):
             Privacy policy accepted (boolean)
             Combatant UUID
 
+        Implements DataTables server-side processing, so only the requested
+        page is read and decrypted. The search value matches SCA name and card
+        ID by substring, and legal name by exact (blind index) match.
+
+        Everything is read from CombatantListEntry. Combatants with no entry,
+        such as those saved before the table was added, get theirs first.
+
+        The response carries an ETag built from the list's collection version
+        and the request parameters. A matching If-None-Match is answered with
+        304 before anything is queried or decrypted.
+
         Returns:
             The list, JSON encoded
 
         """
-        combatants = {'data': [
+        if CombatantListEntry.incomplete():
+            try:
+                CombatantListEntry.fill()
+            except IntegrityError:
+                # Another request filled them first
+                current_app.db.session.rollback()
+
+        etag = hashlib.sha1('{0}?{1}'.format(
+            CombatantListEntry.collection_version(),
+            request.query_string.decode('utf-8', 'replace')
+        ).encode('utf-8')).hexdigest()
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = cls.datatable(DataTablesRequest(request.args))
+
+        response.set_etag(etag)
+        # Browsers must check back every time, the list is not public
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    @classmethod
+    def datatable(cls, params):
+        """Build the DataTables response.
+
+        Args:
+            params: The DataTablesRequest
+
+        Returns:
+            A JSON response
+
+        """
+        query = CombatantListEntry.query
+        total = query.count()
+
+        if params.search:
+            like = like_pattern(params.search)
+            query = query.filter(or_(
+                CombatantListEntry.sca_name.ilike(like, escape=LIKE_ESCAPE),
+                CombatantListEntry.card_id.ilike(like, escape=LIKE_ESCAPE),
+                CombatantListEntry.legal_name_index ==
+                BlindIndex.generate(params.search)
+            ))
+            filtered = query.count()
+        else:
+            filtered = total
+
+        for column, descending in params.order:
+            sort = cls.sort_columns.get(column)
+            if sort is not None:
+                query = query.order_by(sort.desc() if descending else sort)
+
+        # Stable paging
+        query = query.order_by(CombatantListEntry.id)
+
+        entries = params.page(query).all()
+        legal_names = CombatantListEntry.decrypt_names(entries)
+
+        return params.response([
             dict(
-                legal_name=c.decrypted.get('legal_name'),
-                sca_name=c.sca_name,
-                card_id=c.card_id,
-                accepted_privacy_policy=c.accepted_privacy_policy,
-                uuid=c.uuid
-            ) for c in Combatant.query.all()
-        ]}
-        return jsonify(combatants)
+                legal_name=legal_name,
+                sca_name=e.sca_name,
+                card_id=e.card_id,
+                accepted_privacy_policy=e.accepted_privacy_policy,
+                uuid=e.uuid
+            ) for e, legal_name in zip(entries, legal_names)
+        ], total, filtered)
 
 
 @current_app.api.route('/api/test-login/<string:user>')
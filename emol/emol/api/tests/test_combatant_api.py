@@ -56,3 +56,45 @@ def test_create_authorized(app, privileged_user, login_client, combatant_data, )
     response = login_client.delete('/api/combatant/{0}'.format(uuid))
     assert response.status_code == 200
 
+
+def test_list_datatable_server_side(combatant, admin_user, login_client):
+    """The combatant list pages, sorts and searches server side."""
+    response = login_client.get(
+        '/api/combatant-list-datatable?draw=3&start=0&length=10'
+        '&columns[2][data]=legal_name&order[0][column]=2&order[0][dir]=asc'
+        '&search[value]=fred mcfred'
+    )
+    assert response.status_code == 200
+    assert response.json['draw'] == 3
+    assert response.json['recordsFiltered'] >= 1
+    assert combatant.uuid in [row['uuid'] for row in response.json['data']]
+
+    response = login_client.get(
+        '/api/combatant-list-datatable?draw=4&start=0&length=10'
+        '&search[value]=nobody by that name'
+    )
+    assert response.json['recordsFiltered'] == 0
+    assert response.json['data'] == []
+
+
+def test_list_datatable_etag(app, combatant, admin_user, login_client):
+    """An unchanged combatant list is answered with 304."""
+    url = '/api/combatant-list-datatable?start=0&length=10'
+    response = login_client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = login_client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    response = login_client.get(
+        url + '&search[value]=x', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+    combatant.sca_name = 'Someone Else'
+    combatant.list_entry.sca_name = combatant.sca_name
+    app.db.session.commit()
+
+    response = login_client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
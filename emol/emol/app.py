@@ -12,7 +12,9 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
-from .commands import setup, import_combatants
+from .commands import (backfill_blind_index, benchmark, export_cards, setup,
+                       import_combatants, migrate_encryption_layout,
+                       send_mail)
 
 
 def create_app(test_config=None):
@@ -47,6 +49,11 @@ def create_app(test_config=None):
     # Add custom Flask commands
     app.cli.add_command(setup)
     app.cli.add_command(import_combatants)
+    app.cli.add_command(backfill_blind_index)
+    app.cli.add_command(benchmark)
+    app.cli.add_command(migrate_encryption_layout)
+    app.cli.add_command(export_cards)
+    app.cli.add_command(send_mail)
 
     # Make sure security headers are set on all responses.
     # This should definitely be in some security module or something.
@@ -82,14 +89,18 @@ def create_app(test_config=None):
         init_blueprints()
 
         from .initialize.authentication import init_authentication
+        from .initialize.cache import init_caches
         from .initialize.cron import init_cron
         from .initialize.errors import init_error_handlers
         from .initialize.encryption import init_encryption
         from .initialize.jinja import init_jinja
+        from .initialize.mail import init_mail
 
         init_authentication()
         init_encryption()
+        init_caches()
         init_jinja()
+        init_mail()
         init_cron()
         init_error_handlers()
 
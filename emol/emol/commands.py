@@ -5,7 +5,8 @@
 import os
 from csv import DictReader
 
-from click import argument, command, File
+from click import (argument, command, echo, group, option, Choice, File,
+                   Path)
 from flask import current_app
 from flask.cli import with_appcontext
 from yaml import safe_load
@@ -54,3 +55,332 @@ def import_combatants(combatant_file):
             csv = DictReader(combatant_file)
             for row in csv:
                 Combatant.create(row)
+
+
+@command()
+@option('--chunk-size', type=int, default=500,
+        help='Number of combatants to process per transaction')
+@with_appcontext
+def backfill_blind_index(chunk_size):
+    """Compute blind indexes, name order and list entries for combatants."""
+    from emol.models import Combatant, CombatantListEntry
+    from emol.utility.database import chunked
+
+    count = 0
+    for combatants in chunked(Combatant.query, Combatant.id, chunk_size):
+        for combatant in Combatant.decrypt_many(combatants):
+            combatant.update_blind_indexes()
+
+        current_app.db.session.commit()
+        current_app.db.session.expunge_all()
+
+        count += len(combatants)
+        current_app.logger.info('Blind indexes updated for {0}'.format(count))
+
+    Combatant.rebuild_name_order(chunk_size)
+    CombatantListEntry.rebuild(chunk_size)
+
+    echo('Updated blind indexes for {0} combatants'.format(count))
+
+
+@command()
+@option('--chunk-size', type=int, default=500,
+        help='Number of combatants to process per transaction')
+@with_appcontext
+def migrate_encryption_layout(chunk_size):
+    """Rewrite combatant personal information in the configured layout."""
+    from emol.models import Combatant
+    from emol.utility.database import chunked
+
+    count = 0
+    for combatants in chunked(Combatant.query, Combatant.id, chunk_size):
+        for combatant in Combatant.decrypt_many(combatants):
+            combatant.write_encrypted(rewrite=True)
+
+        current_app.db.session.commit()
+        current_app.db.session.expunge_all()
+
+        count += len(combatants)
+        current_app.logger.info('Layout migrated for {0}'.format(count))
+
+    echo('Migrated encryption layout for {0} combatants'.format(count))
+
+
+@command()
+@argument('directory', type=Path(file_okay=False))
+@option('--format', 'file_format', type=Choice(['html', 'json']),
+        default='html', help='Write cards as HTML pages or JSON')
+@option('--processes', '-p', type=int, default=None,
+        help='Number of worker processes (default: one per CPU)')
+@option('--full', is_flag=True,
+        help='Render every card, not just those that changed')
+@with_appcontext
+def export_cards(directory, file_format, processes, full):
+    """Export every card into a static bundle in DIRECTORY."""
+    from emol.utility.card_export import export_cards as export
+
+    rendered, unchanged, removed = export(
+        directory,
+        file_format=file_format,
+        processes=processes,
+        full=full
+    )
+
+    echo('Exported cards to {0}: {1} rendered, {2} unchanged, {3} removed'
+         .format(directory, rendered, unchanged, removed))
+
+
+@command()
+@option('--once', is_flag=True,
+        help='Send what is due and exit instead of running until stopped')
+@option('--interval', type=float, default=5,
+        help='Seconds to wait when the outbox has nothing due')
+@option('--batch-size', type=int, default=100,
+        help='Number of messages claimed at a time')
+@with_appcontext
+def send_mail(once, interval, batch_size):
+    """Send email queued in the outbox (see MAIL_OUTBOX)."""
+    import time
+    from emol.models import OutboundMail
+
+    total_sent = 0
+    total_failed = 0
+    try:
+        while True:
+            sent, failed = OutboundMail.drain(batch_size)
+            total_sent += sent
+            total_failed += failed
+            if sent > 0 or failed > 0:
+                current_app.logger.info(
+                    'Outbox: {0} sent, {1} failed (since start: {2})'.format(
+                        sent, failed, current_app.mail_metrics))
+
+            if sent + failed < batch_size:
+                if once:
+                    break
+                current_app.db.session.remove()
+                time.sleep(interval)
+    finally:
+        current_app.mail_pool.close()
+
+    echo('Sent {0} emails, {1} failed, {2} retried'.format(
+        total_sent,
+        total_failed,
+        current_app.mail_metrics.snapshot()['retried']
+    ))
+
+
+@group()
+def benchmark():
+    """Measure performance of hot paths."""
+
+
+# A typical combatant's personal information
+BENCHMARK_RECORD = dict(
+    legal_name='Fred McFred',
+    phone='2125551212',
+    address1='123 Main Street',
+    address2='Apartment 12',
+    city='Anytown',
+    province='ON',
+    postal_code='A1A 1A1',
+    dob='1990-01-01',
+    member_number='123456',
+    member_expiry='2030-01-01'
+)
+
+
+@benchmark.command('cipher')
+@option('--backend', type=Choice(['kms', 'local', 'fake-kms']),
+        default='local', help='Cipher backend to measure')
+@option('--envelope/--no-envelope', default=True,
+        help='Use envelope encryption')
+@option('--latency', type=int, default=None,
+        help='Simulated KMS latency in ms (fake-kms only)')
+@option('--records', '-n', type=int, multiple=True,
+        help='Record counts to measure (default 1, 100, 10000)')
+@with_appcontext
+def benchmark_cipher(backend, envelope, latency, records):
+    """Measure encrypt/decrypt throughput and latency."""
+    from emol.utility.benchmark import (report_header, report_line,
+                                        time_each, time_once)
+    from emol.utility.encryption import AESCipher, make_backend
+
+    config = dict(current_app.config)
+    if latency is not None:
+        config['EMOL_FAKE_KMS_LATENCY'] = latency
+
+    echo('Backend {0}, envelope {1}'.format(
+        backend, 'on' if envelope else 'off'))
+    echo(report_header())
+
+    def cipher():
+        """A fresh cipher, so that each run starts with a cold key cache."""
+        secret = config.get('SECRET_KEY')
+        return AESCipher(
+            secret,
+            backend=make_backend(backend, config, secret),
+            envelope=envelope
+        )
+
+    for count in records or (1, 100, 10000):
+        data = [dict(BENCHMARK_RECORD, member_number=str(i))
+                for i in range(count)]
+
+        timings, ciphertexts = time_each(
+            'encrypt_json', cipher().encrypt_json, data)
+        echo(report_line(timings))
+
+        timings, _ = time_each(
+            'decrypt_json', cipher().decrypt_json, ciphertexts)
+        echo(report_line(timings))
+
+        batch_cipher = cipher()
+        timings, _ = time_once(
+            'decrypt_json_batch',
+            lambda: batch_cipher.decrypt_json_batch(ciphertexts),
+            count
+        )
+        echo(report_line(timings))
+
+
+@benchmark.command('payload')
+@option('--records', '-n', type=int, default=10000,
+        help='Number of records to measure')
+@with_appcontext
+def benchmark_payload(records):
+    """Compare JSON and compact payload size and (de)serialization time."""
+    import json
+    from emol.models import Combatant
+    from emol.utility.benchmark import report_header, report_line, time_each
+    from emol.utility.payload import pack_record, unpack_record
+
+    fields = Combatant._payload_formats[Combatant._payload_version][0]
+    data = [dict(BENCHMARK_RECORD, member_number=str(i))
+            for i in range(records)]
+
+    def dumps(record):
+        return json.dumps(record).encode('utf-8')
+
+    def pack(record):
+        return pack_record(record, fields)
+
+    def unpack(packed):
+        return unpack_record(packed, fields)
+
+    echo(report_header())
+    for name, serialize, deserialize in (('json', dumps, json.loads),
+                                         ('compact', pack, unpack)):
+        timings, serialized = time_each(name + ' dump', serialize, data)
+        echo(report_line(timings))
+
+        timings, _ = time_each(name + ' load', deserialize, serialized)
+        echo(report_line(timings))
+
+        echo('{0:>8} {1:<24} {2:>10.1f} bytes/record'.format(
+            records, name + ' size',
+            sum(len(s) for s in serialized) / float(len(serialized))))
+
+
+@benchmark.command('detail')
+@option('--renders', '-n', type=int, default=100,
+        help='Number of renders of each variant')
+@with_appcontext
+def benchmark_detail(renders):
+    """Compare combatant detail form render time by discipline source.
+
+    Renders combatant/combatant_detail.html with disciplines loaded from the
+    database, as it was before, and from the reference data registry. The
+    session is expired before each render, as for a fresh request.
+
+    """
+    from flask import render_template
+    from flask_login import login_user
+    from emol.models import Combatant, Discipline, User
+    from emol.utility.benchmark import report_header, report_line, time_each
+    from emol.utility.testing import QueryCounter
+
+    user = User.query.filter(User.system_admin == 1).first()
+    combatant = Combatant.query.first()
+    combatant_id = None if combatant is None else combatant.id
+
+    variants = [
+        ('detail orm', lambda: Discipline.query.all()),
+        ('detail registry', Discipline.template_list)
+    ]
+
+    with current_app.test_request_context():
+        login_user(user)
+
+        echo(report_header())
+        for name, disciplines in variants:
+            def render(_):
+                current_app.db.session.expire_all()
+                with QueryCounter(current_app.db.engine) as counter:
+                    render_template(
+                        'combatant/combatant_detail.html',
+                        combatant=(None if combatant_id is None
+                                   else Combatant.query.get(combatant_id)),
+                        user=user,
+                        disciplines=disciplines()
+                    )
+                return counter.count
+
+            # Warm up template compilation and the registry
+            render(None)
+            timings, counts = time_each(name, render, range(renders))
+            echo(report_line(timings))
+            echo('{0:>8} {1:<24} {2:>10.1f} queries/render'.format(
+                renders, name, sum(counts) / float(len(counts))))
+
+
+@benchmark.command('mail')
+@option('--messages', '-n', type=int, default=10000,
+        help='Number of messages to build')
+@with_appcontext
+def benchmark_mail(messages):
+    """Compare card reminder message build rates.
+
+    Builds reminder messages the way Emailer did before, formatting the raw
+    template and generating a MIMEMultipart, and with the compiled template
+    and MessageBuilder. Nothing is sent.
+
+    """
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.utils import formatdate, make_msgid
+    from uuid import uuid4
+    from emol.mail.email_templates import EMAIL_TEMPLATES
+    from emol.mail.template import TEMPLATES
+    from emol.utility.benchmark import report_header, report_line, time_each
+
+    builder = current_app.mail_builder
+    sender = builder.sender
+    values = dict(discipline='Rapier', expiry_days=30,
+                  expiry_date='Monday, December 7, 2026')
+    recipients = ['combatant{0}@example.com'.format(i)
+                  for i in range(messages)]
+
+    def multipart(recipient):
+        template = EMAIL_TEMPLATES.get('card_reminder')
+        message = MIMEMultipart()
+        message['Subject'] = template.get('subject')
+        message['From'] = sender
+        message['To'] = recipient
+        message['Message-ID'] = make_msgid(uuid4().hex)
+        message['Date'] = formatdate(localtime=True)
+        message.attach(
+            MIMEText(template.get('body').format(**values), 'plain'))
+        return message.as_string()
+
+    def compiled(recipient):
+        subject, body = TEMPLATES['card_reminder'].render(**values)
+        return builder.build(recipient, subject, body)
+
+    echo(report_header())
+    for name, build in (('multipart build', multipart),
+                        ('builder build', compiled)):
+        timings, built = time_each(name, build, recipients)
+        echo(report_line(timings))
+        echo('{0:>8} {1:<24} {2:>10.1f} bytes/message'.format(
+            messages, name, sum(len(m) for m in built) / float(len(built))))
@@ -3,20 +3,115 @@
 
 The daily check is invoked via the cron API, well, once per day.
 
+Reminders come from CardReminder and WaiverReminder rows, or with
+REMINDER_SCHEDULE = 'computed' are worked out from card and waiver dates,
+see emol.models.reminder_schedule.
+
 """
 
 # standard library imports
-from datetime import datetime
 
 # third-party imports
 from flask import current_app
+from sqlalchemy.orm import joinedload
 
 # application imports
-from emol.models import CardReminder, WaiverReminder
+from emol.mail import Emailer
+from emol.models import (Card, CardReminder, Combatant, CombatantListEntry,
+                         WaiverReminder)
+from emol.models.reminder_schedule import SCHEDULES
+from emol.utility.database import chunked
 from emol.utility.date import today
 
 
-def daily_check():
+def _process_reminders(model, options, this_day, chunk_size):
+    """Mail and delete every due reminder of one kind.
+
+    Due reminders are read in chunks with everything their mail needs
+    loaded up front. Each chunk is deleted with one statement by id and
+    committed, so a failure part way loses at most one chunk of progress.
+
+    Args:
+        model: CardReminder or WaiverReminder
+        options: Loader options for the reminder query
+        this_day: Reminders dated this day or earlier are due
+        chunk_size: Number of reminders per chunk
+
+    Returns:
+        A tuple of (reminders processed, mails that failed)
+
+    """
+    query = model.query.filter(
+        model.reminder_date <= this_day).options(*options)
+
+    count = 0
+    failed = 0
+    for reminders in chunked(query, model.id, chunk_size):
+        for reminder in reminders:
+            current_app.logger.debug('Mail {0}'.format(reminder))
+            if not reminder.mail():
+                failed += 1
+
+        model.query.filter(
+            model.id.in_([reminder.id for reminder in reminders])
+        ).delete(synchronize_session=False)
+        current_app.db.session.commit()
+
+        count += len(reminders)
+
+    return count, failed
+
+
+def _process_schedule(schedule, this_day, catch_up, chunk_size, dispatcher):
+    """Mail every reminder of one kind due from the computed schedule.
+
+    The reminders that were sent from each chunk are added to the ledger
+    and committed together, so running again on the same day sends nothing
+    twice and retries what failed. With a dispatcher each chunk is waited
+    for, so that only delivered reminders are recorded.
+
+    Args:
+        schedule: A ReminderSchedule
+        this_day: The day to send reminders for
+        catch_up: Days after expiry an expiry notice is still sent
+        chunk_size: Number of cards or waivers per chunk
+        dispatcher: The batch's Dispatcher, or None
+
+    Returns:
+        A tuple of (reminders processed, mails that failed). Mails that
+        failed in the dispatcher are counted by the dispatcher instead.
+
+    """
+    count = 0
+    failed = 0
+    for days, is_expiry, query in schedule.due(this_day, catch_up):
+        for records in chunked(query, schedule.model.id, chunk_size):
+            for record in records:
+                current_app.logger.debug('Mail {0} ({1} days, {2})'.format(
+                    record, days, 'expiry' if is_expiry else 'reminder'))
+
+            if dispatcher is not None:
+                errors = dispatcher.map([
+                    record.reminder_message(is_expiry) for record in records])
+                sent = [record for record, error in zip(records, errors)
+                        if error is None]
+            else:
+                sent = [record for record in records
+                        if record.mail_reminder(is_expiry)]
+                failed += len(records) - len(sent)
+
+            schedule.record(sent, days, is_expiry, this_day)
+            current_app.db.session.commit()
+
+            count += len(records)
+
+    schedule.prune(this_day, catch_up)
+    current_app.db.session.commit()
+
+    return count, failed
+
+
+def daily_check(chunk_size=500):
     """Perform the daily check for card and waiver reminders.
 
     Check CardReminder and WaiverReminder for any records with a
@@ -24,22 +119,62 @@ def daily_check():
     processed for whatever reason on their date). Fire off the reminder email
     for each found record, then delete the record.
 
+    With the computed schedule, send whatever the schedule says is due
+    today and not yet sent instead.
+
+    Then create any missing combatant list entries, and rebuild the
+    combatants' legal name order if any positions are shared, see
+    Combatant.place_in_name_order.
+
+    Args:
+        chunk_size: Number of reminders to process per transaction
+
     """
     current_app.logger.info('Daily check initiated')
 
     this_day = today()
-    reminders = CardReminder.query.filter(CardReminder.reminder_date <= this_day).all()
-    for reminder in reminders:
-        current_app.logger.debug('Mail {0}'.format(reminder))
-        reminder.mail()
-        current_app.db.session.delete(reminder)
-
-    reminders = WaiverReminder.query.filter(WaiverReminder.reminder_date <= this_day).all()
-    for reminder in reminders:
-        current_app.logger.debug('Mail {0}'.format(reminder))
-        reminder.mail()
-        current_app.db.session.delete(reminder)
 
-    current_app.db.session.commit()
+    with Emailer.batch() as dispatcher:
+        if current_app.config.get('REMINDER_SCHEDULE', 'stored') == 'computed':
+            catch_up = current_app.config.get('REMINDER_CATCH_UP_DAYS', 7)
+            cards, card_failures = _process_schedule(
+                SCHEDULES['card'], this_day, catch_up, chunk_size, dispatcher)
+            waivers, waiver_failures = _process_schedule(
+                SCHEDULES['waiver'], this_day, catch_up, chunk_size,
+                dispatcher)
+        else:
+            cards, card_failures = _process_reminders(
+                CardReminder,
+                [
+                    joinedload(CardReminder.card).joinedload(Card.combatant),
+                    joinedload(CardReminder.card).joinedload(Card.discipline)
+                ],
+                this_day,
+                chunk_size
+            )
+
+            waivers, waiver_failures = _process_reminders(
+                WaiverReminder,
+                # Waiver.combatant and WaiverReminder.waiver are backrefs
+                [joinedload('waiver').joinedload('combatant')],
+                this_day,
+                chunk_size
+            )
+
+    failures = card_failures + waiver_failures
+    if dispatcher is not None:
+        # Mail handed to the dispatcher's threads fails after mail() returns
+        failures += dispatcher.failed
+
+    current_app.logger.info(
+        'Daily check complete: {0} card and {1} waiver reminders, '
+        '{2} failed to send'.format(cards, waivers, failures)
+    )
+
+    if CombatantListEntry.incomplete():
+        current_app.logger.info('Filling in the combatant list')
+        CombatantListEntry.fill(chunk_size)
 
-    current_app.logger.info('Daily check complete')
+    if Combatant.name_order_stale():
+        current_app.logger.info('Rebuilding legal name order')
+        Combatant.rebuild_name_order(chunk_size)
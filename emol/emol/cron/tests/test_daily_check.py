@@ -166,3 +166,17 @@ def test_daily_check_waiver_renew_expired(app, combatant, privileged_user):
 
     assert len(combatant.waiver.reminders) == 0
 
+
+def test_daily_check_backlog(app, combatant):
+    """A backlog of reminders drains in chunks."""
+    card = combatant.get_card('rapier')
+    waiver_dates = [r.reminder_date for r in combatant.waiver.reminders]
+    card_dates = [r.reminder_date for r in card.reminders]
+
+    with Mocktoday('emol.cron.daily_check', max(waiver_dates + card_dates)):
+        with Mockmail('emol.models.waiver', True):
+            with Mockmail('emol.models.card', True):
+                daily_check(chunk_size=1)
+
+    assert len(card.reminders) == 0
+    assert len(combatant.waiver.reminders) == 0
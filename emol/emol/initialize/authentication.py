@@ -10,6 +10,7 @@ from flask_login import LoginManager
 
 # application imports
 from emol.models import User, AnonymousUser
+from emol.utility.cache import LRUCache
 
 
 def init_authentication():
@@ -36,10 +37,18 @@ def init_authentication():
     # Otherwise this will raise a NameError as login_manager will be out of
     # scope
 
+    # Users' roles, see User.load_cached. USER_CACHE_SIZE sets the
+    # number of users held (0 to disable) and USER_CACHE_TTL the number of
+    # seconds a user may stay cached.
+    current_app.user_cache = LRUCache(
+        max_size=current_app.config.get('USER_CACHE_SIZE', 256),
+        ttl=current_app.config.get('USER_CACHE_TTL', 60)
+    )
+
     # pylint hates callbacks
     # pylint: disable=unused-variable
     @current_app.login_manager.user_loader
     def load_user(user_id):
         """Map the user class for the flask_login manager."""
         #current_app.logger.debug('login_manager: {}'.format(user_id))
-        return User.query.filter(User.email == user_id).first()
+        return User.load_cached(user_id)
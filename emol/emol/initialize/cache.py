@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Initialize application page caches."""
+
+# standard library imports
+import os
+
+# third-party imports
+from flask import current_app
+
+# application imports
+
+
+def init_caches():
+    """Set up the rendered card page, config and reference data caches.
+
+    CARD_CACHE_BACKEND selects memory, filesystem or none. CARD_CACHE_SIZE
+    bounds the memory backend and CARD_CACHE_DIR locates the filesystem
+    backend, by default card_cache in the instance folder.
+
+    CONFIG_CHECK_INTERVAL and REFERENCE_DATA_CHECK_INTERVAL set how many
+    seconds a process goes between checks for changed config items and
+    reference data.
+
+    """
+    current_app.logger.info('Initialize caches')
+    from emol.models.config import ConfigCache
+    from emol.models.reference_data import ReferenceRegistry
+    from emol.utility.render_cache import make_render_cache
+
+    config = current_app.config
+    current_app.config_cache = ConfigCache(
+        check_interval=config.get('CONFIG_CHECK_INTERVAL', 10)
+    )
+    current_app.reference_data = ReferenceRegistry(
+        check_interval=config.get('REFERENCE_DATA_CHECK_INTERVAL', 30)
+    )
+
+    current_app.card_cache = make_render_cache(
+        config.get('CARD_CACHE_BACKEND', 'memory'),
+        size=config.get('CARD_CACHE_SIZE', 1000),
+        directory=config.get(
+            'CARD_CACHE_DIR',
+            os.path.join(current_app.instance_path, 'card_cache')
+        )
+    )
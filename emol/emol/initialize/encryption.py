@@ -4,9 +4,26 @@
 from flask import current_app
 
 
+def _zeroise(record):
+    """Clear a decrypted record as it leaves the cache.
+
+    Python strings are immutable so this can't scrub memory, but it does drop
+    the last references the cache holds so the values can be collected.
+
+    """
+    record.clear()
+
+
 def init_encryption():
-    """Instantiate an encryption object for the app."""
+    """Instantiate an encryption object for the app.
+
+    Also set up the process-wide cache of decrypted combatant records.
+    DECRYPTED_CACHE_SIZE sets the number of records held (0 to disable) and
+    DECRYPTED_CACHE_TTL the number of seconds a record may stay cached.
+
+    """
     current_app.logger.info('Initialize encryption')
+    from emol.utility.cache import LRUCache
     from emol.utility.encryption import AESCipher
 
     def cipher():
@@ -17,3 +34,9 @@ def init_encryption():
         return current_app._cipher
 
     current_app.cipher = cipher
+
+    current_app.decrypted_cache = LRUCache(
+        max_size=current_app.config.get('DECRYPTED_CACHE_SIZE', 1024),
+        ttl=current_app.config.get('DECRYPTED_CACHE_TTL', 300),
+        on_evict=_zeroise
+    )
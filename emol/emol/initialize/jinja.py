@@ -46,7 +46,8 @@ def init_jinja():
         """Check if the current user has a role.
 
         Proxy User.has_role so that Jinja can return the selected property
-        for a tag.
+        for a tag. Users with compiled permissions (see User.permissions)
+        are checked against those directly.
 
         Args:
             discipline: The discipline to check against (or 'global')
@@ -61,6 +62,11 @@ def init_jinja():
         if user is None:
             return False
 
+        permissions = getattr(user, 'permissions', None)
+        if permissions is not None:
+            return permissions.allows(
+                discipline, role if isinstance(role, tuple) else (role,))
+
         if isinstance(role, tuple):
             return user.has_role_or(discipline, role)
         else:
@@ -70,30 +76,37 @@ def init_jinja():
 
     # Exports to Jinja globals
 
-    def yes_no_auth(card, authorization):
+    def yes_no(value):
         """Return HTML for yes or no values.
 
         A green FontAwesome checkmark or a red FontAwesome
-        X depending on the result of check_authorization
+        X depending on value
 
         """
-        if card.has_authorization(authorization):
+        if value:
             return '<i class="fa fa-check fa-lg green yes-no-icon"></i>'
 
         return '<i class="fa fa-close fa-lg red yes-no-icon"></i>'
 
-    def yes_no_warrant(card, marshal):
+    def yes_no_auth(card, authorization):
         """Return HTML for yes or no values.
 
         A green FontAwesome checkmark or a red FontAwesome
         X depending on the result of check_authorization
 
         """
-        if card.has_warrant(marshal):
-            return '<i class="fa fa-check fa-lg green yes-no-icon"></i>'
+        return yes_no(card.has_authorization(authorization))
 
-        return '<i class="fa fa-close fa-lg red yes-no-icon"></i>'
+    def yes_no_warrant(card, marshal):
+        """Return HTML for yes or no values.
+
+        A green FontAwesome checkmark or a red FontAwesome
+        X depending on the result of check_authorization
+
+        """
+        return yes_no(card.has_warrant(marshal))
 
+    jinja_globals['yes_no'] = yes_no
     jinja_globals['yes_no_auth'] = yes_no_auth
     jinja_globals['yes_no_warrant'] = yes_no_warrant
 
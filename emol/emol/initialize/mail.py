@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Initialize outbound mail."""
+
+# standard library imports
+
+# third-party imports
+from flask import current_app
+
+# application imports
+
+
+def init_mail():
+    """Create the SMTP connection pool, message builder and mail metrics.
+
+    Uses the MAIL_ settings documented on Emailer. MAIL_POOL_SIZE sets the
+    number of idle connections kept, MAIL_MAX_MESSAGES the number of
+    messages sent on a connection before it is replaced, and MAIL_KEEPALIVE
+    the seconds a connection may sit idle before it is checked with NOOP.
+
+    MAIL_HOST_CONCURRENCY caps the connections open to MAIL_HOST at once
+    and MAIL_RATE the messages sent to it per second. At least
+    MAIL_CONCURRENCY idle connections are kept, so that the threads of a
+    batch send don't close and reopen connections between messages.
+
+    Email queued in the outbox joins the request's transaction. A request
+    that succeeds without committing it has it committed when the request
+    ends.
+
+    """
+    current_app.logger.info('Initialize mail')
+    from emol.mail.message import MessageBuilder
+    from emol.mail.pool import MailMetrics, SMTPPool
+
+    config = current_app.config
+    current_app.mail_builder = MessageBuilder(
+        config.get('MAIL_DEFAULT_SENDER'))
+    current_app.mail_metrics = MailMetrics()
+    current_app.mail_pool = SMTPPool(
+        config.get('MAIL_HOST'),
+        port=config.get('MAIL_PORT', 25),
+        username=config.get('MAIL_USERNAME'),
+        password=config.get('MAIL_PASSWORD'),
+        use_ssl=config.get('MAIL_USE_SSL', False),
+        use_tls=config.get('MAIL_USE_TLS', False),
+        size=max(
+            config.get('MAIL_POOL_SIZE', 2),
+            config.get('MAIL_CONCURRENCY', 4)
+        ),
+        max_messages=config.get('MAIL_MAX_MESSAGES', 100),
+        keepalive=config.get('MAIL_KEEPALIVE', 30),
+        max_connections=config.get('MAIL_HOST_CONCURRENCY', 4),
+        rate=config.get('MAIL_RATE'),
+        metrics=current_app.mail_metrics
+    )
+
+    @current_app.after_request
+    def commit_queued_mail(response):
+        """Commit email queued by a request that didn't commit it."""
+        from emol.models import OutboundMail
+
+        session = current_app.db.session
+        if response.status_code < 400 and any(
+                isinstance(instance, OutboundMail) for instance in session.new):
+            session.commit()
+
+        return response
@@ -9,25 +9,28 @@ email_templates.py.
 # standard library imports
 import socket
 import smtplib
+import threading
 
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import make_msgid, formatdate
-from uuid import uuid4
+from contextlib import contextmanager
 
 # third-party imports
 from flask import current_app
 
 # application imports
 from emol.exception.privacy_acceptance import PrivacyPolicyNotAccepted
-from emol.mail.email_templates import EMAIL_TEMPLATES
+from emol.mail.dispatch import Dispatcher
+from emol.mail.template import TEMPLATES
+
+# Per-thread state of batch(): whether outbox commits are deferred, and the
+# Dispatcher delivering the batch
+_local = threading.local()
 
 
 class Emailer(object):
     """An application-specific emailer.
 
-    Templates are defined in email_templates.py and each has an associated
-    send_xxx staticmethod.
+    Templates are defined in email_templates.py, compiled in template.py,
+    and each has an associated send_xxx staticmethod.
 
     SMTP configuration in config.py:
         MAIL_HOST = <your SMTP server>
@@ -38,52 +41,176 @@ class Emailer(object):
         MAIL_USE_SSL = True/False
         MAIL_USE_TLS = True/False
 
+    Messages are sent over pooled connections, see emol.mail.pool and
+    init_mail. With MAIL_OUTBOX = True they are queued in the database and
+    sent by the send_mail command instead, see emol.models.outbound_mail.
+
     """
 
+    @classmethod
+    def outbox_enabled(cls):
+        """Check whether email goes through the outbox."""
+        return current_app.config.get('MAIL_OUTBOX', False) is True
+
     @classmethod
     def send_email(cls, recipient, subject, body):
         """Send an email.
 
+        With MAIL_OUTBOX set the message is queued in the outbox for the
+        send_mail command, in the caller's transaction: it goes out with the
+        caller's next commit, or with the commit at the end of a request
+        (see init_mail), and not at all if the caller rolls back. Otherwise
+        it is delivered right away, or handed to a thread for delivery when
+        inside a batch().
+
         Args:
             recipient: Recipient's email address
             subject: The email's subject
             body: Email message text
 
         Returns:
-            True if the message was delivered
+            True if the message was queued, handed off or delivered
 
         """
-        sender = current_app.config.get('MAIL_DEFAULT_SENDER')
-        message = MIMEMultipart()
-        message['Subject'] = subject
-        message['From'] = sender
-        message['To'] = recipient
-        message['Message-ID'] = make_msgid(uuid4().hex)
-        message['Date'] = formatdate(localtime=True)
-        message.attach(MIMEText(body, 'plain'))
+        if cls.outbox_enabled():
+            from emol.models import OutboundMail
+            OutboundMail.enqueue(recipient, subject, body, commit=False)
+            return True
 
-        if current_app.config.get('SEND_EMAIL', True) is False:
-            current_app.logger.debug('Not sending email')
-            current_app.logger.debug(message)
+        dispatcher = getattr(_local, 'dispatcher', None)
+        if dispatcher is not None:
+            dispatcher.submit(recipient, subject, body)
             return True
 
-        smtp = smtplib.SMTP(
-            current_app.config.get('MAIL_HOST'),
-            current_app.config.get('MAIL_PORT', 25)
-        )
         try:
-            login = current_app.config.get('MAIL_USERNAME')
-            password = current_app.config.get('MAIL_PASSWORD')
-            if login is not None and password is not None:
-                smtp.login(login, password)
-
-            smtp.sendmail(sender, [recipient], message.as_string())
+            cls.deliver(recipient, subject, body)
             return True
         except (socket.error, smtplib.SMTPException):
             current_app.logger.exception('Error sending email')
             return False
+
+    @classmethod
+    def deliver(cls, recipient, subject, body):
+        """Deliver an email over SMTP now.
+
+        Args:
+            recipient: Recipient's email address
+            subject: The email's subject
+            body: Email message text
+
+        Raises:
+            socket.error or smtplib.SMTPException if the message can't be
+            sent
+
+        """
+        builder = current_app.mail_builder
+        message = builder.build(recipient, subject, body)
+
+        if current_app.config.get('SEND_EMAIL', True) is False:
+            current_app.logger.debug('Not sending email')
+            current_app.logger.debug(message)
+            return
+
+        current_app.mail_pool.send(builder.sender, [recipient], message)
+
+    @classmethod
+    def _threads(cls):
+        """Number of threads to deliver a batch of emails on."""
+        return current_app.config.get('MAIL_CONCURRENCY', 4)
+
+    @classmethod
+    def deliver_many(cls, messages, on_result=None):
+        """Deliver emails over SMTP now, in parallel if configured.
+
+        Args:
+            messages: List of (recipient, subject, body) tuples
+            on_result: Called in this thread with the index of each message
+                and the exception it raised, None if it was delivered, as
+                each message finishes
+
+        Returns:
+            List of the exception raised delivering each message, None if
+            it was delivered, in the order of messages
+
+        """
+        if cls._threads() > 1 and len(messages) > 1:
+            with Dispatcher(cls.deliver, cls._threads()) as dispatcher:
+                return dispatcher.map(messages, on_result)
+
+        results = []
+        with current_app.mail_pool.batch():
+            for index, message in enumerate(messages):
+                try:
+                    cls.deliver(*message)
+                    results.append(None)
+                except Exception as exc:
+                    current_app.logger.error(
+                        'Error sending email: {0}'.format(exc))
+                    results.append(exc)
+
+                if on_result is not None:
+                    on_result(index, results[-1])
+
+        return results
+
+    @classmethod
+    @contextmanager
+    def batch(cls, outbox=None):
+        """Send a block of emails together.
+
+        Delivered emails are handed to a pool of MAIL_CONCURRENCY threads
+        (see emol.mail.dispatch) and the block ends once they have all
+        been sent; with MAIL_CONCURRENCY = 1 they all go over one SMTP
+        connection instead. Queued emails are committed to the outbox with
+        the caller's next commit, or when the block ends, rather than one
+        commit each.
+
+        Usage:
+            with Emailer.batch():
+                for combatant in combatants:
+                    Emailer.send_card_request(combatant)
+
+        Args:
+            outbox: True if emails in the block are queued, False if they
+                are delivered. Defaults to MAIL_OUTBOX.
+
+        Yields:
+            The Dispatcher delivering the block's emails, whose failed
+            count is final once the block ends, or None
+
+        """
+        if outbox is None:
+            outbox = cls.outbox_enabled()
+
+        if outbox is False:
+            dispatcher = getattr(_local, 'dispatcher', None)
+            if dispatcher is not None:
+                yield dispatcher
+                return
+
+            if cls._threads() <= 1:
+                with current_app.mail_pool.batch():
+                    yield None
+                return
+
+            _local.dispatcher = Dispatcher(cls.deliver, cls._threads())
+            try:
+                with _local.dispatcher as dispatcher:
+                    yield dispatcher
+            finally:
+                _local.dispatcher = None
+            return
+
+        if getattr(_local, 'deferred', False) is True:
+            yield
+            return
+
+        _local.deferred = True
+        try:
+            yield
+            current_app.db.session.commit()
         finally:
-            smtp.quit()
+            _local.deferred = False
 
     @classmethod
     def send_waiver_expiry(cls, combatant, expiry_days):
@@ -94,12 +221,11 @@ class Emailer(object):
             expiry_days: Number of days in advance to check
 
         """
-        template = EMAIL_TEMPLATES.get('waiver_expiry')
-        body = template.get('body').format(
+        subject, body = TEMPLATES['waiver_expiry'].render(
             expiry_days=expiry_days,
             expiry_date=combatant.waiver_expiry
         )
-        return cls.send_email(combatant.email, template.get('subject'), body)
+        return cls.send_email(combatant.email, subject, body)
 
     @classmethod
     def send_card_reminder(cls, combatant, expiry_days):
@@ -110,12 +236,11 @@ class Emailer(object):
             expiry_days: Number of days in advance to check
 
         """
-        template = EMAIL_TEMPLATES.get('card_expiry')
-        body = template.get('body').format(
+        subject, body = TEMPLATES['card_expiry'].render(
             expiry_days=expiry_days,
             expiry_date=combatant.card_expiry
         )
-        return cls.send_email(combatant.email, template.get('subject'), body)
+        return cls.send_email(combatant.email, subject, body)
 
     @classmethod
     def send_waiver_reminder(cls, combatant, expiry_days):
@@ -126,12 +251,11 @@ class Emailer(object):
             expiry_days: Number of days in advance to check
 
         """
-        template = EMAIL_TEMPLATES.get('waiver_expiry')
-        body = template.get('body').format(
+        subject, body = TEMPLATES['waiver_expiry'].render(
             expiry_days=expiry_days,
             expiry_date=combatant.waiver_expiry
         )
-        return cls.send_email(combatant.email, template.get('subject'), body)
+        return cls.send_email(combatant.email, subject, body)
 
     @classmethod
     def send_info_update(cls, combatant, update_request):
@@ -142,11 +266,10 @@ class Emailer(object):
             update_request: The update request
 
         """
-        template = EMAIL_TEMPLATES.get('info_update')
-        body = template.get('body').format(
+        subject, body = TEMPLATES['info_update'].render(
             update_url=update_request.change_info_url
         )
-        return cls.send_email(combatant.email, template.get('subject'), body)
+        return cls.send_email(combatant.email, subject, body)
 
     @classmethod
     def send_card_request(cls, combatant):
@@ -161,15 +284,10 @@ class Emailer(object):
 
         """
         try:
-            template = EMAIL_TEMPLATES.get('card_request')
-            body = template.get('body').format(
+            subject, body = TEMPLATES['card_request'].render(
                 card_url=combatant.card_url
             )
-            return cls.send_email(
-                combatant.email,
-                template.get('subject'),
-                body
-            )
+            return cls.send_email(combatant.email, subject, body)
         except PrivacyPolicyNotAccepted:
             current_app.logger.exception(
                 'Attempt to send card URL to {0} (privacy not accepted)'
@@ -188,12 +306,11 @@ class Emailer(object):
             privacy_acceptance: A PrivacyAcceptance object to work from
 
         """
-        template = EMAIL_TEMPLATES.get('privacy_policy')
-        body = template.get('body').format(
+        subject, body = TEMPLATES['privacy_policy'].render(
             privacy_policy_url=privacy_acceptance.privacy_policy_url
         )
         return cls.send_email(
             privacy_acceptance.combatant.email,
-            template.get('subject'),
+            subject,
             body
         )
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Parallel delivery of email.
+
+Sending one message at a time leaves the SMTP relay idle while each message
+makes its round trips. The Dispatcher delivers messages on a bounded pool of
+threads instead, so a bulk send such as a reminder day goes out as fast as
+the relay allows. The limits that protect the relay, connections per host
+and messages per second, are kept by the host's SMTPPool, so the number of
+threads only needs to be enough to reach them.
+
+Each thread runs with the application context of the thread that created
+the dispatcher. Delivery must not touch the database, so everything a
+message needs is read before it is submitted.
+
+"""
+
+# standard library imports
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# third-party imports
+from flask import current_app
+
+# application imports
+
+__all__ = ['Dispatcher']
+
+
+class Dispatcher(object):
+    """Delivers messages on a bounded pool of threads.
+
+    Usage:
+        with Dispatcher(Emailer.deliver, threads=4) as dispatcher:
+            for recipient, subject, body in messages:
+                dispatcher.submit(recipient, subject, body)
+
+    Failures are logged as they happen.
+
+    Attributes:
+        sent: Number of messages delivered
+        failed: Number of messages that raised
+
+    """
+
+    def __init__(self, deliver, threads=4, backlog=None):
+        """Constructor.
+
+        Args:
+            deliver: Callable that delivers one message, raising if it can't
+            threads: Number of threads
+            backlog: Number of messages that may wait for a thread before
+                submit blocks, defaults to four per thread
+
+        """
+        self._deliver = deliver
+        self._app = current_app._get_current_object()
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._slots = threading.BoundedSemaphore(
+            threads + (backlog if backlog is not None else threads * 4))
+        self._lock = threading.Lock()
+
+        self.sent = 0
+        self.failed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self, args):
+        """Deliver one message in a worker thread."""
+        try:
+            with self._app.app_context():
+                self._deliver(*args)
+        except Exception as exc:
+            self._app.logger.error('Error sending email: {0}'.format(exc))
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.sent += 1
+        finally:
+            self._slots.release()
+
+    def submit(self, *args):
+        """Queue a message for delivery.
+
+        Blocks while the backlog is full.
+
+        Args:
+            args: Arguments for deliver
+
+        Returns:
+            A Future whose exception() is whatever deliver raised
+
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._run, args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        return future
+
+    def map(self, messages, on_result=None):
+        """Deliver messages and wait for them all.
+
+        Args:
+            messages: Iterable of argument tuples for deliver
+            on_result: Called in this thread with the index of each message
+                and the exception it raised, None if it was delivered, as
+                each message finishes
+
+        Returns:
+            List of the exception each message raised, None if it was
+            delivered, in the order of messages
+
+        """
+        futures = [self.submit(*message) for message in messages]
+        if on_result is not None:
+            index = dict((future, i) for i, future in enumerate(futures))
+            for future in as_completed(futures):
+                on_result(index[future], future.exception())
+
+        return [future.exception() for future in futures]
+
+    def close(self):
+        """Wait for every queued message, then stop the threads."""
+        self._executor.shutdown(wait=True)
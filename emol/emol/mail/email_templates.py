@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 """Email templates.
 
-Each template has two string elements:
+Each template has three elements:
     - subject line for the email
     - body of the email
+    - fields, the names of the body's format elements for string.format
 
-Each body may define a number of named format elements for string.format.
-It is up to the caller to ensure that all named elements are provided; no error
-checking is provided here.
+The templates are compiled and their fields checked in template.py, and
+should be used from there.
 
 """
 
@@ -165,30 +165,37 @@ Ealdormere eMoL
 EMAIL_TEMPLATES = {
     'card_reminder': {
         'subject': CARD_REMINDER_SUBJECT,
-        'body': CARD_REMINDER_EMAIL
+        'body': CARD_REMINDER_EMAIL,
+        'fields': ('discipline', 'expiry_days', 'expiry_date')
     },
     'waiver_reminder': {
         'subject': WAIVER_REMINDER_SUBJECT,
-        'body': WAIVER_REMINDER_EMAIL
+        'body': WAIVER_REMINDER_EMAIL,
+        'fields': ('expiry_days', 'expiry_date')
     },
     'card_expiry': {
         'subject': CARD_EXPIRY_SUBJECT,
-        'body': CARD_EXPIRY_EMAIL
+        'body': CARD_EXPIRY_EMAIL,
+        'fields': ('discipline',)
     },
     'waiver_expiry': {
         'subject': WAIVER_EXPIRY_SUBJECT,
-        'body': WAIVER_EXPIRY_EMAIL
+        'body': WAIVER_EXPIRY_EMAIL,
+        'fields': ()
     },
     'card_request': {
         'subject': CARD_REQUEST_SUBJECT,
-        'body': CARD_REQUEST_EMAIL
+        'body': CARD_REQUEST_EMAIL,
+        'fields': ('card_url',)
     },
     'info_update': {
         'subject': INFO_UPDATE_SUBJECT,
-        'body': INFO_UPDATE_EMAIL
+        'body': INFO_UPDATE_EMAIL,
+        'fields': ('update_url',)
     },
     'privacy_policy': {
         'subject': PRIVACY_POLICY_SUBJECT,
-        'body': PRIVACY_POLICY_EMAIL
+        'body': PRIVACY_POLICY_EMAIL,
+        'fields': ('privacy_policy_url',)
     }
 }
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Cheap construction of plain text email messages.
+
+Every email eMoL sends is a single plain text part, so building it as a
+MIMEMultipart pays for a multipart container, a boundary and the generic
+email generator for nothing. MessageBuilder writes the message text
+directly instead:
+
+    - The From header and the domain for Message-ID are worked out once
+    - The Date header is reused for every message built in the same second
+    - Subject and body are only encoded when they aren't plain ASCII, and
+      then as UTF-8 (RFC 2047 for the subject, quoted-printable for the
+      body) so the message is still 7 bit clean
+
+"""
+
+# standard library imports
+import socket
+import time
+from email import quoprimime
+from email.header import Header
+from email.utils import formataddr, formatdate, parseaddr
+from uuid import uuid4
+
+# third-party imports
+
+# application imports
+
+__all__ = ['MessageBuilder']
+
+HEADERS = (
+    'From: {sender}\n'
+    'To: {recipient}\n'
+    'Subject: {subject}\n'
+    'Date: {date}\n'
+    'Message-ID: <{message_id}@{domain}>\n'
+    'MIME-Version: 1.0\n'
+    'Content-Type: text/plain; charset="{charset}"\n'
+    'Content-Transfer-Encoding: {encoding}\n'
+    '\n'
+)
+
+
+def _is_ascii(value):
+    """Check whether a string is plain ASCII."""
+    try:
+        value.encode('ascii')
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+def _header(value):
+    """Encode a header value if it isn't plain ASCII."""
+    if _is_ascii(value):
+        return value
+
+    return Header(value, 'utf-8').encode()
+
+
+def _address(value):
+    """Encode an address header, such as 'eMoL <emol@example.com>'."""
+    if _is_ascii(value):
+        return value
+
+    return formataddr(parseaddr(value), 'utf-8')
+
+
+class MessageBuilder(object):
+    """Builds single part plain text messages from one sender.
+
+    Safe to share between threads.
+
+    """
+
+    def __init__(self, sender, domain=None):
+        """Constructor.
+
+        Args:
+            sender: The From address
+            domain: Domain for Message-ID, defaults to this host's name
+
+        """
+        self.sender = sender
+        self._from = _address(sender or '')
+        self._domain = domain or socket.getfqdn()
+        self._date = (None, None)
+
+    def _date_header(self):
+        """The Date header for now, reused within a second."""
+        second = int(time.time())
+        cached_second, header = self._date
+        if cached_second != second:
+            header = formatdate(second, localtime=True)
+            self._date = (second, header)
+
+        return header
+
+    def build(self, recipient, subject, body):
+        """Build a message.
+
+        Args:
+            recipient: Recipient's email address
+            subject: The email's subject
+            body: Email message text
+
+        Returns:
+            The message as a string, for smtplib's sendmail
+
+        Raises:
+            ValueError if recipient or subject contains a line break
+
+        """
+        for value in (recipient, subject):
+            if '\n' in value or '\r' in value:
+                raise ValueError('Line break in header {0!r}'.format(value))
+
+        if _is_ascii(body):
+            charset = 'us-ascii'
+            encoding = '7bit'
+        else:
+            charset = 'utf-8'
+            encoding = 'quoted-printable'
+            body = quoprimime.body_encode(
+                body.encode('utf-8').decode('latin-1'))
+
+        return HEADERS.format(
+            sender=self._from,
+            recipient=_address(recipient),
+            subject=_header(subject),
+            date=self._date_header(),
+            message_id=uuid4().hex,
+            domain=self._domain,
+            charset=charset,
+            encoding=encoding
+        ) + body
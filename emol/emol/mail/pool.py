@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""Pool of persistent SMTP connections.
+
+Opening an SMTP connection costs a TCP handshake, possibly TLS, and AUTH.
+The pool keeps connections open between messages so that cost is paid once
+per connection rather than once per message:
+
+    - A connection that has been idle for keepalive seconds is checked with
+      NOOP before reuse, and replaced if the server has dropped it
+    - A send that fails because the connection has gone away is retried once
+      on a new connection
+    - A connection is closed after max_messages messages, since many servers
+      limit messages per session
+    - At most size idle connections are kept
+    - At most max_connections connections to the server are open at once;
+      a send waits for one to come free rather than opening another
+    - At most rate messages per second are sent, so a relay that throttles
+      senders isn't pushed past its limit
+
+The pool counts messages sent, failed and retried in a MailMetrics.
+
+batch() holds one connection for a block of sends on the current thread,
+so a batch sender such as the daily check sends everything over a single
+connection. The connection is only opened when the first message is sent.
+
+"""
+
+# standard library imports
+import smtplib
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# third-party imports
+
+# application imports
+
+__all__ = ['MailMetrics', 'RateLimiter', 'SMTPPool']
+
+# Errors after which a connection can't be trusted with another message.
+# Every SMTPException is an OSError, so socket.error would take in rejected
+# messages as well; the server refusing a message leaves the connection
+# usable.
+CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPHeloError,
+    ConnectionError,
+    socket.timeout
+)
+
+
+class MailMetrics(object):
+    """Thread-safe counts of messages sent, failed and retried.
+
+    A message is retried when a send is repeated on a new connection, or
+    when a message that failed is put back in the outbox for later.
+
+    """
+
+    NAMES = ('sent', 'failed', 'retried')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.NAMES, 0)
+
+    def __str__(self):
+        counts = self.snapshot()
+        return ', '.join(
+            '{0} {1}'.format(counts[name], name) for name in self.NAMES)
+
+    def add(self, name, count=1):
+        """Add to a count.
+
+        Args:
+            name: One of NAMES
+            count: Amount to add
+
+        """
+        with self._lock:
+            self._counts[name] += count
+
+    def snapshot(self):
+        """Get the current counts.
+
+        Returns:
+            Dict of count by name
+
+        """
+        with self._lock:
+            return dict(self._counts)
+
+
+class RateLimiter(object):
+    """Token bucket limiting events to a rate, shared between threads."""
+
+    def __init__(self, rate, burst=None):
+        """Constructor.
+
+        Args:
+            rate: Events allowed per second
+            burst: Events allowed at once after a quiet spell, defaults to
+                one second's worth
+
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def acquire(self):
+        """Wait until an event is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class _Connection(object):
+    """An open SMTP connection and its usage."""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool(object):
+    """A thread-safe pool of SMTP connections to one server."""
+
+    def __init__(self, host, port=25, username=None, password=None,
+                 use_ssl=False, use_tls=False, size=2, max_messages=100,
+                 keepalive=30, timeout=30, max_connections=None, rate=None,
+                 metrics=None):
+        """Constructor.
+
+        Args:
+            host: SMTP server
+            port: SMTP port
+            username: Optional user to log in as
+            password: Password for username
+            use_ssl: Connect with SSL
+            use_tls: Upgrade the connection with STARTTLS
+            size: Maximum number of idle connections kept
+            max_messages: Messages sent on a connection before it is closed
+            keepalive: Seconds a connection may be idle before it is checked
+                with NOOP
+            timeout: Socket timeout in seconds
+            max_connections: Maximum number of connections open at once,
+                None for no limit
+            rate: Maximum messages sent per second, None for no limit
+            metrics: MailMetrics to count messages in, defaults to a new
+                one
+
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.use_tls = use_tls
+        self.size = size
+        self.max_messages = max_messages
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.metrics = metrics if metrics is not None else MailMetrics()
+
+        self._limiter = RateLimiter(rate) if rate else None
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []
+        self._open = 0
+        self._local = threading.local()
+
+    def _full(self):
+        """Check whether no more connections may be opened.
+
+        Must be called holding the lock.
+
+        """
+        return (self.max_connections is not None and
+                self._open >= self.max_connections)
+
+    def _reserve(self):
+        """Wait until another connection may be opened, and count it."""
+        with self._available:
+            while self._full():
+                self._available.wait()
+            self._open += 1
+
+    def _released(self):
+        """Count a connection as closed, waking anyone waiting for one."""
+        with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    def _new(self):
+        """Open a new connection once one may be opened."""
+        self._reserve()
+        return self._connect()
+
+    def _connect(self):
+        """Open and log in a new connection.
+
+        The connection must already have been counted with _reserve.
+
+        """
+        try:
+            if self.use_ssl:
+                smtp = smtplib.SMTP_SSL(
+                    self.host, self.port, timeout=self.timeout)
+            else:
+                smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except Exception:
+            self._released()
+            raise
+
+        try:
+            if self.use_tls and not self.use_ssl:
+                smtp.starttls()
+            if self.username is not None and self.password is not None:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._close(_Connection(smtp))
+            raise
+
+        return _Connection(smtp)
+
+    def _close(self, connection):
+        """Close a connection, ignoring errors."""
+        try:
+            connection.smtp.quit()
+        except (smtplib.SMTPException, socket.error):
+            try:
+                connection.smtp.close()
+            except socket.error:
+                pass
+        finally:
+            self._released()
+
+    @staticmethod
+    def _alive(connection):
+        """Check a connection with NOOP."""
+        try:
+            return connection.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, socket.error):
+            return False
+
+    def _acquire(self):
+        """Get a working connection, reusing an idle one if possible."""
+        while True:
+            with self._available:
+                while not self._idle and self._full():
+                    self._available.wait()
+
+                if self._idle:
+                    connection = self._idle.pop()
+                else:
+                    connection = None
+                    self._open += 1
+
+            if connection is None:
+                return self._connect()
+
+            idle = time.monotonic() - connection.last_used
+            if idle < self.keepalive or self._alive(connection):
+                return connection
+
+            self._close(connection)
+
+    def _release(self, connection):
+        """Return a connection to the pool, or close it if it's used up."""
+        if connection.messages >= self.max_messages:
+            self._close(connection)
+            return
+
+        connection.last_used = time.monotonic()
+        with self._available:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                self._available.notify()
+                return
+
+        self._close(connection)
+
+    def _send_on(self, connection, sender, recipients, message):
+        """Send on a connection, counting the message."""
+        connection.messages += 1
+        connection.smtp.sendmail(sender, recipients, message)
+
+    def _send_once(self, connection, sender, recipients, message):
+        """Send on a pooled connection, then release or close it.
+
+        The connection is closed if it went away and returned to the pool
+        otherwise, including when the server refused the message.
+
+        """
+        try:
+            self._send_on(connection, sender, recipients, message)
+        except CONNECTION_ERRORS:
+            self._close(connection)
+            raise
+        except Exception:
+            self._release(connection)
+            raise
+
+        self._release(connection)
+
+    def send(self, sender, recipients, message):
+        """Send a message.
+
+        Uses the current thread's batch connection if in a batch. A message
+        that fails because the connection went away is retried once on a
+        new connection. Waits as needed to keep to the pool's rate.
+
+        Args:
+            sender: Envelope sender
+            recipients: List of recipient addresses
+            message: The message as a string
+
+        Raises:
+            socket.error or smtplib.SMTPException if the message can't be
+            sent
+
+        """
+        if self._limiter is not None:
+            self._limiter.acquire()
+
+        try:
+            self._send(sender, recipients, message)
+        except Exception:
+            self.metrics.add('failed')
+            raise
+
+        self.metrics.add('sent')
+
+    def _send(self, sender, recipients, message):
+        """Send a message, reconnecting once if the connection went away."""
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            connection = batch.get('connection')
+            if connection is None or connection.messages >= self.max_messages:
+                if connection is not None:
+                    batch['connection'] = None
+                    self._close(connection)
+                connection = batch['connection'] = self._new()
+
+            try:
+                self._send_on(connection, sender, recipients, message)
+            except CONNECTION_ERRORS:
+                batch['connection'] = None
+                self._close(connection)
+                self.metrics.add('retried')
+                connection = batch['connection'] = self._new()
+                self._send_on(connection, sender, recipients, message)
+            return
+
+        connection = self._acquire()
+        try:
+            self._send_once(connection, sender, recipients, message)
+        except CONNECTION_ERRORS:
+            self.metrics.add('retried')
+            self._send_once(self._new(), sender, recipients, message)
+
+    @contextmanager
+    def batch(self):
+        """Send every message in the block over one connection.
+
+        Nested batches share the outer batch's connection.
+
+        """
+        if getattr(self._local, 'batch', None) is not None:
+            yield self
+            return
+
+        self._local.batch = {}
+        try:
+            yield self
+        finally:
+            connection = self._local.batch.get('connection')
+            self._local.batch = None
+            if connection is not None:
+                self._release(connection)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._available:
+            idle, self._idle = self._idle, []
+
+        for connection in idle:
+            self._close(connection)
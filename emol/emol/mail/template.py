@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Compiled email templates.
+
+The templates in email_templates.py are parsed once, when this module is
+imported, rather than every time an email is sent. Parsing checks that each
+body's placeholders are plain names and are exactly the fields the template
+declares, so a typo in a template stops the application from starting
+instead of failing a reminder run part way through.
+
+Usage:
+    subject, body = TEMPLATES['card_request'].render(card_url=url)
+
+"""
+
+# standard library imports
+from string import Formatter
+
+# third-party imports
+
+# application imports
+from emol.mail.email_templates import EMAIL_TEMPLATES
+
+__all__ = ['CompiledTemplate', 'TEMPLATES', 'compile_templates']
+
+
+class CompiledTemplate(object):
+    """An email template whose placeholders have been checked.
+
+    Attributes:
+        name: The template's name
+        subject: Subject line
+        body: Body, for str.format
+        fields: frozenset of the body's placeholder names
+
+    """
+
+    __slots__ = ('name', 'subject', 'body', 'fields')
+
+    def __init__(self, name, subject, body, fields):
+        """Constructor.
+
+        Args:
+            name: The template's name
+            subject: Subject line
+            body: Body, with {name} placeholders
+            fields: Iterable of the placeholder names body must use
+
+        Raises:
+            ValueError if body can't be parsed, has a placeholder that isn't
+            a plain name, or its placeholders aren't exactly fields
+
+        """
+        self.name = name
+        self.subject = subject
+        self.body = body
+        self.fields = frozenset(fields)
+
+        try:
+            parsed = list(Formatter().parse(body))
+        except ValueError as exc:
+            raise ValueError('Email template {0}: {1}'.format(name, exc))
+
+        found = set()
+        for _, field, spec, conversion in parsed:
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(
+                    'Email template {0}: placeholder {{{1}}} must be a plain '
+                    'name'.format(name, field)
+                )
+            found.add(field)
+
+        if found != self.fields:
+            raise ValueError(
+                'Email template {0}: has placeholders {1}, expected {2}'
+                .format(name, sorted(found), sorted(self.fields))
+            )
+
+    def __repr__(self):
+        return '<CompiledTemplate: {0}>'.format(self.name)
+
+    def render(self, **values):
+        """Fill in the template.
+
+        Values for fields the template doesn't use are ignored.
+
+        Args:
+            values: A value for each of the template's fields
+
+        Returns:
+            A tuple of (subject, body)
+
+        Raises:
+            KeyError if a field has no value
+
+        """
+        if not self.fields.issubset(values):
+            raise KeyError(
+                'Email template {0} needs {1}'.format(
+                    self.name, sorted(self.fields.difference(values)))
+            )
+
+        return self.subject, self.body.format_map(values)
+
+
+def compile_templates(templates):
+    """Compile a dict of templates laid out as EMAIL_TEMPLATES.
+
+    Args:
+        templates: Dict of {name: {subject, body, fields}}
+
+    Returns:
+        Dict of CompiledTemplate by name
+
+    Raises:
+        ValueError if any template is invalid
+
+    """
+    return dict(
+        (name, CompiledTemplate(
+            name,
+            template['subject'],
+            template['body'],
+            template.get('fields', ())
+        ))
+        for name, template in templates.items()
+    )
+
+
+TEMPLATES = compile_templates(EMAIL_TEMPLATES)
@@ -0,0 +1,55 @@
+"""Unit tests for parallel mail delivery."""
+import threading
+
+from emol.mail.dispatch import Dispatcher
+
+
+def test_dispatch(app):
+    """Messages are delivered on several threads, with the app context."""
+    threads = set()
+    delivered = []
+
+    def deliver(recipient):
+        assert app.config is not None
+        threads.add(threading.get_ident())
+        delivered.append(recipient)
+
+    with Dispatcher(deliver, threads=4) as dispatcher:
+        for i in range(20):
+            dispatcher.submit(i)
+
+    assert sorted(delivered) == list(range(20))
+    assert dispatcher.sent == 20 and dispatcher.failed == 0
+    assert threading.get_ident() not in threads
+
+
+def test_dispatch_map(app):
+    """map gives each message's error in order."""
+    def deliver(recipient):
+        if recipient % 2:
+            raise ValueError(recipient)
+
+    with Dispatcher(deliver, threads=3, backlog=0) as dispatcher:
+        results = dispatcher.map([(i,) for i in range(6)])
+
+    assert [r is None for r in results] == [True, False] * 3
+    assert dispatcher.failed == 3
+
+
+def test_dispatch_map_on_result(app):
+    """on_result sees each message in the calling thread."""
+    caller = threading.get_ident()
+    seen = []
+
+    def deliver(recipient):
+        if recipient == 2:
+            raise ValueError(recipient)
+
+    def on_result(index, error):
+        assert threading.get_ident() == caller
+        seen.append((index, error is None))
+
+    with Dispatcher(deliver, threads=3) as dispatcher:
+        dispatcher.map([(i,) for i in range(4)], on_result)
+
+    assert sorted(seen) == [(0, True), (1, True), (2, False), (3, True)]
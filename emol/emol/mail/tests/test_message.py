@@ -0,0 +1,67 @@
+"""Unit tests for compiled email templates and the message builder."""
+import email
+from email.header import decode_header, make_header
+
+import pytest
+
+from emol.mail.message import MessageBuilder
+from emol.mail.template import TEMPLATES, CompiledTemplate
+
+
+def test_templates_compiled():
+    """Every template compiles with its declared fields."""
+    assert TEMPLATES['card_reminder'].fields == frozenset(
+        ['discipline', 'expiry_days', 'expiry_date'])
+    assert TEMPLATES['waiver_expiry'].fields == frozenset()
+
+
+def test_template_validation():
+    """Placeholders must be plain names matching the declared fields."""
+    with pytest.raises(ValueError):
+        CompiledTemplate('bad', 'Subject', '{combatant.email}', ['combatant'])
+
+    with pytest.raises(ValueError):
+        CompiledTemplate('bad', 'Subject', '{card_url}', ['update_url'])
+
+    with pytest.raises(ValueError):
+        CompiledTemplate('bad', 'Subject', '{card_url', ['card_url'])
+
+
+def test_render():
+    """Rendering fills in the fields and needs all of them."""
+    subject, body = TEMPLATES['card_request'].render(card_url='https://card')
+    assert subject == 'Your authorization card'
+    assert 'https://card' in body
+
+    with pytest.raises(KeyError):
+        TEMPLATES['card_reminder'].render(discipline='Rapier')
+
+
+def test_build():
+    """Built messages are single part plain text."""
+    builder = MessageBuilder('eMoL <emol@example.com>', domain='example.com')
+    message = email.message_from_string(
+        builder.build('a@example.com', 'Subject', 'Body\n'))
+
+    assert not message.is_multipart()
+    assert message.get_content_type() == 'text/plain'
+    assert message['From'] == 'eMoL <emol@example.com>'
+    assert message['To'] == 'a@example.com'
+    assert message['Message-ID'].endswith('@example.com>')
+    assert message.get_payload() == 'Body\n'
+
+
+def test_build_unicode():
+    """Non-ASCII subjects and bodies are encoded."""
+    builder = MessageBuilder('eMoL <emol@example.com>', domain='example.com')
+    text = builder.build('a@example.com', 'Armoured Combat – reminder',
+                         'Tōrnament\n')
+    text.encode('ascii')
+
+    message = email.message_from_string(text)
+    assert str(make_header(decode_header(message['Subject']))) == \
+        'Armoured Combat – reminder'
+    assert message.get_payload(decode=True).decode('utf-8') == 'Tōrnament\n'
+
+    with pytest.raises(ValueError):
+        builder.build('a@example.com\nBcc: b@example.com', 'Subject', 'Body')
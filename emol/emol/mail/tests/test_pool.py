@@ -0,0 +1,148 @@
+"""Unit tests for the SMTP connection pool."""
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from emol.mail.pool import RateLimiter, SMTPPool
+
+
+class FakeSMTP(object):
+    """Stand-in for smtplib.SMTP that records what it's asked to do."""
+
+    connections = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.closed = False
+        self.drop = False
+        self.fail = None
+        FakeSMTP.connections.append(self)
+
+    def login(self, username, password):
+        pass
+
+    def noop(self):
+        if self.drop:
+            raise smtplib.SMTPServerDisconnected()
+        return 250, b'OK'
+
+    def sendmail(self, sender, recipients, message):
+        if self.drop:
+            raise smtplib.SMTPServerDisconnected()
+        if self.fail is not None:
+            error, self.fail = self.fail, None
+            raise error
+        self.sent.append(message)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A pool connecting to FakeSMTP."""
+    FakeSMTP.connections = []
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    yield SMTPPool('localhost', size=1, max_messages=3, keepalive=0)
+
+
+def test_reuse(pool):
+    """Connections are reused until their message cap."""
+    for i in range(4):
+        pool.send('a@example.com', ['b@example.com'], 'message')
+
+    assert [len(c.sent) for c in FakeSMTP.connections] == [3, 1]
+    assert FakeSMTP.connections[0].closed
+
+
+def test_reconnect(pool):
+    """A connection dropped while idle is replaced before sending."""
+    pool.send('a@example.com', ['b@example.com'], 'one')
+    FakeSMTP.connections[0].drop = True
+    pool.send('a@example.com', ['b@example.com'], 'two')
+
+    assert len(FakeSMTP.connections) == 2
+    assert FakeSMTP.connections[1].sent == ['two']
+
+
+def test_retry(pool):
+    """A send that loses the connection is retried on a new one."""
+    pool.send('a@example.com', ['b@example.com'], 'one')
+    FakeSMTP.connections[0].fail = smtplib.SMTPServerDisconnected()
+    pool.send('a@example.com', ['b@example.com'], 'two')
+
+    assert len(FakeSMTP.connections) == 2
+    assert FakeSMTP.connections[0].closed
+    assert FakeSMTP.connections[1].sent == ['two']
+
+
+def test_refused(pool):
+    """A refused message isn't retried and the connection is kept."""
+    pool.send('a@example.com', ['b@example.com'], 'one')
+    FakeSMTP.connections[0].fail = smtplib.SMTPDataError(554, 'refused')
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send('a@example.com', ['b@example.com'], 'two')
+    pool.send('a@example.com', ['b@example.com'], 'three')
+
+    assert len(FakeSMTP.connections) == 1
+    assert FakeSMTP.connections[0].sent == ['one', 'three']
+
+
+def test_batch(pool):
+    """A batch sends over one connection, opened on first use."""
+    with pool.batch():
+        assert FakeSMTP.connections == []
+        for i in range(3):
+            pool.send('a@example.com', ['b@example.com'], 'message')
+
+    assert len(FakeSMTP.connections) == 1
+    pool.close()
+    assert FakeSMTP.connections[0].closed
+
+
+def test_metrics(pool):
+    """Sent, failed and retried messages are counted."""
+    pool.send('a@example.com', ['b@example.com'], 'one')
+    FakeSMTP.connections[0].fail = smtplib.SMTPServerDisconnected()
+    pool.send('a@example.com', ['b@example.com'], 'two')
+    assert pool.metrics.snapshot() == {'sent': 2, 'failed': 0, 'retried': 1}
+
+    # A refused message fails without being retried
+    FakeSMTP.connections[1].fail = smtplib.SMTPDataError(554, 'refused')
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send('a@example.com', ['b@example.com'], 'three')
+
+    assert pool.metrics.snapshot() == {'sent': 2, 'failed': 1, 'retried': 1}
+
+
+def test_max_connections(monkeypatch):
+    """Threads share connections rather than open more than allowed."""
+    FakeSMTP.connections = []
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    pool = SMTPPool('localhost', size=2, max_connections=2)
+
+    def send(i):
+        pool.send('a@example.com', ['b@example.com'], 'message')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(send, range(40)))
+
+    assert len(FakeSMTP.connections) <= 2
+    assert sum(len(c.sent) for c in FakeSMTP.connections) == 40
+
+
+def test_rate_limiter():
+    """Events beyond the burst wait for the rate."""
+    limiter = RateLimiter(rate=50, burst=5)
+
+    start = time.monotonic()
+    for i in range(15):
+        limiter.acquire()
+
+    # 5 at once, then 10 more at 50 per second
+    assert time.monotonic() - start >= 0.18
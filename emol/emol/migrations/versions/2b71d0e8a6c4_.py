@@ -0,0 +1,36 @@
+"""Combatant list version counter for collection versioning
+
+Revision ID: 2b71d0e8a6c4
+Revises: 8f4a6c1e5d93
+Create Date: 2026-10-17 17:55:30.402187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b71d0e8a6c4'
+down_revision = '8f4a6c1e5d93'
+branch_labels = None
+depends_on = None
+
+config = sa.table(
+    'config',
+    sa.column('key', sa.String),
+    sa.column('value', sa.String),
+    sa.column('type', sa.Integer)
+)
+
+
+def upgrade():
+    # Seed the counter so that the first bumps don't race to insert it
+    op.bulk_insert(config, [
+        {'key': '_combatant_list_version', 'value': '1', 'type': 1}
+    ])
+
+
+def downgrade():
+    op.execute(
+        config.delete().where(config.c.key == '_combatant_list_version')
+    )
@@ -7,13 +7,17 @@ Anyone needing access to the database object should import db from here.
 from .anonymous_user import AnonymousUser
 from .authorization import Authorization
 from .card import Card, CardReminder
+from .card_view import CardView
 from .combatant import Combatant
 from .combatant_authorization import CombatantAuthorization
+from .combatant_list_entry import CombatantListEntry
 from .config import Config
 from .discipline import Discipline
 from .marshal import Marshal
 from .officer import Officer
+from .outbound_mail import OutboundMail
 from .privacy_acceptance import PrivacyAcceptance
+from .reminder_schedule import SentReminder
 from .role import Role
 from .update_request import UpdateRequest
 from .user import UserRole, User
@@ -25,13 +29,17 @@ __all__ = [
     'Authorization',
     'Card',
     'CardReminder',
+    'CardView',
     'Combatant',
+    'CombatantListEntry',
     'Config',
     'Discipline',
     'Marshal',
     'Officer',
+    'OutboundMail',
     'PrivacyAcceptance',
     'Role',
+    'SentReminder',
     'UpdateRequest',
     'User',
     'Waiver',
@@ -4,7 +4,6 @@
 from flask import current_app as app
 
 from .discipline import Discipline
-from .named_tuples import NameSlugTuple
 
 __all__ = ['Authorization']
 
@@ -51,6 +50,7 @@ class Authorization(app.db.Model):
             Authorization object
 
         Raises:
+            NoResultFound if there is no such authorization
             ValueError if discipline or authorization can't be determined
 
         """
@@ -58,22 +58,29 @@ class Authorization(app.db.Model):
         if isinstance(authorization, Authorization):
             return authorization
 
-        discipline = Discipline.find(discipline)
-
-        if isinstance(authorization, str):
-            return Authorization.query.filter(
-                Authorization.discipline_id == discipline.id).filter(
-                Authorization.slug == authorization).one()
-        elif isinstance(authorization, int):
-            return Authorization.query.filter(
-                Authorization.discipline_id == discipline.id).filter(
-                Authorization.id == authorization).one()
-        else:
+        if not isinstance(authorization, (str, int)):
             raise ValueError('Can''t determine authorization')
 
+        discipline_id = Discipline.find(discipline).id
+        return app.reference_data.resolve(
+            Authorization,
+            lambda data: data.authorization(discipline_id, authorization),
+            'authorization {0} for discipline {1}'.format(
+                authorization, discipline_id)
+        )
+
     @classmethod
     def template_list(cls, discipline):
-        """Get a list of authorization names and slugs for template use."""
-        return [NameSlugTuple(slug=a.slug, name=a.name)
-                for a in Authorization.query.all() if
-                a.discipline.slug == discipline]
+        """Get a list of authorization names and slugs for template use.
+
+        Served from the reference data registry without a query.
+
+        Args:
+            discipline: A discipline slug
+
+        Returns:
+            Tuple of NameSlugTuple, empty for an unknown discipline
+
+        """
+        entry = app.reference_data.current().template_list(discipline)
+        return () if entry is None else entry.authorizations
@@ -23,7 +23,7 @@ from flask import current_app as app
 from flask_login import current_user
 
 from emol.mail import Emailer
-from emol.mail.email_templates import EMAIL_TEMPLATES
+from emol.mail.template import TEMPLATES
 from emol.utility.date import add_years, today, DATE_FORMAT, LOCAL_TZ
 
 from .authorization import Authorization
@@ -91,7 +91,7 @@ class Card(app.db.Model):
         secondary='warrant'
     )
 
-    card_date = app.db.Column(app.db.Date)
+    card_date = app.db.Column(app.db.Date, index=True)
 
     @classmethod
     def create(cls, combatant, discipline):
@@ -138,6 +138,41 @@ class Card(app.db.Model):
         """Number of days until this card expires."""
         return (self.expiry_date - today()).days
 
+    def mail_reminder(self, is_expiry):
+        """Send the card's expiry reminder or expiry notice.
+
+        Args:
+            is_expiry: True for the expiry notice
+
+        Returns:
+            True if the email was sent
+
+        """
+        return Emailer().send_email(*self.reminder_message(is_expiry))
+
+    def reminder_message(self, is_expiry):
+        """Build the card's expiry reminder or expiry notice.
+
+        Args:
+            is_expiry: True for the expiry notice
+
+        Returns:
+            A tuple of (recipient, subject, body)
+
+        """
+        if is_expiry is True:
+            subject, body = TEMPLATES['card_expiry'].render(
+                discipline=self.discipline.name
+            )
+        else:
+            subject, body = TEMPLATES['card_reminder'].render(
+                expiry_days=self.expiry_days,
+                expiry_date=self.expiry_date_str,
+                discipline=self.discipline.name
+            )
+
+        return self.combatant.email, subject, body
+
     def add_authorization(self, authorization):
         """Add an authorization to this card.
 
@@ -154,6 +189,7 @@ class Card(app.db.Model):
             return
 
         self.authorizations.append(authorization)
+        self.combatant.card_changed()
         app.db.session.commit()
 
     def remove_authorization(self, authorization):
@@ -172,6 +208,7 @@ class Card(app.db.Model):
             return
 
         self.authorizations.remove(authorization)
+        self.combatant.card_changed()
         app.db.session.commit()
 
     def has_authorization(self, authorization):
@@ -201,6 +238,7 @@ class Card(app.db.Model):
             return
 
         self.warrants.append(marshal)
+        self.combatant.card_changed()
         app.db.session.commit()
 
     def remove_warrant(self, marshal):
@@ -219,6 +257,7 @@ class Card(app.db.Model):
             return
 
         self.warrants.remove(marshal)
+        self.combatant.card_changed()
         app.db.session.commit()
 
     def has_warrant(self, marshal):
@@ -244,6 +283,12 @@ class Card(app.db.Model):
 
         # Update the card date
         self.card_date = card_date or today()
+        self.combatant.card_changed()
+
+        # The daily check works out reminders from card_date itself
+        if app.config.get('REMINDER_SCHEDULE', 'stored') == 'computed':
+            app.db.session.commit()
+            return
 
         # Create the reminder for expiry day
         expiry_date = (self.card_date + relativedelta(years=2))
@@ -298,24 +343,7 @@ class CardReminder(app.db.Model):
 
     def mail(self):
         """Send reminder or expiry email as appropriate to this instance."""
-
-        discipline = self.card.discipline
-        if self.is_expiry is True:
-            template = EMAIL_TEMPLATES.get('card_expiry')
-            subject = template.get('subject')
-            body = template.get('body').format(
-                discipline=discipline.name
-            )
-        else:
-            template = EMAIL_TEMPLATES.get('card_reminder')
-            subject = template.get('subject')
-            body = template.get('body').format(
-                expiry_days=self.card.expiry_days,
-                expiry_date=self.card.expiry_date_str,
-                discipline=discipline.name
-            )
-
-        return Emailer().send_email(self.card.combatant.email, subject, body)
+        return self.card.mail_reminder(self.is_expiry)
 
 
     @classmethod
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""View model for a combatant's authorization card page.
+
+Rendering card.html straight from the models costs a query per discipline,
+authorization and marshal (Combatant.get_card, Card.has_authorization,
+Card.has_warrant). CardView loads everything the page shows up front in a
+fixed number of queries, however many disciplines, authorizations and
+warrants there are, and checks membership against sets of ids.
+
+"""
+
+# standard library imports
+from collections import namedtuple
+
+# third-party imports
+from sqlalchemy.orm import joinedload, selectinload
+
+# application imports
+from .card import Card
+from .combatant import Combatant
+from .discipline import Discipline
+
+__all__ = ['CardView']
+
+# An authorization or warrant line on the card
+CardItem = namedtuple('CardItem', ['name', 'held'])
+
+# The card section for one discipline
+CardSection = namedtuple(
+    'CardSection',
+    ['name', 'slug', 'expiry_date', 'authorizations', 'marshals']
+)
+
+
+class CardView(object):
+    """Everything the card page shows for a combatant.
+
+    Attributes:
+        combatant: The Combatant, with cards, authorizations, warrants and
+            waiver loaded
+        legal_name: The combatant's legal name
+        sca_name: The combatant's SCA name
+        waiver_expiry: The combatant's waiver expiry date, or None
+        sections: List of CardSection, one per discipline the combatant
+            holds a card in, in discipline order
+
+    """
+
+    def __init__(self, combatant, disciplines):
+        """Constructor.
+
+        Args:
+            combatant: The Combatant, with relationships loaded
+            disciplines: All Disciplines, with authorizations and marshals
+                loaded
+
+        """
+        self.combatant = combatant
+        self.legal_name = combatant.decrypted.get('legal_name')
+        self.sca_name = combatant.sca_name
+        self.waiver_expiry = combatant.waiver_expiry
+
+        cards = {card.discipline_id: card for card in combatant.cards}
+
+        self.sections = []
+        for discipline in disciplines:
+            card = cards.get(discipline.id)
+            if card is None:
+                continue
+
+            authorizations = set(a.id for a in card.authorizations)
+            warrants = set(m.id for m in card.warrants)
+
+            self.sections.append(CardSection(
+                name=discipline.name,
+                slug=discipline.slug,
+                expiry_date=card.expiry_date,
+                authorizations=[
+                    CardItem(name=a.name, held=a.id in authorizations)
+                    for a in discipline.authorizations
+                ],
+                marshals=[
+                    CardItem(name=m.name, held=m.id in warrants)
+                    for m in discipline.marshals
+                ]
+            ))
+
+    @classmethod
+    def load(cls, card_id):
+        """Load the card view for a card ID.
+
+        Args:
+            card_id: A combatant's card ID
+
+        Returns:
+            A CardView, or None if no combatant has the card ID
+
+        """
+        combatant = Combatant.query.filter(
+            Combatant.card_id == card_id
+        ).options(
+            joinedload(Combatant.waiver),
+            selectinload(Combatant.cards).selectinload(Card.authorizations),
+            selectinload(Combatant.cards).selectinload(Card.warrants)
+        ).one_or_none()
+
+        if combatant is None:
+            return None
+
+        disciplines = Discipline.query.options(
+            selectinload(Discipline.authorizations),
+            selectinload(Discipline.marshals)
+        ).order_by(Discipline.id).all()
+
+        return cls(combatant, disciplines)
+
+    def to_dict(self):
+        """Get the card as a JSON serializable dict.
+
+        Returns:
+            Dict of the card's contents, dates as ISO strings
+
+        """
+        def iso(value):
+            return None if value is None else value.isoformat()
+
+        def items(card_items):
+            return [dict(name=i.name, held=i.held) for i in card_items]
+
+        return dict(
+            card_id=self.combatant.card_id,
+            legal_name=self.legal_name,
+            sca_name=self.sca_name,
+            waiver_expiry=iso(self.waiver_expiry),
+            sections=[
+                dict(
+                    name=s.name,
+                    slug=s.slug,
+                    expiry_date=iso(s.expiry_date),
+                    authorizations=items(s.authorizations),
+                    marshals=items(s.marshals)
+                )
+                for s in self.sections
+            ]
+        )
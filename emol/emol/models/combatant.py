@@ -7,6 +7,8 @@ authorizations in a discipline and needs an authorization card to show for them.
 """
 
 # standard library imports
+import base64
+import json
 import logging
 import re
 from datetime import date, datetime
@@ -16,18 +18,22 @@ from collections import namedtuple
 from flask import url_for, current_app as app
 from flask_login import current_user
 from slugify import slugify
+from sqlalchemy import event
 
 # application imports
 from emol.decorators import role_required
 from emol.exception.combatant import CombatantDoesNotExist
 from emol.exception.privacy_acceptance import PrivacyPolicyNotAccepted
 from emol.mail import Emailer
-from emol.utility.database import default_uuid
+from emol.utility.database import chunked, default_uuid
 from emol.utility.date import add_years, DATE_FORMAT, string_to_date
-from emol.utility.hash import Sha256
+from emol.utility.hash import BlindIndex, Sha256
+from emol.utility.payload import pack_record, pack_sections
 from emol.utility.value_tools import is_blank
 
 from .card import Card
+from .combatant_list_entry import CombatantListEntry
+from .decrypted_info import BLOB, DecryptedInfo
 from .discipline import Discipline
 from .privacy_acceptance import PrivacyAcceptance
 from .waiver import Waiver
@@ -43,14 +49,25 @@ class Combatant(app.db.Model):
         uuid: A reference to the record with no intrinsic meaning
         card_id: A slug-like identifier for URLs
         last_update: Timestamp for last update of this record
+        card_version: Version of the data shown on the combatant's card
+        card_updated: When the data shown on the card last changed
         email: The combatant's email address
         sca_name: The combatant's SCA name
         encrypted: Encrypted blob of the combatant's personal information
+        encrypted_fields: The combatant's personal information encrypted in
+            field groups (see DecryptedInfo)
+        encrypted_payload: The combatant's personal information as a compact
+            binary payload (see DecryptedInfo)
+        legal_name_index: Blind index of the legal name
+        member_number_index: Blind index of the member number
+        postal_code_index: Blind index of the postal code
+        legal_name_order: Position in legal name order
 
     Backrefs:
         privacy_acceptance: The combatant's PrivacyAcceptance record
         cards: The combatant's authorization cards
         waiver: The combatant's waiver on file
+        list_entry: The combatant's CombatantListEntry
 
     Properties:
         decrypted:  Provides access to the combatant's decrypted
@@ -66,6 +83,11 @@ class Combatant(app.db.Model):
 
     last_update = app.db.Column(app.db.DateTime)
 
+    # Bumped whenever anything shown on the card changes (see card_changed)
+    card_version = app.db.Column(
+        app.db.Integer, default=0, server_default='0', nullable=False)
+    card_updated = app.db.Column(app.db.DateTime)
+
     # Data columns that are not encrypted
     email = app.db.Column(app.db.String(255), unique=True)
     sca_name = app.db.Column(app.db.String(255))
@@ -80,6 +102,12 @@ class Combatant(app.db.Model):
         backref='combatant',
         uselist=False
     )
+    list_entry = app.db.relationship(
+        'CombatantListEntry',
+        cascade='all, delete-orphan',
+        backref='combatant',
+        uselist=False
+    )
 
     # Data fields for creating combatants
     # Anything marked True is required
@@ -114,8 +142,57 @@ class Combatant(app.db.Model):
         'member_expiry'
     ]
 
-    # Personal data encrypted in the database, cleartext in memory
+    # Personal data encrypted in the database, cleartext in memory.
+    # One of these holds the data depending on layout (see DecryptedInfo)
     encrypted = app.db.Column(app.db.Text)
+    encrypted_fields = app.db.Column(app.db.Text)
+    encrypted_payload = app.db.Column(app.db.LargeBinary)
+
+    # Groups of _encrypt_info fields encrypted together in the fields layout.
+    # Fields that are read together belong together.
+    _field_groups = {
+        'name': ['legal_name'],
+        'contact': ['phone'],
+        'address': ['address1', 'address2', 'city', 'province', 'postal_code'],
+        'membership': ['dob', 'member_number', 'member_expiry']
+    }
+
+    # Compact payload version => (field order, group order).
+    # Stored payloads depend on these, never change an existing version.
+    _payload_formats = {
+        1: (
+            (
+                'legal_name', 'phone', 'address1', 'address2', 'city',
+                'province', 'postal_code', 'dob', 'member_number',
+                'member_expiry'
+            ),
+            ('name', 'contact', 'address', 'membership')
+        )
+    }
+    _payload_version = 1
+
+    # Blind indexes for exact-match lookups on encrypted fields
+    # (see BlindIndex and find_by_blind_index)
+    legal_name_index = app.db.Column(app.db.String(64), index=True)
+    member_number_index = app.db.Column(app.db.String(64), index=True)
+    postal_code_index = app.db.Column(app.db.String(64), index=True)
+
+    # Encrypted field => (blind index column, strip all whitespace)
+    _blind_indexes = {
+        'legal_name': ('legal_name_index', False),
+        'member_number': ('member_number_index', True),
+        'postal_code': ('postal_code_index', True)
+    }
+
+    # Position of the combatant in legal name order, for sorting lists
+    # without decrypting them. Reveals order only, never content.
+    # Positions are spaced out so new names fit between existing ones,
+    # and may be shared until the order is rebuilt. See place_in_name_order.
+    legal_name_order = app.db.Column(app.db.Integer, index=True)
+
+    # Space between positions after rebuild_name_order
+    _name_order_gap = 1024
+
     # Decrypted data after load
     _decrypted = None
 
@@ -127,21 +204,74 @@ class Combatant(app.db.Model):
     def decrypted(self):
         """Accessor for encrypted data.
 
-        Populate the _decrypted attribute with either a blank slate or actual
-        decrypted data.
+        Fields are decrypted as they are accessed, see DecryptedInfo.
 
         Returns:
-            The decrypted data dictionary
+            The decrypted data as a DecryptedInfo
 
         """
         if self._decrypted is None:
-            if self.encrypted is None:
-                self._decrypted = {}
-            else:
-                self._decrypted = app.cipher().decrypt_json(self.encrypted)
+            self._decrypted = DecryptedInfo(self)
 
         return self._decrypted
 
+    @property
+    def encryption_layout(self):
+        """The layout the personal data is stored in.
+
+        Returns:
+            'payload', 'blob', 'fields', or None if there is no personal data
+
+        """
+        if self.encrypted_payload is not None:
+            return 'payload'
+        elif self.encrypted is not None:
+            return 'blob'
+        elif self.encrypted_fields is not None:
+            return 'fields'
+
+        return None
+
+    @classmethod
+    def decrypt_many(cls, combatants, fields=None):
+        """Decrypt personal information for a collection of combatants.
+
+        Populates the decrypted property for every combatant in one pass
+        rather than one record at a time as each is touched. Use this before
+        iterating over a query result that reads decrypted data.
+
+        Args:
+            combatants: Iterable of Combatant objects
+            fields: Optional list of the fields that will be read. Records
+                encrypted in groups only decrypt the groups holding them.
+
+        Returns:
+            The combatants, as a list
+
+        """
+        combatants = list(combatants)
+
+        pending = []
+        for combatant in combatants:
+            info = combatant.decrypted
+            groups = info.groups_for(fields)
+            pending.extend(
+                (info, group, ciphertext)
+                for group, ciphertext in info.pending(groups)
+            )
+
+        plaintexts = app.cipher().decrypt_raw_batch(p[2] for p in pending)
+        for (info, group, _), plaintext in zip(pending, plaintexts):
+            info.install(group, info.parse(group, plaintext), cache=True)
+
+        return combatants
+
+    def _invalidate_decrypted_cache(self):
+        """Drop this record's entries from the decrypted record cache."""
+        for group in [BLOB] + list(self._field_groups):
+            app.decrypted_cache.invalidate(
+                (self.id, self.last_update, group))
+
     def update_encrypted(self):
         """Encrypt the decrypted data.
 
@@ -149,11 +279,234 @@ class Combatant(app.db.Model):
         capture any changes.
 
         """
+        # The record is about to change, drop the cached copy
+        self._invalidate_decrypted_cache()
+
         self.last_update = datetime.now()
+        self.write_encrypted()
+
+    def write_encrypted(self, rewrite=False):
+        """Write decrypted data back to the encrypted columns.
+
+        The layout written depends on config.py. EMOL_COMPACT_PAYLOAD selects
+        the compact binary payload over base64 JSON text, and
+        EMOL_FIELD_ENCRYPTION encrypts field groups separately rather than
+        the whole record at once. A record stored any other way is converted.
+
+        When field groups are encrypted separately only the groups that were
+        changed are encrypted again, unless the record is being converted or
+        rewrite is True.
+
+        Args:
+            rewrite: Encrypt everything again even if nothing changed
+
+        """
+        info = self.decrypted
+        split = app.config.get('EMOL_FIELD_ENCRYPTION', False)
+        compact = app.config.get('EMOL_COMPACT_PAYLOAD', False)
+        layout = 'payload' if compact else 'fields' if split else 'blob'
+        cipher = app.cipher()
+
+        ciphertexts = {}
+        if split and not rewrite and self.encryption_layout == layout:
+            stored = info.stored()
+            if BLOB not in stored:
+                ciphertexts = dict(stored)
+
+        if ciphertexts:
+            groups = set(info.dirty)
+        else:
+            info.load_all()
+            groups = set(self._field_groups)
+
+        if split:
+            for group in groups:
+                ciphertexts[group] = cipher.encrypt_raw(
+                    self._serialize(group, info.group_data(group), compact))
+        else:
+            ciphertexts = {
+                BLOB: cipher.encrypt_raw(
+                    self._serialize(BLOB, dict(info), compact))
+            }
+
+        self.encrypted = self.encrypted_fields = self.encrypted_payload = None
+        if compact:
+            order = self._payload_formats[self._payload_version][1]
+            self.encrypted_payload = pack_sections(self._payload_version, {
+                0 if group is BLOB else order.index(group) + 1: ciphertext
+                for group, ciphertext in ciphertexts.items()
+            })
+        elif split:
+            self.encrypted_fields = json.dumps({
+                group: base64.b64encode(ciphertext).decode('ascii')
+                for group, ciphertext in ciphertexts.items()
+            }, sort_keys=True)
+        else:
+            self.encrypted = base64.b64encode(ciphertexts[BLOB])
+
+        written = [f for g in groups for f in self._field_groups[g]]
+        name_index = self.legal_name_index
+        self.update_blind_indexes(written)
+        if 'legal_name' in written and (
+                self.legal_name_order is None or
+                self.legal_name_index != name_index):
+            self.place_in_name_order()
+
+        self._decrypted = None
+
+    def _serialize(self, group, data, compact):
+        """Serialize decrypted data for encryption.
+
+        Args:
+            group: Group name, or BLOB for a whole record
+            data: Dict of field values
+            compact: Use the compact payload format rather than JSON
+
+        Returns:
+            The serialized data as bytes
+
+        """
+        if not compact:
+            return json.dumps(data).encode('utf-8')
+
+        fields = self.decrypted.payload_fields(group, self._payload_version)
+        return pack_record(data, fields)
+
+    def update_blind_indexes(self, fields=None):
+        """Recompute the blind index columns from the decrypted data.
+
+        Args:
+            fields: Optional list of changed fields. Only their blind indexes
+                are recomputed.
+
+        """
+        for field, (column, strip_spaces) in self._blind_indexes.items():
+            if fields is not None and field not in fields:
+                continue
+
+            setattr(
+                self,
+                column,
+                BlindIndex.generate(self.decrypted.get(field), strip_spaces)
+            )
+
+    @classmethod
+    def name_sort_key(cls, legal_name):
+        """Key for ordering combatants by legal name."""
+        return BlindIndex.normalize(legal_name or '')
+
+    def place_in_name_order(self):
+        """Set legal_name_order for this combatant's current legal name.
+
+        Binary search the combatant list entries for the position, fetching
+        one entry per step by offset along the legal_name_order index and
+        decrypting only the legal names visited, then take the middle of the
+        gap there. Nothing else moves and nothing is locked. If there is no
+        gap left, or a combatant saved at the same time took the same gap,
+        the position is shared until the daily check rebuilds the order.
 
-        if self.decrypted is not None:
-            self.encrypted = app.cipher().encrypt_json(self.decrypted)
-            self._decrypted = None
+        """
+        key = self.name_sort_key(self.decrypted.get('legal_name'))
+
+        placed = (
+            CombatantListEntry.legal_name_order.isnot(None),
+            CombatantListEntry.combatant_id != self.id
+        )
+        total = app.db.session.query(
+            app.db.func.count(CombatantListEntry.id)).filter(*placed).scalar()
+        ordered = app.db.session.query(
+            CombatantListEntry.legal_name_order,
+            CombatantListEntry.legal_name
+        ).filter(*placed).order_by(
+            CombatantListEntry.legal_name_order,
+            CombatantListEntry.combatant_id
+        )
+
+        visited = {}
+
+        def entry(index):
+            if index not in visited:
+                visited[index] = ordered.offset(index).limit(1).first()
+            return visited[index]
+
+        cipher = app.cipher()
+        low, high = 0, total
+        while low < high:
+            middle = (low + high) // 2
+            current = entry(middle)
+            if current is None:
+                # Entries were removed meanwhile
+                high = middle
+                continue
+
+            name = cipher.decrypt_raw(current.legal_name)
+            other = None if name is None else bytes(name).decode('utf-8')
+            if self.name_sort_key(other) <= key:
+                low = middle + 1
+            else:
+                high = middle
+
+        before = entry(low - 1) if low > 0 else None
+        after = entry(low)
+        previous = before.legal_name_order if before is not None else 0
+        if after is not None:
+            following = after.legal_name_order
+        else:
+            following = previous + 2 * self._name_order_gap
+
+        if following - previous > 1:
+            self.legal_name_order = (previous + following) // 2
+        else:
+            self.legal_name_order = previous
+
+    @classmethod
+    def name_order_stale(cls):
+        """Check whether any combatants share a legal_name_order.
+
+        Returns:
+            True if the order should be rebuilt
+
+        """
+        shared = app.db.session.query(cls.legal_name_order).filter(
+            cls.legal_name_order.isnot(None)
+        ).group_by(
+            cls.legal_name_order
+        ).having(app.db.func.count(cls.id) > 1).first()
+
+        return shared is not None
+
+    @classmethod
+    def rebuild_name_order(cls, chunk_size=500):
+        """Recompute legal_name_order for every combatant.
+
+        Positions are spaced _name_order_gap apart and copied to the list
+        entries.
+
+        Args:
+            chunk_size: Number of combatants to decrypt at a time
+
+        """
+        keys = []
+        for combatants in chunked(cls.query, cls.id, chunk_size):
+            for combatant in cls.decrypt_many(combatants, ['legal_name']):
+                keys.append((
+                    cls.name_sort_key(combatant.decrypted.get('legal_name')),
+                    combatant.id
+                ))
+            app.db.session.expunge_all()
+
+        keys.sort()
+        positions = [
+            (combatant_id, (index + 1) * cls._name_order_gap)
+            for index, (_, combatant_id) in enumerate(keys)
+        ]
+        app.db.session.bulk_update_mappings(cls, [
+            dict(id=combatant_id, legal_name_order=position)
+            for combatant_id, position in positions
+        ])
+        CombatantListEntry.set_name_order(positions)
+
+        app.db.session.commit()
 
     # Get methods
 
@@ -257,6 +610,51 @@ class Combatant(app.db.Model):
 
         return combatant
 
+    @classmethod
+    def find_by_blind_index(cls, field, value):
+        """Find combatants by exact match on an encrypted field.
+
+        Args:
+            field: One of the fields in _blind_indexes
+            value: The value to match
+
+        Returns:
+            A list of Combatant objects
+
+        Raises:
+            ValueError if the field has no blind index
+
+        """
+        if field not in cls._blind_indexes:
+            raise ValueError('No blind index for {0}'.format(field))
+
+        column, strip_spaces = cls._blind_indexes[field]
+        index = BlindIndex.generate(value, strip_spaces)
+        if index is None:
+            return []
+
+        return cls.query.filter(getattr(cls, column) == index).all()
+
+    @classmethod
+    def get_by_member_number(cls, member_number):
+        """Get a combatant by SCA member number.
+
+        Args:
+            member_number: The combatant's member number
+
+        Returns:
+            A Combatant object
+
+        Raises:
+            CombatantDoesNotExist if no record is found
+
+        """
+        combatants = cls.find_by_blind_index('member_number', member_number)
+        if not combatants:
+            raise CombatantDoesNotExist(member_number)
+
+        return combatants[0]
+
     @property
     def name(self):
         """Get a combatant's name.
@@ -269,6 +667,34 @@ class Combatant(app.db.Model):
         """
         return self.sca_name or self.decrypted.get('legal_name')
 
+    def card_changed(self):
+        """Note a change to anything shown on the combatant's card.
+
+        Bumps card_version, stamps card_updated and drops the rendered card
+        from the card cache. Call before committing the change.
+
+        """
+        self.card_version = (self.card_version or 0) + 1
+        self.card_updated = datetime.utcnow()
+        if self.card_id:
+            app.card_cache.invalidate(self.card_id)
+
+    @classmethod
+    def card_state(cls, card_id):
+        """Get a card's version without loading the combatant.
+
+        Args:
+            card_id: A card ID
+
+        Returns:
+            A tuple of (card_version, card_updated), or None if no combatant
+            has the card ID
+
+        """
+        row = app.db.session.query(cls.card_version, cls.card_updated).filter(
+            cls.card_id == card_id).first()
+        return None if row is None else tuple(row)
+
     def generate_card_id(self):
         """Generate a unique card ID for the combatant.
 
@@ -293,6 +719,8 @@ class Combatant(app.db.Model):
         hashed = Sha256.generate_hash(self.decrypted.get('legal_name'))
         count = 0
 
+        # The card is moving, drop the page at the old card ID
+        self.card_changed()
         self.card_id = ''
 
         if not self.sca_name:
@@ -328,6 +756,7 @@ class Combatant(app.db.Model):
                 app.logger.debug('card id {0} is OK, using it'.format(card_id))
                 self.card_id = card_id
 
+        CombatantListEntry.refresh(self)
         app.db.session.commit()
         return self.card_id
 
@@ -407,6 +836,7 @@ class Combatant(app.db.Model):
                 # record, send an email, etc.
                 PrivacyAcceptance.create(self)
 
+        self.card_changed()
         app.db.session.commit()
 
         return self
@@ -451,7 +881,12 @@ class Combatant(app.db.Model):
             else:
                 setattr(self, field, value)
 
+        # Writing the encrypted data drops the decrypted values, so hand the
+        # list entry the ones in memory rather than decrypting them again
+        decrypted = self.decrypted
         self.update_encrypted()
+        CombatantListEntry.refresh(self, decrypted)
+        self.card_changed()
 
         # Combatant changed SCA name
         name_changed = original_sca_name != self.sca_name
@@ -598,4 +1033,10 @@ class Combatant(app.db.Model):
         if self.waiver is not None:
             return self.waiver.expiry_date
 
-        return None
\ No newline at end of file
+        return None
+
+
+@event.listens_for(Combatant, 'after_delete')
+def _combatant_deleted(mapper, connection, combatant):
+    """Drop a deleted combatant's decrypted data from the cache."""
+    combatant._invalidate_decrypted_cache()
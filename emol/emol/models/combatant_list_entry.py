@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""Combatant list read model.
+
+One row per combatant holding exactly what the combatant list shows, so the
+list can be served from this table alone without touching the combatant,
+privacy acceptance or encrypted personal data columns.
+
+"""
+
+# standard library imports
+
+# third-party imports
+from flask import current_app as app
+from sqlalchemy import bindparam, event
+from sqlalchemy.orm import Session
+
+# application imports
+from emol.utility.database import chunked
+
+from .config import Config
+
+__all__ = ['CombatantListEntry']
+
+# Config counter bumped by every change to the list, see collection_version
+VERSION_KEY = '_combatant_list_version'
+
+
+class CombatantListEntry(app.db.Model):
+    """A combatant's entry in the combatant list.
+
+    Maintained by refresh, which is called wherever the listed data changes:
+    Combatant.update_info, and Combatant.generate_card_id which is how
+    PrivacyAcceptance.resolve records acceptance. Deleted along with the
+    combatant. Combatants saved before the table existed get their entries
+    from fill, which the combatant list and the daily check call when any
+    are missing.
+
+    Attributes:
+        id: Identity PK for the table
+        combatant_id: ID of the combatant
+        uuid: The combatant's UUID
+        sca_name: The combatant's SCA name
+        card_id: The combatant's card ID
+        accepted_privacy_policy: Whether the combatant accepted the policy
+        legal_name: The combatant's legal name, encrypted on its own
+        legal_name_index: Blind index of the legal name, for search
+        legal_name_order: Position in legal name order, for sorting
+
+    """
+
+    id = app.db.Column(app.db.Integer, primary_key=True)
+    combatant_id = app.db.Column(
+        app.db.Integer,
+        app.db.ForeignKey('combatant.id', ondelete='CASCADE'),
+        unique=True,
+        nullable=False
+    )
+
+    uuid = app.db.Column(app.db.String(36), index=True)
+    sca_name = app.db.Column(app.db.String(255), index=True)
+    card_id = app.db.Column(app.db.String(255), index=True)
+    accepted_privacy_policy = app.db.Column(
+        app.db.Boolean, default=False, nullable=False)
+
+    legal_name = app.db.Column(app.db.LargeBinary)
+    legal_name_index = app.db.Column(app.db.String(64), index=True)
+    legal_name_order = app.db.Column(app.db.Integer, index=True)
+
+    def __repr__(self):
+        """Printable representation."""
+        return '<CombatantListEntry {0.combatant_id}: {0.sca_name}>'.format(
+            self)
+
+    @classmethod
+    def refresh(cls, combatant, decrypted=None):
+        """Create or update the entry for a combatant.
+
+        The legal name is only encrypted again if it changed.
+
+        Args:
+            combatant: The Combatant
+            decrypted: The combatant's decrypted data to read the legal name
+                from, defaults to combatant.decrypted
+
+        Returns:
+            The CombatantListEntry
+
+        """
+        entry = combatant.list_entry
+        if entry is None:
+            entry = cls(combatant=combatant)
+            app.db.session.add(entry)
+
+        entry.uuid = combatant.uuid
+        entry.sca_name = combatant.sca_name
+        entry.card_id = combatant.card_id
+        entry.accepted_privacy_policy = combatant.accepted_privacy_policy
+        entry.legal_name_order = combatant.legal_name_order
+
+        if entry.legal_name is None or (
+                entry.legal_name_index != combatant.legal_name_index):
+            if decrypted is None:
+                decrypted = combatant.decrypted
+            legal_name = decrypted.get('legal_name')
+            entry.legal_name = app.cipher().encrypt_raw(
+                None if legal_name is None else legal_name.encode('utf-8'))
+            entry.legal_name_index = combatant.legal_name_index
+
+        return entry
+
+    @classmethod
+    def decrypt_names(cls, entries):
+        """Decrypt the legal names of a list of entries in one batch.
+
+        Args:
+            entries: List of CombatantListEntry
+
+        Returns:
+            List of legal names in the same order
+
+        """
+        plaintexts = app.cipher().decrypt_raw_batch(
+            e.legal_name for e in entries)
+        return [None if p is None else bytes(p).decode('utf-8')
+                for p in plaintexts]
+
+    @classmethod
+    def set_name_order(cls, positions):
+        """Copy rebuilt Combatant.legal_name_order values to the entries.
+
+        Only entries whose position changed are updated.
+
+        Args:
+            positions: List of (combatant ID, legal_name_order)
+
+        """
+        current = dict(app.db.session.query(
+            cls.combatant_id, cls.legal_name_order))
+        changed = [
+            dict(entry_combatant_id=combatant_id, entry_order=position)
+            for combatant_id, position in positions
+            if combatant_id in current and current[combatant_id] != position
+        ]
+        if not changed:
+            return
+
+        app.db.session.execute(
+            cls.__table__.update().where(
+                cls.combatant_id == bindparam('entry_combatant_id')
+            ).values(
+                legal_name_order=bindparam('entry_order')
+            ),
+            changed
+        )
+        Config.bump_counter(VERSION_KEY)
+
+    @classmethod
+    def collection_version(cls):
+        """Get a version identifier for the whole list.
+
+        A counter in Config, bumped in the same transaction as every flush
+        that adds, changes or removes an entry (see _list_changed) and by
+        set_name_order. Costs one query by primary key.
+
+        Returns:
+            The version as a string
+
+        """
+        return Config.counter(VERSION_KEY) or '0'
+
+    @classmethod
+    def incomplete(cls):
+        """Check whether any combatant has no entry.
+
+        Returns:
+            True if fill has entries to create
+
+        """
+        # Combatant imports this module
+        from .combatant import Combatant
+
+        missing = app.db.session.query(Combatant.id).outerjoin(
+            cls, cls.combatant_id == Combatant.id
+        ).filter(cls.id.is_(None)).first()
+
+        return missing is not None
+
+    @classmethod
+    def fill(cls, chunk_size=500):
+        """Create the entries of combatants that have none.
+
+        Args:
+            chunk_size: Number of combatants to process per transaction
+
+        Returns:
+            Number of entries created
+
+        """
+        from .combatant import Combatant
+
+        missing = Combatant.query.outerjoin(
+            cls, cls.combatant_id == Combatant.id
+        ).filter(cls.id.is_(None))
+
+        count = 0
+        for combatants in chunked(missing, Combatant.id, chunk_size):
+            for combatant in Combatant.decrypt_many(combatants, ['legal_name']):
+                cls.refresh(combatant)
+
+            app.db.session.commit()
+            count += len(combatants)
+
+        return count
+
+    @classmethod
+    def rebuild(cls, chunk_size=500):
+        """Refresh the entry for every combatant.
+
+        Args:
+            chunk_size: Number of combatants to process per transaction
+
+        Returns:
+            Number of entries refreshed
+
+        """
+        # Combatant imports this module
+        from .combatant import Combatant
+
+        count = 0
+        for combatants in chunked(Combatant.query, Combatant.id, chunk_size):
+            for combatant in Combatant.decrypt_many(combatants, ['legal_name']):
+                cls.refresh(combatant)
+
+            app.db.session.commit()
+            app.db.session.expunge_all()
+            count += len(combatants)
+
+        return count
+
+
+@event.listens_for(Session, 'before_flush')
+def _list_changed(session, flush_context, instances):
+    """Bump the list version when a flush changes any entry."""
+    changed = any(
+        isinstance(instance, CombatantListEntry)
+        for instance in session.new.union(session.deleted)
+    ) or any(
+        isinstance(instance, CombatantListEntry) and
+        session.is_modified(instance, include_collections=False)
+        for instance in session.dirty
+    )
+    if changed:
+        Config.bump_counter(VERSION_KEY)
@@ -3,18 +3,33 @@
 
 General storage as key-value pairs for config items
 
+Values are read through a per-process cache of every config item, already
+converted to their types. A version counter stored alongside the items is
+bumped by every Config.set. Each process checks it at most once every
+CONFIG_CHECK_INTERVAL seconds and reloads everything when it has moved; a
+process sees its own writes at once.
+
 """
 
 # standard library imports
+import threading
+import time
 from datetime import datetime, date
 from dateutil import parser
+from types import MappingProxyType
 import json
 
 # third-party imports
 from flask import current_app as app
+from sqlalchemy import Integer, String, cast
 
 # application imports
 
+__all__ = ['Config', 'ConfigCache']
+
+# Key of the row holding the version counter
+VERSION_KEY = '_config_version'
+
 
 class Config(app.db.Model):
     """Key-Value config storage.
@@ -65,15 +80,47 @@ class Config(app.db.Model):
             config.value=str(value)
             config.type=cls.data_types.index(type(value))
 
+        cls._bump_version()
         app.db.session.commit()
+        app.config_cache.invalidate()
 
     @classmethod
     def get(cls, key, default=None):
         """Get a value with optional default."""
-        config = Config.query.filter(Config.key == key).one_or_none()
-        if config is None:
-            return default
+        return cls.get_many([key], default)[key]
+
+    @classmethod
+    def get_many(cls, keys, default=None):
+        """Get several values at once.
+
+        Args:
+            keys: Iterable of keys
+            default: Value for keys that aren't set
+
+        Returns:
+            Dict of key to value
+
+        """
+        values = app.config_cache.values()
+        result = {}
+        for key in keys:
+            value = values.get(key, default)
+            # Don't hand out the cached list itself
+            result[key] = list(value) if isinstance(value, list) else value
+
+        return result
+
+    @classmethod
+    def decode(cls, config):
+        """Convert a stored config item to its type.
+
+        Args:
+            config: A Config
 
+        Returns:
+            The value
+
+        """
         if config.value is None:
             return None
 
@@ -87,3 +134,94 @@ class Config(app.db.Model):
             return json.loads(config.value)
         else:
             return cls.data_types[config.type](config.value)
+
+    @classmethod
+    def version(cls):
+        """Get the version counter, None if nothing was ever set."""
+        return cls.counter(VERSION_KEY)
+
+    @classmethod
+    def _bump_version(cls):
+        """Increment the version counter in the current transaction."""
+        cls.bump_counter(VERSION_KEY)
+
+    @classmethod
+    def counter(cls, key):
+        """Get a counter from the database, bypassing the cache.
+
+        Args:
+            key: The counter's key, starting with _ to keep it out of the
+                cache
+
+        Returns:
+            The counter as a string, None if it was never bumped
+
+        """
+        return app.db.session.query(cls.value).filter(
+            cls.key == key).scalar()
+
+    @classmethod
+    def bump_counter(cls, key):
+        """Increment a counter in the current transaction.
+
+        The increment is done in SQL, so concurrent bumps are never lost.
+
+        Args:
+            key: The counter's key, starting with _ to keep it out of the
+                cache
+
+        """
+        updated = cls.query.filter(cls.key == key).update(
+            {cls.value: cast(cast(cls.value, Integer) + 1, String)},
+            synchronize_session=False
+        )
+        if not updated:
+            app.db.session.add(cls(key=key, value='1', type=1))
+
+
+class ConfigCache(object):
+    """Every config item, converted to its type, for one process."""
+
+    def __init__(self, check_interval=10):
+        """Constructor.
+
+        Args:
+            check_interval: Seconds between checks of the version counter
+
+        """
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked = 0
+
+    def values(self):
+        """Get the config items, reloading them if the version has moved.
+
+        Returns:
+            Read-only mapping of key to value
+
+        """
+        values = self._values
+        now = time.monotonic()
+        if values is not None and now - self._checked < self._check_interval:
+            return values
+
+        with self._lock:
+            version = Config.version()
+            if self._values is None or self._version != version:
+                self._values = MappingProxyType(dict(
+                    (config.key, Config.decode(config))
+                    for config in Config.query.all()
+                    # Counters, see Config.bump_counter
+                    if not config.key.startswith('_')
+                ))
+                self._version = version
+            self._checked = now
+
+            return self._values
+
+    def invalidate(self):
+        """Drop the cached items so the next read reloads them."""
+        with self._lock:
+            self._values = None
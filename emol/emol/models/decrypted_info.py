@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""Lazily decrypted combatant personal information.
+
+A combatant's personal information is stored in one of three layouts:
+
+    blob: All fields in one encrypted JSON blob (Combatant.encrypted)
+
+    fields: Fields split into groups (Combatant._field_groups), each group
+        encrypted separately. Combatant.encrypted_fields holds a JSON object
+        mapping group name to that group's ciphertext.
+
+    payload: Compact binary (see emol.utility.payload) in
+        Combatant.encrypted_payload. Section 0 holds the whole record, or
+        each group is a section of its own, numbered from 1 in the version's
+        group order (Combatant._payload_formats).
+
+DecryptedInfo presents any layout as a dict-like object. When fields are
+encrypted in groups only the groups holding fields that are actually read get
+decrypted, so showing a name never decrypts an address.
+
+"""
+
+# standard library imports
+import base64
+import json
+from collections.abc import MutableMapping
+
+# third-party imports
+from flask import current_app as app
+
+# application imports
+from emol.utility.payload import unpack_record, unpack_sections
+
+__all__ = ['DecryptedInfo']
+
+# Cache and install key for the whole of a blob layout record
+BLOB = None
+
+
+class DecryptedInfo(MutableMapping):
+    """Dict-like access to a combatant's decrypted personal information.
+
+    Reads decrypt the group holding the requested field on first access.
+    Writes load the field's group first, so that the group can be encrypted
+    again in full, and mark it dirty.
+
+    Decrypted groups are shared through the application's decrypted record
+    cache, keyed by combatant id, last_update and group.
+
+    Attributes:
+        dirty: Set of group names modified since load
+
+    """
+
+    def __init__(self, combatant):
+        """Constructor.
+
+        Args:
+            combatant: The Combatant this information belongs to
+
+        """
+        self._combatant = combatant
+        self._data = {}
+        self._loaded = set()
+        self._stored = None
+        self._version = None
+        self.dirty = set()
+
+    def __repr__(self):
+        """String representation that doesn't leak personal information."""
+        return '<DecryptedInfo {0} loaded: {1}>'.format(
+            self._combatant.id, sorted(self._loaded))
+
+    @property
+    def _groups(self):
+        """The combatant's field groups."""
+        return self._combatant._field_groups
+
+    def group_of(self, field):
+        """Get the name of the group a field belongs to, or None."""
+        for group, fields in self._groups.items():
+            if field in fields:
+                return group
+
+        return None
+
+    def groups_for(self, fields):
+        """Get the set of group names holding the given fields.
+
+        Args:
+            fields: Iterable of field names, or None for all groups
+
+        Returns:
+            Set of group names
+
+        """
+        if fields is None:
+            return set(self._groups)
+
+        return set(g for g in (self.group_of(f) for f in fields)
+                   if g is not None)
+
+    def group_data(self, group):
+        """Get the loaded data for one group, for encryption."""
+        return {field: self._data[field] for field in self._groups[group]
+                if field in self._data}
+
+    def _cache_key(self, group):
+        """Key for a group in the decrypted record cache."""
+        return self._combatant.id, self._combatant.last_update, group
+
+    def install(self, group, data, cache=False):
+        """Install decrypted data for a group.
+
+        Args:
+            group: Group name, or BLOB for a whole blob layout record
+            data: The decrypted dict (None is treated as empty)
+            cache: Also put a copy in the decrypted record cache
+
+        """
+        data = data or {}
+        if cache and self._combatant.id is not None:
+            app.decrypted_cache.set(self._cache_key(group), dict(data))
+
+        if group is BLOB:
+            self._data.update(data)
+            self._loaded.update(self._groups)
+        else:
+            self._data.update(self.group_data_from(group, data))
+            self._loaded.add(group)
+
+    def group_data_from(self, group, data):
+        """Filter a dict down to one group's fields."""
+        return {field: data[field] for field in self._groups[group]
+                if field in data}
+
+    def stored(self):
+        """Get the stored ciphertexts.
+
+        Returns:
+            Dict of group name, or BLOB for a whole record, to the raw
+            ciphertext (not base64 encoded)
+
+        Raises:
+            ValueError if the payload version is unknown
+
+        """
+        if self._stored is not None:
+            return self._stored
+
+        combatant = self._combatant
+        layout = combatant.encryption_layout
+        if layout == 'payload':
+            version, sections = unpack_sections(combatant.encrypted_payload)
+            if version not in combatant._payload_formats:
+                raise ValueError('Unknown payload version {0}'.format(version))
+
+            groups = combatant._payload_formats[version][1]
+            self._version = version
+            self._stored = {
+                BLOB if code == 0 else groups[code - 1]: ciphertext
+                for code, ciphertext in sections.items()
+            }
+        elif layout == 'fields':
+            self._stored = {
+                group: base64.b64decode(ciphertext) for group, ciphertext
+                in json.loads(combatant.encrypted_fields).items()
+            }
+        elif layout == 'blob':
+            self._stored = {BLOB: base64.b64decode(combatant.encrypted)}
+        else:
+            self._stored = {}
+
+        return self._stored
+
+    def payload_fields(self, group, version):
+        """Get the field order of a payload section.
+
+        Args:
+            group: Group name, or BLOB for a whole record
+            version: Payload format version
+
+        Returns:
+            Tuple of field names
+
+        """
+        order = self._combatant._payload_formats[version][0]
+        if group is BLOB:
+            return order
+
+        return tuple(f for f in order if f in self._groups[group])
+
+    def parse(self, group, plaintext):
+        """Deserialize a decrypted group from the stored layout.
+
+        Args:
+            group: Group name, or BLOB for a whole record
+            plaintext: The decrypted group
+
+        Returns:
+            Dict of field values
+
+        """
+        if self._version is None:
+            return json.loads(plaintext)
+
+        fields = self.payload_fields(group, self._version)
+        return unpack_record(plaintext, fields)
+
+    def pending(self, groups):
+        """Work out what must be decrypted to load the given groups.
+
+        Groups found in the decrypted record cache, and groups with no stored
+        data, are installed immediately.
+
+        Args:
+            groups: Set of group names to load
+
+        Returns:
+            List of (group, ciphertext) to decrypt, parse and install
+
+        """
+        groups = set(groups) - self._loaded
+        if not groups:
+            return []
+
+        stored = self.stored()
+        if BLOB in stored:
+            cached = app.decrypted_cache.get(self._cache_key(BLOB))
+            if cached is not None:
+                self.install(BLOB, dict(cached))
+                return []
+
+            return [(BLOB, stored[BLOB])]
+
+        result = []
+        for group in groups:
+            cached = app.decrypted_cache.get(self._cache_key(group))
+            if cached is not None:
+                self.install(group, dict(cached))
+            elif group in stored:
+                result.append((group, stored[group]))
+            else:
+                self.install(group, {})
+
+        return result
+
+    def load(self, groups):
+        """Decrypt and install the given groups if not already loaded.
+
+        Args:
+            groups: Iterable of group names
+
+        """
+        cipher = app.cipher()
+        for group, ciphertext in self.pending(groups):
+            plaintext = cipher.decrypt_raw(ciphertext)
+            self.install(group, self.parse(group, plaintext), cache=True)
+
+    def load_all(self):
+        """Decrypt every group."""
+        self.load(self._groups)
+
+    def _load_field(self, field):
+        """Make sure the group holding a field is loaded."""
+        group = self.group_of(field)
+        if group is None:
+            # Not a known field. Only a blob can hold such a thing.
+            if BLOB in self.stored():
+                self.load_all()
+        else:
+            self.load([group])
+
+        return group
+
+    def __getitem__(self, field):
+        """Get a field, decrypting its group if needed."""
+        self._load_field(field)
+        return self._data[field]
+
+    def __setitem__(self, field, value):
+        """Set a field and mark its group dirty."""
+        group = self._load_field(field)
+        self._data[field] = value
+        if group is not None:
+            self.dirty.add(group)
+
+    def __delitem__(self, field):
+        """Remove a field and mark its group dirty."""
+        group = self._load_field(field)
+        del self._data[field]
+        if group is not None:
+            self.dirty.add(group)
+
+    def __iter__(self):
+        """Iterate over all fields, decrypting everything."""
+        self.load_all()
+        return iter(self._data)
+
+    def __len__(self):
+        """Number of fields, decrypting everything."""
+        self.load_all()
+        return len(self._data)
@@ -7,9 +7,9 @@ import json
 # third-party imports
 from flask import current_app as app
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm.exc import NoResultFound
 
 # application imports
-from .named_tuples import NameSlugTuple
 
 __all__ = ['Discipline', 'Authorization', 'Marshal']
 
@@ -54,18 +54,63 @@ class Discipline(app.db.Model):
 
     @classmethod
     def find(cls, discipline):
-        """Find a discipline."""
+        """Find a discipline.
+
+        Slugs and ids are resolved through the reference data registry, see
+        emol.models.reference_data.
+
+        Args:
+            discipline: A discipline slug (string) or id (int) or
+                Discipline object
+
+        Returns:
+            Discipline object, None for None or 'any'
+
+        Raises:
+            NoResultFound if there is no such discipline
+            ValueError if discipline can't be determined
+
+        """
         if discipline is None or discipline == 'any':
             return None
 
         if isinstance(discipline, Discipline):
             return discipline
-        elif isinstance(discipline, str):
-            return Discipline.query.filter(
-                Discipline.slug == discipline).one()
-        elif isinstance(discipline, int):
-            return Discipline.query.filter(
-                Discipline.id == discipline).one()
+        elif isinstance(discipline, (str, int)):
+            return app.reference_data.resolve(
+                Discipline,
+                lambda data: data.discipline(discipline),
+                'discipline {0}'.format(discipline)
+            )
+        else:
+            raise ValueError('Can''t determine discipline')
+
+    @classmethod
+    def find_id(cls, discipline):
+        """Find a discipline's database ID without loading the discipline.
+
+        Args:
+            discipline: A discipline slug (string) or id (int) or
+                Discipline object
+
+        Returns:
+            ID of the discipline, None for None or 'any'
+
+        Raises:
+            NoResultFound if there is no such discipline
+            ValueError if discipline can't be determined
+
+        """
+        if discipline is None or discipline == 'any':
+            return None
+
+        if isinstance(discipline, Discipline):
+            return discipline.id
+        elif isinstance(discipline, (str, int)):
+            item = app.reference_data.current().discipline(discipline)
+            if item is None:
+                raise NoResultFound('No discipline {0}'.format(discipline))
+            return item.id
         else:
             raise ValueError('Can''t determine discipline')
 
@@ -79,13 +124,20 @@ class Discipline(app.db.Model):
         Returns:
             ID of the discipline in the database
         """
-        discipline = cls.query.filter(cls.slug == slug).one_or_none()
+        discipline = app.reference_data.current().discipline(slug)
         return None if discipline is None else discipline.id
 
     @classmethod
     def template_list(cls):
-        """Get a list of discipline names and slugs for template use."""
-        return [NameSlugTuple(slug=d.slug, name=d.name)
-                for d in Discipline.query.all()]
+        """Get the disciplines for template use.
+
+        Served from the reference data registry without a query.
+
+        Returns:
+            Tuple of DisciplineTuple (name, slug and the discipline's
+            authorizations and marshals as NameSlugTuple)
+
+        """
+        return app.reference_data.current().template_list()
 
 
@@ -8,7 +8,6 @@ from flask import current_app as app
 
 # application imports
 from .discipline import Discipline
-from .named_tuples import NameSlugTuple
 
 __all__ = ['Marshal']
 
@@ -42,6 +41,7 @@ class Marshal(app.db.Model):
             Marshal object
 
         Raises:
+            NoResultFound if there is no such marshal
             ValueError if marshal can't be determined
 
         """
@@ -49,22 +49,28 @@ class Marshal(app.db.Model):
         if isinstance(marshal, Marshal):
             return marshal
 
-        discipline = Discipline.find(discipline)
-
-        if isinstance(marshal, str):
-            return Marshal.query.filter(
-                Marshal.discipline_id == discipline.id).filter(
-                Marshal.slug == marshal).one()
-        elif isinstance(Marshal, int):
-            return Marshal.query.filter(
-                Marshal.discipline_id == discipline.id).filter(
-                Marshal.id == marshal).one()
-        else:
+        if not isinstance(marshal, (str, int)):
             raise ValueError('Can''t determine marshal')
 
+        discipline_id = Discipline.find(discipline).id
+        return app.reference_data.resolve(
+            Marshal,
+            lambda data: data.marshal(discipline_id, marshal),
+            'marshal {0} for discipline {1}'.format(marshal, discipline_id)
+        )
+
     @classmethod
     def template_list(cls, discipline):
-        """Get a list of marshal names and slugs for template use."""
-        return [NameSlugTuple(slug=m.slug, name=m.name)
-                for m in Marshal.query.all()
-                if m.discipline.slug == discipline]
+        """Get a list of marshal names and slugs for template use.
+
+        Served from the reference data registry without a query.
+
+        Args:
+            discipline: A discipline slug
+
+        Returns:
+            Tuple of NameSlugTuple, empty for an unknown discipline
+
+        """
+        entry = app.reference_data.current().template_list(discipline)
+        return () if entry is None else entry.marshals
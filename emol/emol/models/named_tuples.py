@@ -7,3 +7,8 @@ NameSlugTuple = namedtuple('NameSlugTuple', ['name', 'slug'])
 
 # Named tuple for a role
 RoleTuple = namedtuple('RoleTuple', ['name', 'slug', 'discipline'])
+
+# Named tuple for a discipline with its authorizations and marshals as
+# NameSlugTuples, for template use
+DisciplineTuple = namedtuple(
+    'DisciplineTuple', ['name', 'slug', 'authorizations', 'marshals'])
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Outbox of email waiting to be sent.
+
+With MAIL_OUTBOX set, Emailer stores each message here instead of talking
+to the SMTP server, so a request never waits on SMTP. The send_mail
+command drains the outbox:
+
+    - Due messages are claimed in batches. A claim pushes next_attempt out
+      by a lease (MAIL_LEASE seconds, or longer if MAIL_RATE needs longer
+      to send the batch) so that another worker won't take the same
+      messages, and a worker that dies leaves its messages to be picked up
+      again once the lease is up
+    - Each batch is delivered in parallel, see Emailer.deliver_many
+    - Each message is deleted, or its failure recorded, and committed as
+      soon as it has been tried, so a message sent early in a batch is
+      never claimed again
+    - A message that fails is retried with exponential backoff, starting
+      at MAIL_RETRY_DELAY seconds and capped at MAIL_RETRY_MAX_DELAY
+    - After MAIL_MAX_ATTEMPTS failures next_attempt is cleared and the
+      message stays in the table with its last error for someone to look at
+
+Delivery is at least once: a worker that dies between sending a message and
+committing its batch will send it again.
+
+"""
+
+# standard library imports
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+# third-party imports
+from flask import current_app as app
+
+# application imports
+from emol.mail import Emailer
+
+__all__ = ['OutboundMail']
+
+
+class OutboundMail(app.db.Model):
+    """An email waiting to be sent.
+
+    Attributes:
+        id: Identity PK for the table
+        recipient: Recipient's email address
+        subject: The email's subject
+        body: Email message text
+        created: When the message was queued
+        attempts: Number of failed attempts to send the message
+        next_attempt: When to try next, None once the message has failed
+            for good
+        claim: Token of the worker batch that last claimed the message
+        last_error: The error from the last failed attempt
+
+    """
+
+    id = app.db.Column(app.db.Integer, primary_key=True)
+    recipient = app.db.Column(app.db.String(255), nullable=False)
+    subject = app.db.Column(app.db.String(255), nullable=False)
+    body = app.db.Column(app.db.Text, nullable=False)
+    created = app.db.Column(app.db.DateTime, nullable=False)
+    attempts = app.db.Column(app.db.Integer, nullable=False, default=0)
+    next_attempt = app.db.Column(app.db.DateTime, nullable=True, index=True)
+    claim = app.db.Column(app.db.String(32), nullable=True, index=True)
+    last_error = app.db.Column(app.db.Text, nullable=True)
+
+    def __repr__(self):
+        return '<OutboundMail: {0} to {1}>'.format(self.id, self.recipient)
+
+    @classmethod
+    def enqueue(cls, recipient, subject, body, commit=True):
+        """Queue a message to be sent.
+
+        Args:
+            recipient: Recipient's email address
+            subject: The email's subject
+            body: Email message text
+            commit: Commit the session. Pass False to have the message go
+                out with the caller's own commit, or not at all if the
+                caller rolls back.
+
+        Returns:
+            The OutboundMail
+
+        """
+        now = datetime.utcnow()
+        mail = cls(
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            created=now,
+            attempts=0,
+            next_attempt=now
+        )
+        app.db.session.add(mail)
+        if commit is True:
+            app.db.session.commit()
+
+        return mail
+
+    @classmethod
+    def lease(cls, batch_size):
+        """Seconds a claimed batch is held before it is due again.
+
+        MAIL_LEASE, but at least twice as long as MAIL_RATE allows for
+        sending the batch.
+
+        Args:
+            batch_size: Number of messages in the batch
+
+        """
+        config = app.config
+        lease = config.get('MAIL_LEASE', 300)
+        rate = config.get('MAIL_RATE')
+        if rate:
+            lease = max(lease, 2 * batch_size / rate)
+
+        return lease
+
+    @classmethod
+    def claim_batch(cls, batch_size, lease=None):
+        """Claim due messages for this worker.
+
+        Args:
+            batch_size: Maximum number of messages to claim
+            lease: Seconds before unsent claimed messages are due again,
+                defaults to lease(batch_size)
+
+        Returns:
+            List of OutboundMail, oldest first
+
+        """
+        if lease is None:
+            lease = cls.lease(batch_size)
+
+        now = datetime.utcnow()
+        ids = [
+            row.id for row in app.db.session.query(cls.id)
+            .filter(cls.next_attempt <= now)
+            .order_by(cls.next_attempt, cls.id)
+            .limit(batch_size)
+        ]
+        if len(ids) == 0:
+            return []
+
+        # Only messages still due are claimed, so when two workers race for
+        # the same rows each row goes to one of them
+        token = uuid4().hex
+        cls.query.filter(
+            cls.id.in_(ids),
+            cls.next_attempt <= now
+        ).update(
+            {
+                cls.claim: token,
+                cls.next_attempt: now + timedelta(seconds=lease)
+            },
+            synchronize_session=False
+        )
+        app.db.session.commit()
+
+        return cls.query.filter(cls.claim == token).order_by(cls.id).all()
+
+    def failed(self, error):
+        """Record a failed attempt and schedule the next one.
+
+        Args:
+            error: The exception raised by the attempt
+
+        """
+        config = app.config
+        self.attempts += 1
+        self.last_error = '{0}: {1}'.format(type(error).__name__, error)
+
+        if self.attempts >= config.get('MAIL_MAX_ATTEMPTS', 8):
+            app.logger.error('Giving up on {0} after {1} attempts'.format(
+                self, self.attempts))
+            self.next_attempt = None
+            return
+
+        app.mail_metrics.add('retried')
+        delay = min(
+            config.get('MAIL_RETRY_DELAY', 60) * 2 ** (self.attempts - 1),
+            config.get('MAIL_RETRY_MAX_DELAY', 3600)
+        )
+        self.next_attempt = datetime.utcnow() + timedelta(seconds=delay)
+
+    @classmethod
+    def drain(cls, batch_size=100):
+        """Send one batch of due messages.
+
+        Args:
+            batch_size: Maximum number of messages to send
+
+        Returns:
+            A tuple of (messages sent, messages that failed)
+
+        """
+        mails = cls.claim_batch(batch_size)
+        messages = [(mail.recipient, mail.subject, mail.body)
+                    for mail in mails]
+        ids = [mail.id for mail in mails]
+
+        counts = dict(sent=0, failed=0)
+
+        def tried(index, error):
+            if error is None:
+                cls.query.filter(
+                    cls.id == ids[index]
+                ).delete(synchronize_session=False)
+                counts['sent'] += 1
+            else:
+                mails[index].failed(error)
+                counts['failed'] += 1
+            app.db.session.commit()
+
+        Emailer.deliver_many(messages, tried)
+
+        return counts['sent'], counts['failed']
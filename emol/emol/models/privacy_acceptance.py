@@ -66,7 +66,8 @@ class PrivacyAcceptance(app.db.Model):
         """
         privacy_acceptance = cls(combatant=combatant)
         app.db.session.add(privacy_acceptance)
-        app.db.session.commit()
+        # Assigns the uuid for the email, the caller commits
+        app.db.session.flush()
 
         emailer = Emailer()
         emailer.send_privacy_policy_acceptance(privacy_acceptance)
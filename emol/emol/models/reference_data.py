@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""In-process registry of reference data.
+
+Disciplines, authorizations, marshals and roles are set up once (see
+emol.setup) and almost never change, but are looked up inside per-row
+loops. The registry keeps an immutable snapshot of their ids, slugs and
+names in each process so that the model find methods can resolve a slug or
+id without a query. The snapshot only holds plain tuples, never model
+instances, so it can be shared between sessions and threads.
+
+A version stamp in Config says which snapshot is current. Anything that
+changes reference data calls ReferenceRegistry.changed, which bumps the
+stamp, and every process reloads its snapshot once it sees the new stamp.
+Processes look at the stamp at most once every check_interval seconds. The
+stamp is read from the database rather than through the Config cache, so
+the delay isn't added to CONFIG_CHECK_INTERVAL.
+
+"""
+
+# standard library imports
+import threading
+import time
+import uuid
+from collections import namedtuple
+from types import MappingProxyType
+
+# third-party imports
+from flask import current_app as app
+from sqlalchemy.orm.exc import NoResultFound
+
+# application imports
+from .authorization import Authorization
+from .config import Config
+from .discipline import Discipline
+from .marshal import Marshal
+from .named_tuples import DisciplineTuple, NameSlugTuple
+from .role import Role
+
+__all__ = ['ReferenceData', 'ReferenceItem', 'ReferenceRegistry']
+
+# Config key holding the reference data version stamp
+VERSION_KEY = 'reference_data_version'
+
+# One discipline, authorization, marshal or role. discipline_id is None for
+# disciplines and global roles.
+ReferenceItem = namedtuple(
+    'ReferenceItem',
+    ['id', 'slug', 'name', 'discipline_id']
+)
+
+
+class ReferenceData(object):
+    """An immutable snapshot of the reference data.
+
+    Attributes:
+        version: The version stamp the snapshot was loaded at
+
+    """
+
+    def __init__(self, version, disciplines, authorizations, marshals, roles):
+        """Constructor.
+
+        Args:
+            version: The version stamp, None if never set
+            disciplines: Iterable of ReferenceItem
+            authorizations: Iterable of ReferenceItem
+            marshals: Iterable of ReferenceItem
+            roles: Iterable of ReferenceItem
+
+        """
+        self.version = version
+
+        disciplines = tuple(disciplines)
+        self._disciplines = MappingProxyType(dict(
+            [(d.id, d) for d in disciplines] +
+            [(d.slug, d) for d in disciplines]
+        ))
+        authorizations = tuple(authorizations)
+        marshals = tuple(marshals)
+        self._authorizations = self._index(authorizations)
+        self._marshals = self._index(marshals)
+        self._roles = self._index(roles)
+
+        # Name/slug lists for templates, in id order, built once per snapshot
+        def names(items, discipline_id):
+            return tuple(NameSlugTuple(name=i.name, slug=i.slug)
+                         for i in items if i.discipline_id == discipline_id)
+
+        self._template_list = tuple(
+            DisciplineTuple(
+                name=d.name,
+                slug=d.slug,
+                authorizations=names(authorizations, d.id),
+                marshals=names(marshals, d.id)
+            )
+            for d in sorted(disciplines, key=lambda d: d.id)
+        )
+        self._template_index = MappingProxyType(
+            dict((d.slug, d) for d in self._template_list))
+
+    @staticmethod
+    def _index(items):
+        """Index items by (discipline_id, id) and (discipline_id, slug)."""
+        index = {}
+        for item in items:
+            index[(item.discipline_id, item.id)] = item
+            index[(item.discipline_id, item.slug)] = item
+
+        return MappingProxyType(index)
+
+    @classmethod
+    def load(cls, version):
+        """Load a snapshot from the database.
+
+        Args:
+            version: The version stamp to record
+
+        Returns:
+            A ReferenceData
+
+        """
+        def items(model, has_discipline=True):
+            columns = [model.id, model.slug, model.name]
+            if has_discipline:
+                columns.append(model.discipline_id)
+            rows = app.db.session.query(*columns).order_by(model.id).all()
+            return [ReferenceItem(*row) if has_discipline
+                    else ReferenceItem(*row, None) for row in rows]
+
+        return cls(
+            version,
+            items(Discipline, has_discipline=False),
+            items(Authorization),
+            items(Marshal),
+            items(Role)
+        )
+
+    def template_list(self, discipline=None):
+        """Get disciplines with their authorizations and marshals.
+
+        Args:
+            discipline: Optional discipline slug to get just that one
+
+        Returns:
+            Tuple of DisciplineTuple in id order, or the DisciplineTuple for
+            discipline (None if there is no such discipline)
+
+        """
+        if discipline is None:
+            return self._template_list
+
+        return self._template_index.get(discipline)
+
+    def discipline(self, key):
+        """Look up a discipline by id or slug.
+
+        Returns:
+            ReferenceItem, or None if there is no such discipline
+
+        """
+        return self._disciplines.get(key)
+
+    def authorization(self, discipline_id, key):
+        """Look up a discipline's authorization by id or slug.
+
+        Returns:
+            ReferenceItem, or None if there is no such authorization
+
+        """
+        return self._authorizations.get((discipline_id, key))
+
+    def marshal(self, discipline_id, key):
+        """Look up a discipline's marshal by id or slug.
+
+        Returns:
+            ReferenceItem, or None if there is no such marshal
+
+        """
+        return self._marshals.get((discipline_id, key))
+
+    def role(self, discipline_id, key):
+        """Look up a role by id or slug.
+
+        Args:
+            discipline_id: The role's discipline, None for a global role
+            key: The role id or slug
+
+        Returns:
+            ReferenceItem, or None if there is no such role
+
+        """
+        return self._roles.get((discipline_id, key))
+
+
+class ReferenceRegistry(object):
+    """Holds the current ReferenceData snapshot for a process."""
+
+    def __init__(self, check_interval=30):
+        """Constructor.
+
+        Args:
+            check_interval: Seconds between checks of the version stamp
+
+        """
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._checked = 0
+
+    def current(self):
+        """Get the current snapshot, reloading it if the stamp has moved.
+
+        Returns:
+            A ReferenceData
+
+        """
+        data = self._data
+        now = time.monotonic()
+        if data is not None and now - self._checked < self._check_interval:
+            return data
+
+        with self._lock:
+            version = self.version()
+            if self._data is None or self._data.version != version:
+                self._data = ReferenceData.load(version)
+            self._checked = now
+
+            return self._data
+
+    @staticmethod
+    def version():
+        """Get the version stamp, None if reference data never changed."""
+        return app.db.session.query(Config.value).filter(
+            Config.key == VERSION_KEY).scalar()
+
+    def resolve(self, model, lookup, description):
+        """Get the model instance for a reference item.
+
+        Loading by primary key is answered from the session's identity map
+        when the instance is already loaded, so repeat lookups in a request
+        cost no queries. If the item is in the snapshot but no longer in
+        the database the snapshot is stale, so it is reloaded once.
+
+        Args:
+            model: The model class
+            lookup: Callable taking a ReferenceData and returning the
+                ReferenceItem, or None
+            description: What is being looked up, for the error message
+
+        Returns:
+            The model instance
+
+        Raises:
+            NoResultFound if there is no such item
+
+        """
+        for attempt in range(2):
+            item = lookup(self.current())
+            if item is None:
+                break
+
+            instance = model.query.get(item.id)
+            if instance is not None:
+                return instance
+
+            self.clear()
+
+        raise NoResultFound('No {0}'.format(description))
+
+    def changed(self):
+        """Record a change to reference data.
+
+        Sets a new version stamp so that every process reloads, and drops
+        this process's snapshot right away. Stamps are random rather than a
+        counter so they can't repeat after the Config table is emptied.
+        Commits the session.
+
+        """
+        with self._lock:
+            Config.set(VERSION_KEY, uuid.uuid4().hex)
+            self._data = None
+
+    def clear(self):
+        """Drop the snapshot so the next lookup reloads it."""
+        with self._lock:
+            self._data = None
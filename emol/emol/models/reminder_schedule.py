@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Computed card and waiver reminder schedule.
+
+With REMINDER_SCHEDULE = 'stored' (the default) renewing a card or waiver
+writes a CardReminder or WaiverReminder row for each reminder, and the
+daily check sends and deletes the rows that are due.
+
+With REMINDER_SCHEDULE = 'computed' renewing writes nothing. The daily check
+works out what is due from card_date and waiver_date and the configured
+reminder offsets instead, with one range query on the indexed date column
+per offset, so its cost follows the number of reminders due rather than the
+number of cards and waivers. Each reminder sent is recorded in SentReminder
+so that it is only sent once:
+
+    - A card or waiver that hasn't expired is due the reminder for the
+      latest reminder point it has reached. With reminders at 30 and 60
+      days, that is the 60 day reminder from 60 days before expiry and the
+      30 day reminder from 30 days before. If the daily check misses some
+      days only the latest reminder is sent.
+    - A card or waiver that has expired is due its expiry notice for
+      REMINDER_CATCH_UP_DAYS days after expiry.
+
+Reminders are recorded against the card_date or waiver_date they were
+worked out from, so renewing starts the schedule afresh. Records are
+pruned once no schedule can match them.
+
+Reminder rows stored before switching to the computed schedule are ignored.
+
+"""
+
+# standard library imports
+from datetime import timedelta
+
+# third-party imports
+from flask import current_app as app
+from sqlalchemy import and_, exists
+from sqlalchemy.orm import joinedload
+
+# application imports
+from emol.utility.date import add_years, base_date_for_expiry
+
+from .card import Card
+from .config import Config
+from .waiver import Waiver
+
+__all__ = ['ReminderSchedule', 'SentReminder', 'SCHEDULES']
+
+
+class SentReminder(app.db.Model):
+    """Record of a reminder sent from the computed schedule.
+
+    Attributes:
+        id: Primary key
+        kind: 'card' or 'waiver'
+        target_id: ID of the card or waiver
+        base_date: The card_date or waiver_date the reminder was for
+        days: Days before expiry of the reminder, 0 for an expiry notice
+        is_expiry: True for an expiry notice
+        sent: Date the reminder was sent
+
+    """
+
+    __table_args__ = (
+        app.db.UniqueConstraint(
+            'kind', 'target_id', 'base_date', 'days', 'is_expiry'),
+    )
+
+    id = app.db.Column(app.db.Integer, primary_key=True)
+    kind = app.db.Column(app.db.String(16), nullable=False)
+    target_id = app.db.Column(app.db.Integer, nullable=False)
+    base_date = app.db.Column(app.db.Date, nullable=False)
+    days = app.db.Column(app.db.Integer, nullable=False)
+    is_expiry = app.db.Column(app.db.Boolean, nullable=False)
+    sent = app.db.Column(app.db.Date, nullable=False, index=True)
+
+
+class ReminderSchedule(object):
+    """The computed reminder schedule for one kind of record.
+
+    Attributes:
+        kind: Name recorded in SentReminder
+        model: Card or Waiver
+        date_column: The column expiry is counted from
+        years: Years from date_column to expiry
+        offsets_key: Config key listing days before expiry to remind at
+        options: Loader options for everything mail_reminder needs
+
+    """
+
+    def __init__(self, kind, model, date_column, years, offsets_key,
+                 options):
+        self.kind = kind
+        self.model = model
+        self.date_column = date_column
+        self.years = years
+        self.offsets_key = offsets_key
+        self.options = options
+
+    def offsets(self):
+        """Configured reminder days before expiry, smallest first."""
+        return sorted(set(
+            int(days) for days in Config.get(self.offsets_key) or []
+            if int(days) > 0
+        ))
+
+    def expiry(self, base_date):
+        """Expiry date for a card_date or waiver_date."""
+        return add_years(base_date, self.years)
+
+    def _between(self, after, until):
+        """Filter for records expiring after one day, up to another."""
+        return and_(
+            self.date_column > base_date_for_expiry(after, self.years),
+            self.date_column <= base_date_for_expiry(until, self.years)
+        )
+
+    def _not_sent(self, days, is_expiry):
+        """Filter for records without this reminder in the ledger."""
+        return ~exists().where(and_(
+            SentReminder.kind == self.kind,
+            SentReminder.target_id == self.model.id,
+            SentReminder.base_date == self.date_column,
+            SentReminder.days == days,
+            SentReminder.is_expiry == is_expiry
+        ))
+
+    def due(self, this_day, catch_up):
+        """Queries for the reminders due on a day.
+
+        Args:
+            this_day: The day to work out reminders for
+            catch_up: Days after expiry an expiry notice is still sent
+
+        Returns:
+            List of (days, is_expiry, query) with a query for the records
+            due each reminder
+
+        """
+        due = []
+        previous = 0
+        for days in self.offsets():
+            # Expiring after the previous reminder point, up to this one
+            window = self._between(
+                this_day + timedelta(days=previous),
+                this_day + timedelta(days=days)
+            )
+            due.append((days, False, window))
+            previous = days
+
+        window = self._between(
+            this_day - timedelta(days=catch_up + 1),
+            this_day
+        )
+        due.append((0, True, window))
+
+        return [
+            (days, is_expiry, self.model.query.filter(
+                window,
+                self._not_sent(days, is_expiry)
+            ).options(*self.options))
+            for days, is_expiry, window in due
+        ]
+
+    def record(self, records, days, is_expiry, this_day):
+        """Add reminders sent to the ledger. The caller commits.
+
+        Args:
+            records: Cards or waivers the reminder was sent for
+            days: Days before expiry of the reminder
+            is_expiry: True for an expiry notice
+            this_day: The day the reminder was sent
+
+        """
+        if len(records) == 0:
+            return
+
+        app.db.session.execute(
+            SentReminder.__table__.insert(),
+            [
+                dict(
+                    kind=self.kind,
+                    target_id=record.id,
+                    base_date=getattr(record, self.date_column.key),
+                    days=days,
+                    is_expiry=is_expiry,
+                    sent=this_day
+                )
+                for record in records
+            ]
+        )
+
+    def prune(self, this_day, catch_up):
+        """Delete ledger records no schedule can match any more.
+
+        A reminder sent days before expiry can be due again until catch_up
+        days after expiry, after which nothing is due for its base date.
+
+        """
+        offsets = self.offsets()
+        horizon = max(offsets) if offsets else 0
+        SentReminder.query.filter(
+            SentReminder.kind == self.kind,
+            SentReminder.sent < this_day - timedelta(
+                days=horizon + catch_up + 1)
+        ).delete(synchronize_session=False)
+
+    def dates(self, base_date):
+        """The schedule for a card_date or waiver_date.
+
+        Returns:
+            List of (reminder date, is_expiry) in date order
+
+        """
+        expiry = self.expiry(base_date)
+        return (
+            [(expiry - timedelta(days=days), False)
+             for days in reversed(self.offsets())] +
+            [(expiry, True)]
+        )
+
+
+SCHEDULES = dict(
+    card=ReminderSchedule(
+        'card', Card, Card.card_date, 2, 'card_reminders',
+        [joinedload(Card.combatant), joinedload(Card.discipline)]
+    ),
+    waiver=ReminderSchedule(
+        'waiver', Waiver, Waiver.waiver_date, 7, 'waiver_reminders',
+        # Waiver.combatant is a backref
+        [joinedload('combatant')]
+    )
+)
@@ -73,12 +73,13 @@ class Role(app.db.Model):
         Args:
             role: A role slug (or maybe a Role object)
             discipline: A discipline slug (string) or id (int) or
-                Discipline object
+                Discipline object, None for a global role
 
         Returns:
             Role object
 
         Raises:
+            NoResultFound if there is no such role
             ValueError if discipline can't be determined
 
         """
@@ -86,19 +87,17 @@ class Role(app.db.Model):
         if isinstance(role, Role):
             return role
 
-        discipline = Discipline.find(discipline)
-
-        if isinstance(role, str):
-            return Role.query.filter(
-                Role.discipline_id == discipline.id).filter(
-                Role.slug == role).one()
-        elif isinstance(role, int):
-            return Role.query.filter(
-                Role.discipline_id == discipline.id).filter(
-                Role.id == role).one()
-        else:
+        if not isinstance(role, (str, int)):
             raise ValueError('Can''t determine role')
 
+        discipline = Discipline.find(discipline)
+        discipline_id = None if discipline is None else discipline.id
+        return app.reference_data.resolve(
+            Role,
+            lambda data: data.role(discipline_id, role),
+            'role {0} for discipline {1}'.format(role, discipline_id)
+        )
+
     @classmethod
     def template_list(cls):
         """Get a list of role names and slugs for template use."""
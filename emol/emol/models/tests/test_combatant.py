@@ -2,7 +2,8 @@ import pytest
 
 from werkzeug.exceptions import Unauthorized
 
-from emol.models import Combatant, Card, CardReminder
+from emol.models import Combatant, CombatantListEntry, Card, CardReminder
+from emol.models.decrypted_info import BLOB
 from emol.utility.testing import Mockmail
 
 
@@ -46,3 +47,172 @@ def test_create_authorized(app, combatant_data, privileged_user):
     app.db.session.commit()
 
 
+def test_find_by_blind_index(app, combatant):
+    """Encrypted fields can be found by exact match."""
+    assert combatant.legal_name_index is not None
+
+    found = Combatant.find_by_blind_index('postal_code', 'a1a1a1')
+    assert combatant in found
+
+    found = Combatant.find_by_blind_index('legal_name', ' fred  mcfred ')
+    assert combatant in found
+
+    assert Combatant.find_by_blind_index('legal_name', 'Fred McFredd') == []
+
+    with pytest.raises(ValueError):
+        Combatant.find_by_blind_index('phone', '2125551212')
+
+
+def test_field_encryption_layout(app, combatant, monkeypatch):
+    """Field group layout only decrypts the groups that are read."""
+    legal_name = combatant.decrypted['legal_name']
+    city = combatant.decrypted['city']
+
+    monkeypatch.setitem(app.config, 'EMOL_FIELD_ENCRYPTION', True)
+    combatant.write_encrypted(rewrite=True)
+    assert combatant.encryption_layout == 'fields'
+    assert combatant.encrypted is None
+
+    app.decrypted_cache.clear()
+    combatant._decrypted = None
+    Combatant.decrypt_many([combatant], fields=['legal_name'])
+    assert combatant.decrypted._loaded == {'name'}
+    assert combatant.decrypted['legal_name'] == legal_name
+    assert combatant.decrypted['city'] == city
+
+    monkeypatch.setitem(app.config, 'EMOL_FIELD_ENCRYPTION', False)
+    combatant.write_encrypted(rewrite=True)
+    assert combatant.encryption_layout == 'blob'
+    assert combatant.decrypted['city'] == city
+
+
+@pytest.mark.parametrize('split', [False, True])
+def test_compact_payload_layout(app, combatant, monkeypatch, split):
+    """Compact payloads are written and read back in either grouping."""
+    legal_name = combatant.decrypted['legal_name']
+    city = combatant.decrypted['city']
+
+    monkeypatch.setitem(app.config, 'EMOL_COMPACT_PAYLOAD', True)
+    monkeypatch.setitem(app.config, 'EMOL_FIELD_ENCRYPTION', split)
+    combatant.write_encrypted(rewrite=True)
+    assert combatant.encryption_layout == 'payload'
+    assert combatant.encrypted is None
+    assert combatant.encrypted_fields is None
+
+    app.decrypted_cache.clear()
+    combatant._decrypted = None
+    Combatant.decrypt_many([combatant], fields=['legal_name'])
+    assert combatant.decrypted['legal_name'] == legal_name
+    assert combatant.decrypted['city'] == city
+
+    monkeypatch.setitem(app.config, 'EMOL_COMPACT_PAYLOAD', False)
+    combatant.write_encrypted(rewrite=True)
+    assert combatant.encryption_layout in ('blob', 'fields')
+    assert combatant.encrypted_payload is None
+    assert combatant.decrypted['city'] == city
+
+
+def test_list_entry(app, combatant):
+    """The combatant list entry follows the combatant."""
+    entry = combatant.list_entry
+    assert entry is not None
+    assert entry.uuid == combatant.uuid
+    assert entry.sca_name == combatant.sca_name
+    assert entry.accepted_privacy_policy is False
+    assert CombatantListEntry.decrypt_names([entry]) == [
+        combatant.decrypted.get('legal_name')]
+
+
+def test_list_entry_fill(app, combatant):
+    """Missing entries are detected and created."""
+    assert not CombatantListEntry.incomplete()
+
+    app.db.session.delete(combatant.list_entry)
+    app.db.session.commit()
+    assert CombatantListEntry.incomplete()
+
+    assert CombatantListEntry.fill() == 1
+    assert not CombatantListEntry.incomplete()
+    assert CombatantListEntry.decrypt_names([combatant.list_entry]) == [
+        combatant.decrypted.get('legal_name')]
+
+
+def test_list_collection_version(app, combatant):
+    """Every change to the list moves its version, even if ids repeat."""
+    versions = [CombatantListEntry.collection_version()]
+
+    combatant.list_entry.sca_name = 'Someone Else'
+    app.db.session.commit()
+    versions.append(CombatantListEntry.collection_version())
+
+    app.db.session.delete(combatant.list_entry)
+    app.db.session.commit()
+    versions.append(CombatantListEntry.collection_version())
+
+    CombatantListEntry.fill()
+    versions.append(CombatantListEntry.collection_version())
+
+    CombatantListEntry.set_name_order([(combatant.id, 1)])
+    app.db.session.commit()
+    versions.append(CombatantListEntry.collection_version())
+
+    assert len(set(versions)) == len(versions)
+
+
+def test_list_entry_update_info(app, combatant):
+    """Updating info refreshes the entry without decrypting again."""
+    combatant.update_info(dict(legal_name='Fredda McFredd'))
+    app.db.session.commit()
+
+    # The entry was refreshed from the values already in memory
+    assert combatant._decrypted is None
+    assert CombatantListEntry.decrypt_names([combatant.list_entry]) == [
+        'Fredda McFredd']
+
+
+def test_name_order(app, combatant, combatant_data, admin_user):
+    """New names go in the gaps, shared positions are rebuilt."""
+    Combatant.rebuild_name_order()
+    assert combatant.legal_name_order == Combatant._name_order_gap
+    assert combatant.list_entry.legal_name_order == combatant.legal_name_order
+
+    data = dict(
+        combatant_data,
+        legal_name='Aaron Aaronson',
+        email='aaron@mailinator.com',
+        original_email='aaron@mailinator.com'
+    )
+    with Mockmail('emol.models.privacy_acceptance', True):
+        aaron = Combatant.create(data)
+
+    assert 0 < aaron.legal_name_order < combatant.legal_name_order
+    assert not Combatant.name_order_stale()
+
+    aaron.legal_name_order = combatant.legal_name_order
+    app.db.session.commit()
+    assert Combatant.name_order_stale()
+
+    Combatant.rebuild_name_order()
+    assert not Combatant.name_order_stale()
+    assert aaron.legal_name_order < combatant.legal_name_order
+
+    app.db.session.delete(aaron)
+    app.db.session.commit()
+
+
+def test_delete_drops_decrypted_cache(app, combatant_data, admin_user):
+    """Deleting a combatant drops its decrypted data from the cache."""
+    data = dict(
+        combatant_data,
+        email='deleted@mailinator.com',
+        original_email='deleted@mailinator.com'
+    )
+    with Mockmail('emol.models.privacy_acceptance', True):
+        deleted = Combatant.create(data)
+
+    key = (deleted.id, deleted.last_update, BLOB)
+    app.decrypted_cache.set(key, {'legal_name': 'Fred McFredd'})
+
+    app.db.session.delete(deleted)
+    app.db.session.commit()
+    assert app.decrypted_cache.get(key) is None
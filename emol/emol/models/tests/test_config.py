@@ -3,6 +3,7 @@ import pytest
 from datetime import date, datetime
 
 from emol.models import Config
+from emol.utility.testing import QueryCounter
 
 
 def test_config_int(app):
@@ -78,4 +79,29 @@ def test_waiver_reminders(app):
     reminders = Config.get('waiver_reminders')
     assert len(reminders) == 2
     assert 30 in reminders
-    assert 60 in reminders
\ No newline at end of file
+    assert 60 in reminders
+
+
+def test_config_get_many(app):
+    """Test getting several values at once."""
+    Config.set('thing', 5)
+    Config.set('other_thing', 'foo')
+    values = Config.get_many(['thing', 'other_thing', 'no_thing'], 'x')
+    assert values == {'thing': 5, 'other_thing': 'foo', 'no_thing': 'x'}
+
+
+def test_config_cached(app):
+    """Values are read from the cache until a set."""
+    Config.set('thing', [30, 60])
+    Config.get('thing')
+
+    with QueryCounter(app.db.engine) as counter:
+        value = Config.get('thing')
+        value.append(90)
+        assert Config.get('thing') == [30, 60]
+    assert counter.count == 0, counter.statements
+
+    version = Config.version()
+    Config.set('thing', [10])
+    assert Config.version() != version
+    assert Config.get('thing') == [10]
@@ -0,0 +1,130 @@
+"""Unit tests for the email outbox."""
+import smtplib
+from datetime import datetime
+
+import pytest
+
+from emol.mail import Emailer
+from emol.models import OutboundMail
+
+
+@pytest.fixture
+def outbox(app):
+    """Queue email in the outbox for the test."""
+    app.config['MAIL_OUTBOX'] = True
+
+    yield
+
+    app.config.pop('MAIL_OUTBOX')
+    OutboundMail.query.delete()
+    app.db.session.commit()
+
+
+def _deliver(monkeypatch, error=None):
+    """Replace Emailer.deliver, raising error if given."""
+    delivered = []
+
+    def deliver(recipient, subject, body):
+        if error is not None:
+            raise error
+        delivered.append(recipient)
+
+    monkeypatch.setattr(Emailer, 'deliver', deliver)
+    return delivered
+
+
+def test_send_email_enqueues(app, outbox, monkeypatch):
+    """With the outbox on, sending only queues the message."""
+    delivered = _deliver(monkeypatch)
+
+    assert Emailer.send_email('a@example.com', 'Subject', 'Body') is True
+    assert delivered == []
+
+    mail = OutboundMail.query.one()
+    assert mail.recipient == 'a@example.com'
+    assert mail.next_attempt <= datetime.utcnow()
+
+
+def test_send_email_joins_transaction(app, outbox, monkeypatch):
+    """A queued message is only kept if the caller commits."""
+    _deliver(monkeypatch)
+
+    Emailer.send_email('a@example.com', 'Subject', 'Body')
+    app.db.session.rollback()
+    assert OutboundMail.query.count() == 0
+
+    Emailer.send_email('a@example.com', 'Subject', 'Body')
+    app.db.session.commit()
+    assert OutboundMail.query.count() == 1
+
+
+def test_batch_defers_commit(app, outbox, monkeypatch):
+    """Messages queued in a batch are committed together."""
+    _deliver(monkeypatch)
+
+    with Emailer.batch():
+        Emailer.send_email('a@example.com', 'Subject', 'Body')
+        Emailer.send_email('b@example.com', 'Subject', 'Body')
+        assert len(app.db.session.new) == 2
+
+    assert OutboundMail.query.count() == 2
+
+
+def test_drain(app, outbox, monkeypatch):
+    """Sent messages are removed from the outbox."""
+    delivered = _deliver(monkeypatch)
+    Emailer.send_email('a@example.com', 'Subject', 'Body')
+    Emailer.send_email('b@example.com', 'Subject', 'Body')
+
+    assert OutboundMail.drain() == (2, 0)
+    assert sorted(delivered) == ['a@example.com', 'b@example.com']
+    assert OutboundMail.query.count() == 0
+
+
+def test_drain_commits_each(app, outbox, monkeypatch):
+    """Each message is deleted as soon as it is sent."""
+    monkeypatch.setitem(app.config, 'MAIL_CONCURRENCY', 1)
+    counts = []
+
+    def deliver(recipient, subject, body):
+        counts.append(OutboundMail.query.count())
+
+    monkeypatch.setattr(Emailer, 'deliver', deliver)
+    Emailer.send_email('a@example.com', 'Subject', 'Body')
+    Emailer.send_email('b@example.com', 'Subject', 'Body')
+
+    assert OutboundMail.drain() == (2, 0)
+    assert counts == [2, 1]
+
+
+def test_lease(app, monkeypatch):
+    """The lease covers the time MAIL_RATE needs to send a batch."""
+    monkeypatch.setitem(app.config, 'MAIL_LEASE', 300)
+    monkeypatch.setitem(app.config, 'MAIL_RATE', None)
+    assert OutboundMail.lease(100) == 300
+
+    monkeypatch.setitem(app.config, 'MAIL_RATE', 0.2)
+    assert OutboundMail.lease(100) == 1000
+
+
+def test_drain_retries(app, outbox, monkeypatch):
+    """Failed messages back off, then are given up on."""
+    monkeypatch.setitem(app.config, 'MAIL_MAX_ATTEMPTS', 2)
+    _deliver(monkeypatch, smtplib.SMTPServerDisconnected('gone'))
+    Emailer.send_email('a@example.com', 'Subject', 'Body')
+
+    assert OutboundMail.drain() == (0, 1)
+    mail = OutboundMail.query.one()
+    assert mail.attempts == 1
+    assert mail.next_attempt > datetime.utcnow()
+    assert 'gone' in mail.last_error
+
+    # Not due again yet
+    assert OutboundMail.drain() == (0, 0)
+
+    mail.next_attempt = datetime.utcnow()
+    app.db.session.commit()
+    assert OutboundMail.drain() == (0, 1)
+    mail = OutboundMail.query.one()
+    assert mail.attempts == 2
+    assert mail.next_attempt is None
@@ -0,0 +1,106 @@
+"""Unit tests for the reference data registry."""
+import pytest
+from sqlalchemy.orm.exc import NoResultFound
+
+from emol.models import Authorization, Config, Discipline, Marshal, Role
+from emol.models.reference_data import (VERSION_KEY, ReferenceData,
+                                        ReferenceItem, ReferenceRegistry)
+from emol.utility.testing import QueryCounter
+
+
+def test_snapshot_lookup():
+    """Snapshots are indexed by id, slug and (discipline, slug)."""
+    data = ReferenceData(
+        'v1',
+        [ReferenceItem(1, 'rapier', 'Rapier', None)],
+        [ReferenceItem(7, 'two-weapon', 'Two Weapon', 1)],
+        [ReferenceItem(3, 'marshal', 'Marshal', 1)],
+        [ReferenceItem(5, 'admin', 'admin', None),
+         ReferenceItem(6, 'edit_marshal', 'Can edit marshal status', 1)]
+    )
+
+    assert data.discipline('rapier').id == 1
+    assert data.discipline(1).slug == 'rapier'
+    assert data.authorization(1, 'two-weapon').id == 7
+    assert data.authorization(1, 7).slug == 'two-weapon'
+    assert data.authorization(2, 'two-weapon') is None
+    assert data.marshal(1, 'marshal').id == 3
+    assert data.role(None, 'admin').id == 5
+    assert data.role(1, 'edit_marshal').id == 6
+    assert data.role(None, 'edit_marshal') is None
+
+
+def test_find(app):
+    """find methods resolve through the registry."""
+    rapier = Discipline.find('rapier')
+    assert Discipline.find(rapier.id) is rapier
+
+    authorization = Authorization.find('rapier', 'two-weapon')
+    assert authorization.discipline_id == rapier.id
+    assert Authorization.find(rapier, authorization.id) is authorization
+
+    assert Marshal.find(rapier, 'marshal').discipline_id == rapier.id
+    assert Role.find('admin', None).discipline_id is None
+    assert Role.find('edit_marshal', 'rapier').discipline_id == rapier.id
+
+    with pytest.raises(NoResultFound):
+        Authorization.find('rapier', 'no-such-authorization')
+
+
+def test_find_without_queries(app):
+    """Repeat lookups cost no queries."""
+    Authorization.find('rapier', 'heavy-rapier')
+
+    with QueryCounter(app.db.engine) as counter:
+        for _ in range(10):
+            Discipline.find('rapier')
+            Authorization.find('rapier', 'heavy-rapier')
+
+    assert counter.count == 0, counter.statements
+
+
+def test_changed(app):
+    """Changing reference data reloads the snapshot."""
+    registry = ReferenceRegistry(check_interval=3600)
+    before = registry.current()
+    assert registry.current() is before
+
+    registry.changed()
+    after = registry.current()
+    assert after is not before
+    assert after.version != before.version
+    assert after.discipline('rapier') == before.discipline('rapier')
+
+
+def test_changed_elsewhere(app):
+    """A stamp set by another process is seen without the Config cache."""
+    registry = ReferenceRegistry(check_interval=0)
+    registry.changed()
+    before = registry.current()
+    app.config_cache.values()
+
+    # As another process would, without invalidating this one's caches
+    Config.query.filter(Config.key == VERSION_KEY).update(
+        {Config.value: 'elsewhere'}, synchronize_session=False)
+    app.db.session.commit()
+
+    after = registry.current()
+    assert after is not before
+    assert after.version == 'elsewhere'
+
+
+def test_template_list(app):
+    """Template lists come from the registry, grouped by discipline."""
+    Discipline.template_list()
+
+    with QueryCounter(app.db.engine) as counter:
+        disciplines = Discipline.template_list()
+        authorizations = Authorization.template_list('rapier')
+        marshals = Marshal.template_list('rapier')
+
+    assert counter.count == 0, counter.statements
+    assert 'rapier' in [d.slug for d in disciplines]
+    assert 'heavy-rapier' in [a.slug for a in authorizations]
+    assert 'weapon-shield' not in [a.slug for a in authorizations]
+    assert [m.slug for m in marshals] == ['marshal']
+    assert Authorization.template_list('no-such-discipline') == ()
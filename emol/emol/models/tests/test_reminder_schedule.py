@@ -0,0 +1,122 @@
+"""Unit tests for the computed reminder schedule."""
+import smtplib
+from datetime import timedelta
+
+import pytest
+
+from emol.cron.daily_check import daily_check
+from emol.mail import Emailer
+from emol.models import CardReminder, SentReminder
+from emol.models.reminder_schedule import SCHEDULES
+from emol.utility.date import today
+from emol.utility.testing import Mocktoday, Mockmail
+
+
+@pytest.fixture
+def computed(app, monkeypatch):
+    """Use the computed reminder schedule for the test.
+
+    Mail is sent without a dispatcher so that Mockmail sees it.
+
+    """
+    monkeypatch.setitem(app.config, 'REMINDER_SCHEDULE', 'computed')
+    monkeypatch.setitem(app.config, 'MAIL_CONCURRENCY', 1)
+
+    yield
+
+    SentReminder.query.delete()
+    app.db.session.commit()
+
+
+def test_renew_stores_nothing(app, combatant, computed):
+    """Renewing doesn't write reminder rows."""
+    card = combatant.get_card('rapier')
+    card.renew(today())
+
+    assert len(card.reminders) == 0
+    assert CardReminder.query.filter(
+        CardReminder.card_id == card.id).count() == 0
+
+
+def test_schedule_dates(app):
+    """The schedule counts back from expiry."""
+    card_date = today()
+    expiry = SCHEDULES['card'].expiry(card_date)
+
+    assert SCHEDULES['card'].dates(card_date) == [
+        (expiry - timedelta(days=60), False),
+        (expiry - timedelta(days=30), False),
+        (expiry, True)
+    ]
+
+
+def test_daily_check_computed(app, combatant, computed):
+    """Each reminder is sent once, on its day."""
+    card = combatant.get_card('rapier')
+    card.renew(today())
+
+    for reminder_date, is_expiry in SCHEDULES['card'].dates(card.card_date):
+        # The day before, nothing is due
+        day_before = reminder_date - timedelta(days=1)
+        with Mocktoday('emol.cron.daily_check', day_before):
+            with Mockmail('emol.models.card', False):
+                daily_check()
+
+        with Mocktoday('emol.cron.daily_check', reminder_date):
+            with Mockmail('emol.models.card', True):
+                daily_check()
+
+            # Running again the same day sends nothing
+            with Mockmail('emol.models.card', False):
+                daily_check()
+
+        assert SentReminder.query.filter(
+            SentReminder.kind == 'card',
+            SentReminder.target_id == card.id,
+            SentReminder.is_expiry == is_expiry
+        ).count() == 1
+
+
+def test_daily_check_catch_up(app, combatant, computed):
+    """A missed reminder is sent late, but only the latest one."""
+    card = combatant.get_card('rapier')
+    card.renew(today())
+    expiry = SCHEDULES['card'].expiry(card.card_date)
+
+    with Mocktoday('emol.cron.daily_check', expiry - timedelta(days=20)):
+        with Mockmail('emol.models.card', True):
+            daily_check()
+
+    assert [r.days for r in SentReminder.query.filter(
+        SentReminder.target_id == card.id)] == [30]
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_daily_check_failed(app, combatant, computed, monkeypatch,
+                            concurrency):
+    """A reminder that fails to send isn't recorded, so it is retried."""
+    monkeypatch.setitem(app.config, 'MAIL_CONCURRENCY', concurrency)
+    card = combatant.get_card('rapier')
+    card.renew(today())
+    reminder_date, _ = SCHEDULES['card'].dates(card.card_date)[0]
+
+    delivered = []
+
+    def deliver(recipient, subject, body):
+        if len(delivered) == 0:
+            delivered.append(None)
+            raise smtplib.SMTPServerDisconnected('gone')
+        delivered.append(recipient)
+
+    monkeypatch.setattr(Emailer, 'deliver', deliver)
+
+    with Mocktoday('emol.cron.daily_check', reminder_date):
+        daily_check()
+        assert SentReminder.query.filter(
+            SentReminder.target_id == card.id).count() == 0
+
+        daily_check()
+        assert SentReminder.query.filter(
+            SentReminder.target_id == card.id).count() == 1
+
+    assert delivered == [None, combatant.email]
@@ -3,4 +3,75 @@ import pytest
 from werkzeug.exceptions import Unauthorized
 
 from emol.models import User, Role, UserRole, Discipline
+from emol.utility.testing import QueryCounter
 
+
+def test_permissions(app, unprivileged_user):
+    """Compiled permissions follow add_role and remove_role."""
+    assert unprivileged_user.has_role('rapier', 'edit_marshal') is False
+
+    unprivileged_user.add_role('rapier', 'edit_marshal')
+    assert unprivileged_user.has_role('rapier', 'edit_marshal') is True
+    assert unprivileged_user.has_role('armoured-combat', 'edit_marshal') is False
+    assert unprivileged_user.has_role_or(
+        'rapier', ('edit_authorizations', 'edit_marshal')) is True
+
+    unprivileged_user.remove_role('rapier', 'edit_marshal')
+    assert unprivileged_user.has_role('rapier', 'edit_marshal') is False
+
+
+def test_permissions_compiled_once(app, unprivileged_user):
+    """Role checks after the first cost no queries."""
+    unprivileged_user.add_role('rapier', 'edit_authorizations')
+    unprivileged_user.has_role('rapier', 'edit_authorizations')
+
+    with QueryCounter(app.db.engine) as counter:
+        for discipline in ('rapier', 'armoured-combat', None):
+            unprivileged_user.has_role(discipline, 'edit_authorizations')
+
+    assert counter.count == 0, counter.statements
+
+    unprivileged_user.remove_role('rapier', 'edit_authorizations')
+
+
+def test_load_cached(app, unprivileged_user):
+    """Cached users cost one query and see role changes at once."""
+    email = unprivileged_user.email
+    User.load_cached(email)
+    app.db.session.expire_all()
+
+    with QueryCounter(app.db.engine) as counter:
+        user = User.load_cached(email)
+        user.has_role('rapier', 'edit_marshal')
+        [ur.role.slug for ur in user.roles]
+
+    assert counter.count == 1, counter.statements
+    assert user.has_role('rapier', 'edit_marshal') is False
+
+    user.add_role('rapier', 'edit_marshal')
+    assert User.load_cached(email).has_role('rapier', 'edit_marshal') is True
+
+    user.remove_role('rapier', 'edit_marshal')
+    assert User.load_cached(email).has_role('rapier', 'edit_marshal') is False
+    assert User.load_cached('nobody@ealdormere.ca') is None
+
+
+def test_load_cached_row(app, unprivileged_user):
+    """Changes to the user's own columns show through the cache."""
+    email = unprivileged_user.email
+    User.load_cached(email)
+
+    unprivileged_user.system_admin = True
+    app.db.session.commit()
+    assert User.load_cached(email).is_system_admin is True
+
+    unprivileged_user.system_admin = False
+    unprivileged_user.email = 'renamed@ealdormere.ca'
+    app.db.session.commit()
+    user = User.load_cached('renamed@ealdormere.ca')
+    assert user.email == 'renamed@ealdormere.ca'
+    assert user.is_system_admin is False
+    assert User.load_cached(email) is None
+
+    unprivileged_user.email = email
+    app.db.session.commit()
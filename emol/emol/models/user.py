@@ -5,13 +5,78 @@
 
 # third-party imports
 from flask import current_app as app
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 # application imports
 from .faux_user import FauxUser
 from .discipline import Discipline
 from .role import Role
 
-__all__ = ['User', 'UserRole']
+__all__ = ['Permissions', 'User', 'UserRole']
+
+
+class Permissions(object):
+    """A user's roles compiled for fast checks.
+
+    Attributes:
+        roles: frozenset of (discipline_id, role slug), discipline_id None
+            for global roles
+        is_global: True if every check passes (system admins)
+
+    """
+
+    __slots__ = ('roles', 'is_global')
+
+    def __init__(self, roles, is_global=False):
+        """Constructor.
+
+        Args:
+            roles: Iterable of (discipline_id, role slug)
+            is_global: True if every check passes
+
+        """
+        self.roles = frozenset(roles)
+        self.is_global = is_global
+
+    @classmethod
+    def compile(cls, user):
+        """Compile a user's roles.
+
+        A system admin passes every check, as long as they have at least one
+        role.
+
+        Args:
+            user: A User
+
+        Returns:
+            Permissions
+
+        """
+        roles = [(ur.discipline_id, ur.role.slug) for ur in user.roles]
+        return cls(roles, is_global=bool(roles) and bool(user.system_admin))
+
+    def allows(self, discipline, roles):
+        """Check for any of a set of roles.
+
+        Args:
+            discipline: The discipline to check against (None for global)
+            roles: Iterable of role slugs
+
+        Returns:
+            Boolean
+
+        """
+        if self.is_global:
+            # Ultimate cosmic power
+            return True
+
+        if not self.roles:
+            return False
+
+        discipline_id = Discipline.find_id(discipline)
+        return any((discipline_id, role) in self.roles for role in roles)
 
 
 class User(app.db.Model):
@@ -27,6 +92,7 @@ class User(app.db.Model):
         id: Primary key in the database
         email: User's email address for their Google account
         system_admin: Flag for users who have configuration privilege
+        role_version: Bumped whenever the user's roles change
 
     """
 
@@ -34,6 +100,13 @@ class User(app.db.Model):
     email = app.db.Column(app.db.String(255), unique=True)
     system_admin = app.db.Column(app.db.Boolean, nullable=False, default=False)
 
+    role_version = app.db.Column(
+        app.db.Integer,
+        default=0,
+        server_default='0',
+        nullable=False
+    )
+
     roles = app.db.relationship('UserRole')
 
     def __repr__(self):
@@ -107,18 +180,80 @@ class User(app.db.Model):
         if self.system_admin is True:
             return True
 
-        # roles really is an iterable
-        # noinspection PyTypeChecker
-        for role in self.roles:
-            if role.role.slug in Role.COMBATANT_EDIT_ROLES:
-                return True
-
-        return False
+        return any(slug in Role.COMBATANT_EDIT_ROLES
+                   for _, slug in self.permissions.roles)
 
     def get_id(self):
         """Get the user's ID (email address)."""
         return self.email
 
+    @property
+    def permissions(self):
+        """The user's roles compiled for fast checks.
+
+        Compiled on first use and kept until add_role or remove_role change
+        the user's roles.
+
+        Returns:
+            Permissions
+
+        """
+        permissions = getattr(self, '_permissions', None)
+        if permissions is None:
+            permissions = Permissions.compile(self)
+            self._permissions = permissions
+
+        return permissions
+
+    @classmethod
+    def load_cached(cls, email):
+        """Load a user with their roles, from the user cache if possible.
+
+        The user's row is always read from the database, so changes to
+        email or system_admin show at once. Their UserRoles, with each
+        UserRole's Role and Discipline, are loaded in one joined query and
+        a detached copy is kept in app.user_cache along with the compiled
+        permissions, keyed by (user id, role_version, system_admin).
+        Changing a user's roles bumps role_version so a stale entry is never
+        used. Each request gets its own copy of the roles merged into its
+        session without a query, so only the user's row is read.
+
+        Args:
+            email: The user's email address (see get_id)
+
+        Returns:
+            The User, or None if there is no such user
+
+        """
+        user = cls.query.filter(cls.email == email).one_or_none()
+        if user is None:
+            return None
+
+        key = (user.id, user.role_version, user.system_admin)
+        entry = app.user_cache.get(key)
+        if entry is None:
+            roles = UserRole.query.options(
+                joinedload(UserRole.role),
+                joinedload(UserRole.discipline)
+            ).filter(UserRole.user_id == user.id).all()
+            set_committed_value(user, 'roles', roles)
+            user._permissions = None
+
+            # Keep a copy outside any request's session so that nothing
+            # the request does to its user, like committing, touches it
+            private = Session()
+            cached = [private.merge(ur, load=False) for ur in roles]
+            private.expunge_all()
+
+            app.user_cache.set(key, (cached, user.permissions))
+            return user
+
+        cached, permissions = entry
+        set_committed_value(user, 'roles', [
+            app.db.session.merge(ur, load=False) for ur in cached])
+        user._permissions = permissions
+        return user
+
     def roles_for(self, discipline):
         """List the user's roles for a discipline.
 
@@ -164,18 +299,7 @@ class User(app.db.Model):
             Boolean
 
         """
-        if len(self.roles) == 0:
-            return False
-
-        # Ultimate cosmic power
-        if self.system_admin:
-            return True
-
-        discipline = Discipline.find(discipline)
-        if role in self.roles_for(discipline):
-            return True
-
-        return False
+        return self.has_role_or(discipline, (role,))
 
     def has_role_or(self, discipline, roles):
         """Check if the user has one of the given roles.
@@ -188,11 +312,20 @@ class User(app.db.Model):
             Boolean
 
         """
-        for role in roles:
-            if self.has_role(discipline, role):
-                return True
+        return self.permissions.allows(discipline, roles)
 
-        return False
+    def _roles_changed(self):
+        """Bump role_version and drop the compiled permissions.
+
+        For a user already in the database the bump is done in SQL, so
+        that concurrent role changes each move the version on.
+
+        """
+        if inspect(self).persistent:
+            self.role_version = User.role_version + 1
+        else:
+            self.role_version = (self.role_version or 0) + 1
+        self._permissions = None
 
     def remove_role(self, discipline, role):
         """Remove a user role from this user.
@@ -206,13 +339,15 @@ class User(app.db.Model):
             return
 
         discipline = Discipline.find(discipline)
+        discipline_id = None if discipline is None else discipline.id
 
         discipline_roles = self.role_objects_for(discipline)
         for user_role in discipline_roles:
-            if user_role.role.slug == role and user_role.role.discipline_id == discipline.id:
+            if user_role.role.slug == role and user_role.role.discipline_id == discipline_id:
                 app.db.session.delete(user_role)
                 break
 
+        self._roles_changed()
         app.db.session.commit()
 
     def add_role(self, discipline, role):
@@ -230,11 +365,12 @@ class User(app.db.Model):
 
         user_role = UserRole(
             user=self,
-            role=Role.query.filter(Role.slug == role, Role.discipline == discipline).one(),
+            role=Role.find(role, discipline),
             discipline=Discipline.find(discipline) if discipline else None
         )
 
         app.db.session.add(user_role)
+        self._roles_changed()
         app.db.session.commit()
 
     def add_roles(self, discipline, roles):
@@ -9,7 +9,7 @@ from flask import current_app as app
 
 # application imports
 from emol.mail import Emailer
-from emol.mail.email_templates import EMAIL_TEMPLATES
+from emol.mail.template import TEMPLATES
 from emol.utility.date import add_years, string_to_date, today, DATE_FORMAT, LOCAL_TZ
 
 from .config import Config
@@ -28,7 +28,7 @@ class Waiver(app.db.Model):
     """
 
     id = app.db.Column(app.db.Integer, primary_key=True)
-    waiver_date = app.db.Column(app.db.Date)
+    waiver_date = app.db.Column(app.db.Date, index=True)
 
     combatant_id = app.db.Column(app.db.Integer, app.db.ForeignKey('combatant.id'))
 
@@ -72,6 +72,11 @@ class Waiver(app.db.Model):
 
         self.waiver_date = waiver_date or today()
 
+        # The daily check works out reminders from waiver_date itself
+        if app.config.get('REMINDER_SCHEDULE', 'stored') == 'computed':
+            app.db.session.commit()
+            return
+
         # Create the reminder for expiry day
         expiry_date = self.waiver_date + relativedelta(years=7)
         WaiverReminder.schedule(self, expiry_date, is_expiry=True)
@@ -101,8 +106,49 @@ class Waiver(app.db.Model):
     @property
     def reminder_tooltip(self):
         """Return tooltip text for waiver reminder dates"""
+        if app.config.get('REMINDER_SCHEDULE', 'stored') == 'computed':
+            from .reminder_schedule import SCHEDULES
+            return '; '.join(
+                '{0} ({1})'.format(reminder_date, 'E' if is_expiry else 'R')
+                for reminder_date, is_expiry
+                in SCHEDULES['waiver'].dates(self.waiver_date)
+            )
+
         return '; '.join([t.tooltip for t in self.reminders])
 
+    def mail_reminder(self, is_expiry):
+        """Send the waiver's expiry reminder or expiry notice.
+
+        Args:
+            is_expiry: True for the expiry notice
+
+        Returns:
+            True if the email was sent
+
+        """
+        return Emailer().send_email(*self.reminder_message(is_expiry))
+
+    def reminder_message(self, is_expiry):
+        """Build the waiver's expiry reminder or expiry notice.
+
+        Args:
+            is_expiry: True for the expiry notice
+
+        Returns:
+            A tuple of (recipient, subject, body)
+
+        """
+        if is_expiry is True:
+            subject, body = TEMPLATES['waiver_expiry'].render()
+        else:
+            subject, body = TEMPLATES['waiver_reminder'].render(
+                expiry_days=self.expiry_days,
+                expiry_date=self.expiry_date_str
+            )
+
+        return self.combatant.email, subject, body
+
+
 class WaiverReminder(app.db.Model):
     """Waiver expiry reminders for combatants.
 
@@ -134,20 +180,7 @@ class WaiverReminder(app.db.Model):
 
     def mail(self):
         """Send reminder or expiry notice as appropriate."""
-
-        if self.is_expiry is True:
-            template = EMAIL_TEMPLATES.get('waiver_expiry')
-            subject = template.get('subject')
-            body = template.get('body')
-        else:
-            template = EMAIL_TEMPLATES.get('waiver_reminder')
-            subject = template.get('subject')
-            body = template.get('body').format(
-                expiry_days=self.waiver.expiry_days,
-                expiry_date=self.waiver.expiry_date_str
-            )
-
-        return Emailer().send_email(self.waiver.combatant.email, subject, body)
+        return self.waiver.mail_reminder(self.is_expiry)
 
     @classmethod
     def schedule(cls, waiver, reminder_date, is_expiry):
@@ -173,7 +206,6 @@ class WaiverReminder(app.db.Model):
             is_expiry=is_expiry
         )
         app.db.session.add(reminder)
-        app.db.session.commit()
 
     @property
     def tooltip(self):
@@ -66,6 +66,8 @@ def setup(config):
                     con.execute(table.delete())
                 trans.commit()
                 con.execute('SET FOREIGN_KEY_CHECKS=1;')
+            current_app.config_cache.invalidate()
+            current_app.reference_data.clear()
             return
 
     except Exception as exc:
@@ -178,5 +180,6 @@ def setup(config):
 
     Config.set('is_setup', True)
     current_app.db.session.commit()
+    current_app.reference_data.changed()
 
     current_app.logger.debug('Setup complete: {0}'.format(Config.get('is_setup')))
@@ -202,13 +202,23 @@
          * DataTable for the combatant list
          */
         dataTable = combatant_list.DataTable({
-            dom: 'Bfrt',
-            ajax: '/api/combatant-list-datatable',
+            dom: 'Bfrtip',
+            ajax: {
+                url: '/api/combatant-list-datatable',
+                // Leave out the draw counter so that unchanged requests can
+                // be revalidated against the server's ETag
+                data: function (data) {
+                    delete data.draw;
+                }
+            },
+            serverSide: true,
+            searchDelay: 500,
             order: [1, 'asc'],
             scrollY: "300px",
             scrollX: false,
             scrollCollapse: true,
-            paging: false,
+            paging: true,
+            pageLength: 50,
             columns: [
                 {
                     defaultContent: '<button type="button" title="Edit" class="btn btn-xs btn-primary btn-edit"><i style="margin-left:2px;" class="fa fa-pencil-square-o" aria-hidden="true"></i></button>',
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Benchmark helpers.
+
+Timing and reporting utilities for the benchmark commands in commands.py.
+
+"""
+
+# standard library imports
+import math
+import time
+
+# third-party imports
+
+# application imports
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples.
+
+    Args:
+        samples: List of numbers
+        pct: Percentile to compute (0-100)
+
+    Returns:
+        The percentile value, or None for no samples
+
+    """
+    if not samples:
+        return None
+
+    ordered = sorted(samples)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+class Timings(object):
+    """A set of timing samples for one benchmarked operation.
+
+    Attributes:
+        name: Name of the operation
+        samples: Per-call durations in seconds
+        total: Wall-clock seconds for the whole run
+        count: Number of items processed
+
+    """
+
+    def __init__(self, name):
+        """Constructor.
+
+        Args:
+            name: Name of the operation
+
+        """
+        self.name = name
+        self.samples = []
+        self.total = 0.0
+        self.count = 0
+
+    @property
+    def throughput(self):
+        """Items processed per second."""
+        if self.total == 0:
+            return 0.0
+
+        return self.count / self.total
+
+    @property
+    def p50(self):
+        """Median per-call duration in milliseconds."""
+        value = percentile(self.samples, 50)
+        return None if value is None else value * 1000
+
+    @property
+    def p99(self):
+        """99th percentile per-call duration in milliseconds."""
+        value = percentile(self.samples, 99)
+        return None if value is None else value * 1000
+
+
+def time_each(name, func, items):
+    """Time func once per item.
+
+    Args:
+        name: Name of the operation
+        func: Callable taking one item
+        items: Items to call func with
+
+    Returns:
+        A tuple of (Timings, list of func results)
+
+    """
+    timings = Timings(name)
+    results = []
+
+    start = time.perf_counter()
+    for item in items:
+        call_start = time.perf_counter()
+        results.append(func(item))
+        timings.samples.append(time.perf_counter() - call_start)
+    timings.total = time.perf_counter() - start
+    timings.count = len(results)
+
+    return timings, results
+
+
+def time_once(name, func, count):
+    """Time a single call that processes count items.
+
+    Args:
+        name: Name of the operation
+        func: Callable taking no arguments
+        count: Number of items func processes
+
+    Returns:
+        A tuple of (Timings, func result)
+
+    """
+    timings = Timings(name)
+
+    start = time.perf_counter()
+    result = func()
+    timings.total = time.perf_counter() - start
+    timings.count = count
+
+    return timings, result
+
+
+REPORT_FORMAT = '{0:>8} {1:<24} {2:>10} {3:>12} {4:>9} {5:>9}'
+
+
+def report_header():
+    """Column headings for report_line."""
+    return REPORT_FORMAT.format(
+        'items', 'operation', 'total s', 'items/s', 'p50 ms', 'p99 ms')
+
+
+def report_line(timings):
+    """Format Timings as a line of the benchmark report."""
+    def ms(value):
+        return '-' if value is None else '{0:.3f}'.format(value)
+
+    return REPORT_FORMAT.format(
+        timings.count,
+        timings.name,
+        '{0:.3f}'.format(timings.total),
+        '{0:.1f}'.format(timings.throughput),
+        ms(timings.p50),
+        ms(timings.p99)
+    )
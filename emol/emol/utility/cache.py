@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""In-process caching utilities."""
+
+# standard library imports
+import threading
+import time
+from collections import OrderedDict
+
+# third-party imports
+
+# application imports
+
+
+class LRUCache(object):
+    """A bounded, thread-safe LRU cache with optional expiry.
+
+    Entries are dropped least-recently-used first once max_size is reached,
+    and are treated as missing once they are older than ttl seconds.
+
+    If an on_evict callback is given it is called with each value as it
+    leaves the cache, whether through eviction, expiry, invalidation or
+    clear. Values are never handed to on_evict while still reachable
+    through the cache.
+
+    """
+
+    def __init__(self, max_size, ttl=None, on_evict=None):
+        """Constructor.
+
+        Args:
+            max_size: Maximum number of entries. 0 disables the cache.
+            ttl: Optional number of seconds an entry stays valid
+            on_evict: Optional callable invoked with each departing value
+
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        self._on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """Number of entries, including any not yet purged as expired."""
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        """Whether the cache holds anything at all."""
+        return self._max_size > 0
+
+    def _evict(self, value):
+        """Hand a departing value to the on_evict callback."""
+        if self._on_evict is not None:
+            self._on_evict(value)
+
+    def get(self, key, default=None):
+        """Get a cached value.
+
+        Args:
+            key: The cache key
+            default: Value to return on a miss
+
+        Returns:
+            The cached value or default
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, created = entry
+            if self._ttl is not None and time.monotonic() - created > self._ttl:
+                del self._entries[key]
+                self._evict(value)
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Cache a value, evicting the least recently used entry if full.
+
+        Args:
+            key: The cache key
+            value: The value to cache
+
+        """
+        if not self.enabled:
+            self._evict(value)
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None and previous[0] is not value:
+                self._evict(previous[0])
+
+            self._entries[key] = (value, time.monotonic())
+
+            while len(self._entries) > self._max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._evict(evicted)
+
+    def invalidate(self, key):
+        """Remove a key from the cache if present.
+
+        Args:
+            key: The cache key
+
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._evict(entry[0])
+
+    def clear(self):
+        """Empty the cache."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+
+            for value, _ in entries:
+                self._evict(value)
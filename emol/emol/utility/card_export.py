@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Export combatant cards as a static bundle.
+
+The bundle can be served by any web server or CDN, or straight off a laptop
+at an event, without the database or the cipher:
+
+    index.json: Maps each card ID to its file and card version
+    cards/<card_id>.html (or .json): One file per card
+    static/images/: The images the HTML cards use
+
+Only active cards are exported: those of combatants who have accepted the
+privacy policy and have at least one card that hasn't expired.
+
+Exports are incremental. A card is only rendered again if its card_version
+differs from the one recorded in the existing index (see
+Combatant.card_changed), and files for cards that no longer exist or are
+no longer active are removed. Changes to reference data (discipline,
+authorization and marshal names) don't change card versions, so export with
+full=True after those.
+
+Cards are rendered by a pool of worker processes forked from the calling
+process. Each worker opens its own database connections and builds its own
+cipher.
+
+"""
+
+# standard library imports
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# third-party imports
+from flask import current_app, render_template
+from sqlalchemy import and_, exists
+
+# application imports
+from .database import chunked
+from .date import base_date_for_expiry, today
+
+__all__ = ['export_cards', 'FORMATS']
+
+INDEX_FILE = 'index.json'
+CARD_DIR = 'cards'
+FORMATS = ('html', 'json')
+
+# Static files referenced by combatant/card.html
+STATIC_FILES = ('images/ealdormere32.png',)
+
+# Years from card_date to expiry, as Card.expiry_date
+CARD_YEARS = 2
+
+# The app worker processes render with, set before the pool forks. Workers
+# pick it up through the fork rather than a ProcessPoolExecutor initializer
+# because the deployed Python is 3.6 (see deploy/), and initializer only
+# arrived in 3.7.
+_worker_app = None
+
+
+def _write_atomic(path, content):
+    """Write a file via a temporary file so readers never see a partial one."""
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8', newline='') as temp:
+            temp.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def _card_file(card_id, file_format):
+    """Path of a card's file, relative to the bundle directory."""
+    return '{0}/{1}.{2}'.format(CARD_DIR, card_id, file_format)
+
+
+def _safe_card_id(card_id):
+    """Whether a card ID can be used as a file name."""
+    return (bool(card_id) and not card_id.startswith('.')
+            and '/' not in card_id and os.sep not in card_id)
+
+
+def _read_index(directory):
+    """Read the existing index, or an empty one."""
+    try:
+        with open(os.path.join(directory, INDEX_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _render_card(card_id, file_format, directory):
+    """Render one card into the bundle.
+
+    Args:
+        card_id: The card ID
+        file_format: 'html' or 'json'
+        directory: The bundle directory
+
+    Returns:
+        A tuple of (card_id, card_version rendered), version None if the
+        card no longer exists
+
+    """
+    from emol.models import CardView
+
+    card_view = CardView.load(card_id)
+    if card_view is None:
+        return card_id, None
+
+    if file_format == 'json':
+        content = json.dumps(card_view.to_dict(), indent=2, sort_keys=True)
+    else:
+        with current_app.test_request_context():
+            content = render_template(
+                'combatant/card.html',
+                success=True,
+                card_view=card_view
+            )
+
+    version = card_view.combatant.card_version
+    _write_atomic(
+        os.path.join(directory, _card_file(card_id, file_format)),
+        content
+    )
+
+    # Don't let a worker's session grow with every card it renders
+    current_app.db.session.expunge_all()
+    return card_id, version
+
+
+def _init_worker():
+    """Set up a forked worker process to render cards.
+
+    Connections and the cipher inherited from the parent can't be shared
+    between processes, so drop them and let the worker make its own.
+
+    """
+    _worker_app.db.engine.dispose()
+    _worker_app._cipher = None
+    _worker_app.app_context().push()
+
+
+def _card_versions(chunk_size):
+    """Get {card_id: card_version} for every active card."""
+    from emol.models import Card, Combatant, PrivacyAcceptance
+
+    current = exists().where(and_(
+        Card.combatant_id == Combatant.id,
+        # Later than any card_date that had expired by yesterday
+        Card.card_date > base_date_for_expiry(
+            today() - timedelta(days=1), CARD_YEARS)
+    ))
+
+    query = current_app.db.session.query(
+        Combatant.id,
+        Combatant.card_id,
+        Combatant.card_version
+    ).join(
+        PrivacyAcceptance,
+        PrivacyAcceptance.combatant_id == Combatant.id
+    ).filter(
+        Combatant.card_id.isnot(None),
+        PrivacyAcceptance.accepted.isnot(None),
+        current
+    )
+
+    versions = {}
+    for rows in chunked(query, Combatant.id, chunk_size):
+        for row in rows:
+            versions[row.card_id] = row.card_version
+
+    return versions
+
+
+def _copy_static(directory):
+    """Copy the static files cards refer to into the bundle."""
+    for name in STATIC_FILES:
+        source = os.path.join(current_app.static_folder, name)
+        target = os.path.join(directory, 'static', name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+
+
+def export_cards(directory, file_format='html', processes=None, full=False,
+                 chunk_size=500):
+    """Export every active card into a static bundle.
+
+    Must be called in an app context.
+
+    Args:
+        directory: The bundle directory, created if needed
+        file_format: 'html' or 'json'
+        processes: Number of worker processes, None for one per CPU. With
+            1, cards are rendered in this process.
+        full: Render every card whatever the existing index says
+        chunk_size: Number of card versions to read per query
+
+    Returns:
+        A tuple of (cards rendered, cards unchanged, cards removed)
+
+    Raises:
+        ValueError for an unknown file_format
+
+    """
+    global _worker_app
+
+    if file_format not in FORMATS:
+        raise ValueError('Unknown card export format {0}'.format(file_format))
+
+    os.makedirs(os.path.join(directory, CARD_DIR), exist_ok=True)
+
+    index = _read_index(directory)
+    if index.get('format') != file_format:
+        full = True
+    previous = {} if full else index.get('cards', {})
+
+    versions = _card_versions(chunk_size)
+
+    cards = {}
+    pending = []
+    for card_id, version in versions.items():
+        if not _safe_card_id(card_id):
+            current_app.logger.warning(
+                'Skipping card ID {0} in export'.format(card_id))
+            continue
+
+        entry = previous.get(card_id)
+        path = os.path.join(directory, _card_file(card_id, file_format))
+        if (entry is not None and entry.get('version') == version
+                and os.path.exists(path)):
+            cards[card_id] = entry
+        else:
+            pending.append(card_id)
+
+    if processes == 1 or len(pending) <= 1:
+        results = [_render_card(card_id, file_format, directory)
+                   for card_id in pending]
+    else:
+        workers = processes or os.cpu_count() or 1
+        _worker_app = current_app._get_current_object()
+        # Release this process's connections so no child inherits them
+        current_app.db.session.remove()
+        current_app.db.engine.dispose()
+
+        pool = multiprocessing.get_context('fork').Pool(
+            workers, initializer=_init_worker)
+        try:
+            results = pool.starmap(
+                _render_card,
+                [(card_id, file_format, directory) for card_id in pending],
+                chunksize=max(1, len(pending) // (4 * workers))
+            )
+        finally:
+            pool.close()
+            pool.join()
+
+    rendered = 0
+    for card_id, version in results:
+        if version is None:
+            continue
+        cards[card_id] = dict(
+            file=_card_file(card_id, file_format),
+            version=version
+        )
+        rendered += 1
+
+    # Remove files for cards that are gone or were written in another format
+    removed = 0
+    for card_id, entry in index.get('cards', {}).items():
+        if card_id in cards and cards[card_id]['file'] == entry.get('file'):
+            continue
+        path = os.path.join(directory, entry.get('file', ''))
+        if card_id not in cards:
+            removed += 1
+        if os.path.isfile(path):
+            os.unlink(path)
+
+    _copy_static(directory)
+
+    _write_atomic(
+        os.path.join(directory, INDEX_FILE),
+        json.dumps(
+            dict(
+                format=file_format,
+                generated=datetime.utcnow().isoformat(),
+                cards=cards
+            ),
+            indent=2,
+            sort_keys=True
+        )
+    )
+
+    return rendered, len(cards) - rendered, removed
@@ -8,3 +8,57 @@ import uuid
 def default_uuid():
     """Because SQLA is a bit daft about UUIDs."""
     return uuid.uuid4().hex
+
+
+def chunked(query, column, chunk_size):
+    """Stream a query's results in chunks using keyset pagination.
+
+    Each chunk is fetched with its own query ordered by column, starting after
+    the last value of the previous chunk, so large tables can be processed
+    without loading every row. column must be unique, typically the primary
+    key. The caller may commit and expunge between chunks.
+
+    Args:
+        query: A SQLAlchemy query
+        column: The unique column to page on
+        chunk_size: Maximum rows per chunk
+
+    Yields:
+        Lists of rows
+
+    """
+    last = None
+    while True:
+        page = query
+        if last is not None:
+            page = page.filter(column > last)
+
+        rows = page.order_by(column).limit(chunk_size).all()
+        if not rows:
+            return
+
+        last = getattr(rows[-1], column.key)
+        yield rows
+
+
+# Escape character for like_pattern
+LIKE_ESCAPE = '\\'
+
+
+def like_pattern(value):
+    """Build a LIKE pattern matching value anywhere, taken literally.
+
+    Use with column.like(pattern, escape=LIKE_ESCAPE) so that % and _ in
+    value don't act as wildcards.
+
+    Args:
+        value: The text to look for
+
+    Returns:
+        The pattern
+
+    """
+    for char in (LIKE_ESCAPE, '%', '_'):
+        value = value.replace(char, LIKE_ESCAPE + char)
+
+    return '%{0}%'.format(value)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""DataTables server-side processing.
+
+Parse the request parameters DataTables sends when serverSide is enabled and
+format the response it expects. See
+https://datatables.net/manual/server-side
+
+"""
+
+# standard library imports
+
+# third-party imports
+from flask import jsonify
+
+# application imports
+
+
+def _int_arg(args, name, default):
+    """Get an integer request argument, falling back to default."""
+    try:
+        return int(args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class DataTablesRequest(object):
+    """Server-side processing parameters from a DataTables request.
+
+    A request without DataTables parameters asks for everything, unsorted.
+
+    draw may be left out of a server-side request so that identical requests
+    have identical URLs and can be answered from the browser cache. DataTables
+    then skips its check for out of order responses.
+
+    Attributes:
+        server_side: Whether this is a server-side processing request
+        draw: Request counter, echoed back in the response (None if absent)
+        start: Index of the first row to return
+        length: Number of rows to return, None for all
+        search: Global search value, stripped
+        order: List of (column data name, descending) tuples
+
+    """
+
+    def __init__(self, args, max_length=None):
+        """Constructor.
+
+        Args:
+            args: The request arguments (request.args)
+            max_length: Optional upper bound on length
+
+        """
+        self.server_side = 'draw' in args or 'start' in args
+
+        draw = args.get('draw')
+        self.draw = _int_arg(args, 'draw', 0) if draw is not None else None
+
+        self.start = max(_int_arg(args, 'start', 0), 0)
+
+        length = _int_arg(args, 'length', -1)
+        self.length = None if length < 0 else length
+        if max_length is not None and (
+                self.length is None or self.length > max_length):
+            self.length = max_length
+
+        self.search = args.get('search[value]', '').strip()
+
+        self.order = []
+        index = 0
+        while 'order[{0}][column]'.format(index) in args:
+            column = _int_arg(args, 'order[{0}][column]'.format(index), -1)
+            data = args.get('columns[{0}][data]'.format(column))
+            descending = args.get('order[{0}][dir]'.format(index)) == 'desc'
+            if data:
+                self.order.append((data, descending))
+            index += 1
+
+    def page(self, query):
+        """Apply start and length to a query."""
+        if self.start:
+            query = query.offset(self.start)
+        if self.length is not None:
+            query = query.limit(self.length)
+
+        return query
+
+    def response(self, data, total, filtered):
+        """Build the DataTables response.
+
+        Args:
+            data: List of row dicts for the page
+            total: Number of rows before filtering
+            filtered: Number of rows after filtering
+
+        Returns:
+            A JSON response
+
+        """
+        result = dict(data=data)
+        if self.server_side:
+            result.update(recordsTotal=total, recordsFiltered=filtered)
+        if self.draw is not None:
+            result.update(draw=self.draw)
+
+        return jsonify(result)
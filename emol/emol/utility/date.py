@@ -2,7 +2,7 @@
 """Time and date utility functions."""
 
 # standard library imports
-from datetime import datetime
+from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import pytz
 
@@ -61,3 +61,27 @@ def add_years(start_date, years, days=None):
         delta += relativedelta(days=days)
 
     return start_date +  delta
+
+
+def base_date_for_expiry(day, years):
+    """Latest start date that is years old on or before a day.
+
+    The inverse of add_years for finding which dates expire by a day.
+    Adding years isn't one to one around February 29, so a first guess is
+    adjusted by days.
+
+    Args:
+        day: The date to count back from
+        years: Number of years from start date to expiry
+
+    Returns:
+        The latest date for which add_years(date, years) <= day
+
+    """
+    base = add_years(day, -years)
+    while add_years(base + timedelta(days=1), years) <= day:
+        base += timedelta(days=1)
+    while add_years(base, years) > day:
+        base -= timedelta(days=1)
+
+    return base
@@ -4,14 +4,393 @@
 This module presents a class that wraps the PyCrypto library to provide
 encryption and decryption services for eMoL.
 
+Two ciphertext formats are understood:
+
+    KMS: The record is encrypted directly by AWS KMS. Every encrypt and
+        decrypt is a round trip to KMS.
+
+    Envelope: The record is encrypted locally with AES-GCM under a data key.
+        The data key is generated by KMS and stored alongside the record in
+        its KMS-wrapped form. Unwrapped data keys are cached in process so
+        that most records never touch the network.
+
+Both formats are base64 encoded and may coexist in the same column. Envelope
+blobs carry a magic prefix so decrypt can tell them apart, which allows
+records to be migrated lazily as they are next saved.
+
+The key management service behind the cipher is pluggable and selected with
+EMOL_CIPHER_BACKEND in config.py:
+
+    kms: AWS KMS (the default)
+    local: AES-GCM under a local master key, for development and testing
+    fake-kms: local, with injected latency to mimic KMS round trips
+
+
 """
 
 import base64
+import hashlib
 import json
+import os
+import random
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from Crypto.Cipher import AES
 from flask import current_app
 
+from emol.exception.encryption_exception import EncryptionException
+
+# Envelope blob layout:
+#   magic (4) | version (1) | wrapped key length (2) | wrapped key
+#   | nonce (12) | tag (16) | ciphertext
+ENVELOPE_MAGIC = b'EMOL'
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER = struct.Struct('>4sBH')
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# Local backend blob layout:
+#   magic (4) | nonce (12) | tag (16) | ciphertext
+LOCAL_MAGIC = b'EMLK'
+
+
+def is_envelope(blob):
+    """Check if a decoded ciphertext blob is in envelope format.
+
+    Args:
+        blob: Ciphertext bytes (already base64 decoded)
+
+    Returns:
+        Boolean
+
+    """
+    return blob[:len(ENVELOPE_MAGIC)] == ENVELOPE_MAGIC
+
+
+class DataKeyCache(object):
+    """In-process cache of KMS data keys.
+
+    One data key at a time is used for encryption. It is replaced when it
+    reaches its TTL or has been used max_uses times, whichever comes first.
+
+    Unwrapped data keys seen while decrypting are remembered by their wrapped
+    form for the same TTL, so a roster full of records encrypted under the
+    same data key costs one KMS call instead of one per record.
+
+    """
+
+    def __init__(self, ttl, max_uses):
+        """Constructor.
+
+        Args:
+            ttl: Number of seconds a data key may be held in memory
+            max_uses: Number of encryptions permitted under one data key
+
+        """
+        self._ttl = ttl
+        self._max_uses = max_uses
+        self._lock = threading.Lock()
+        self._current = None
+        self._unwrapped = {}
+
+    def _expired(self, created):
+        """Check if a key created at the given time has outlived the TTL."""
+        return time.monotonic() - created > self._ttl
+
+    def encryption_key(self, generate):
+        """Get the data key to encrypt with.
+
+        Args:
+            generate: Callable returning a new (plaintext, wrapped) key pair
+
+        Returns:
+            Tuple of (plaintext key, wrapped key)
+
+        """
+        with self._lock:
+            current = self._current
+            if (current is None or current['uses'] >= self._max_uses or
+                    self._expired(current['created'])):
+                plaintext, wrapped = generate()
+                current = dict(
+                    plaintext=plaintext,
+                    wrapped=wrapped,
+                    created=time.monotonic(),
+                    uses=0
+                )
+                self._current = current
+                self._unwrapped[wrapped] = (plaintext, current['created'])
+
+            current['uses'] += 1
+            return current['plaintext'], current['wrapped']
+
+    def decryption_key(self, wrapped, unwrap):
+        """Get the plaintext data key for a wrapped data key.
+
+        Args:
+            wrapped: The KMS-wrapped data key from an envelope blob
+            unwrap: Callable that asks KMS to unwrap the key
+
+        Returns:
+            The plaintext data key
+
+        """
+        with self._lock:
+            cached = self._unwrapped.get(wrapped)
+            if cached is not None and not self._expired(cached[1]):
+                return cached[0]
+
+        # Don't hold the lock across the KMS round trip
+        plaintext = unwrap(wrapped)
+
+        with self._lock:
+            self._purge()
+            self._unwrapped[wrapped] = (plaintext, time.monotonic())
+
+        return plaintext
+
+    def _purge(self):
+        """Drop expired unwrapped keys. Caller holds the lock."""
+        expired = [wrapped for wrapped, (_, created) in self._unwrapped.items()
+                   if self._expired(created)]
+        for wrapped in expired:
+            del self._unwrapped[wrapped]
+
+    def clear(self):
+        """Forget all cached keys."""
+        with self._lock:
+            self._current = None
+            self._unwrapped.clear()
+
+
+class KmsBackend(object):
+    """Key management through AWS KMS."""
+
+    def __init__(self, region, access_key, secret_key, key_id):
+        """Constructor.
+
+        Args:
+            region: AWS region
+            access_key: AWS access key
+            secret_key: AWS secret key
+            key_id: ARN of the KMS key to use
+
+        """
+        self._client = boto3.client(
+            'kms',
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+        self._key_id = key_id
+
+    def encrypt(self, plaintext):
+        """Encrypt plaintext under the master key.
+
+        Args:
+            plaintext: Data to be encrypted
+
+        Returns:
+            Ciphertext blob
+
+        """
+        metadata = self._client.encrypt(
+            KeyId=self._key_id,
+            Plaintext=plaintext
+        )
+        return metadata['CiphertextBlob']
+
+    def decrypt(self, blob):
+        """Decrypt a ciphertext blob produced by encrypt.
+
+        Args:
+            blob: Ciphertext blob
+
+        Returns:
+            The decrypted plaintext
+
+        """
+        metadata = self._client.decrypt(CiphertextBlob=blob)
+        return metadata['Plaintext']
+
+    def generate_data_key(self):
+        """Generate a new AES-256 data key.
+
+        Returns:
+            Tuple of (plaintext key, wrapped key)
+
+        """
+        metadata = self._client.generate_data_key(
+            KeyId=self._key_id,
+            KeySpec='AES_256'
+        )
+        return metadata['Plaintext'], metadata['CiphertextBlob']
+
+
+class LocalBackend(object):
+    """Key management with a local master key.
+
+    Behaves like KmsBackend without leaving the process. Intended for
+    development, unit tests and benchmarks; the master key is derived from
+    configuration so anyone who can read config.py can read the data.
+
+    """
+
+    def __init__(self, master_key):
+        """Constructor.
+
+        Args:
+            master_key: Secret string to derive the AES-256 master key from
+
+        """
+        self._key = hashlib.sha256(master_key.encode('utf-8')).digest()
+
+    def encrypt(self, plaintext):
+        """Encrypt plaintext under the master key.
+
+        Args:
+            plaintext: Data to be encrypted
+
+        Returns:
+            Ciphertext blob
+
+        """
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode('utf-8')
+
+        nonce = os.urandom(NONCE_SIZE)
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce)
+        ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+        return LOCAL_MAGIC + nonce + tag + ciphertext
+
+    def decrypt(self, blob):
+        """Decrypt a ciphertext blob produced by encrypt.
+
+        Args:
+            blob: Ciphertext blob
+
+        Returns:
+            The decrypted plaintext
+
+        Raises:
+            EncryptionException if the blob is not valid for this key
+
+        """
+        if blob[:len(LOCAL_MAGIC)] != LOCAL_MAGIC:
+            raise EncryptionException('Not a local ciphertext blob')
+
+        offset = len(LOCAL_MAGIC)
+        nonce = blob[offset:offset + NONCE_SIZE]
+        offset += NONCE_SIZE
+        tag = blob[offset:offset + TAG_SIZE]
+        offset += TAG_SIZE
+
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce)
+        try:
+            return cipher.decrypt_and_verify(blob[offset:], tag)
+        except ValueError:
+            raise EncryptionException('Local authentication failed')
+
+    def generate_data_key(self):
+        """Generate a new AES-256 data key.
+
+        Returns:
+            Tuple of (plaintext key, wrapped key)
+
+        """
+        plaintext = os.urandom(32)
+        return plaintext, self.encrypt(plaintext)
+
+
+class FakeKmsBackend(LocalBackend):
+    """LocalBackend with a delay on every call.
+
+    Stands in for KMS when measuring how the application behaves with real
+    network round trips, without needing AWS.
+
+    Attributes:
+        calls: Number of simulated round trips made
+
+    """
+
+    def __init__(self, master_key, latency, jitter=0):
+        """Constructor.
+
+        Args:
+            master_key: Secret string to derive the AES-256 master key from
+            latency: Milliseconds to wait per call
+            jitter: Milliseconds of random variation added to latency
+
+        """
+        super().__init__(master_key)
+        self._latency = latency / 1000.0
+        self._jitter = jitter / 1000.0
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _round_trip(self):
+        """Simulate the network."""
+        with self._lock:
+            self.calls += 1
+
+        time.sleep(self._latency + random.uniform(0, self._jitter))
+
+    def encrypt(self, plaintext):
+        """Encrypt after a simulated round trip."""
+        self._round_trip()
+        return super().encrypt(plaintext)
+
+    def decrypt(self, blob):
+        """Decrypt after a simulated round trip."""
+        self._round_trip()
+        return super().decrypt(blob)
+
+    def generate_data_key(self):
+        """Generate a data key after a simulated round trip."""
+        plaintext = os.urandom(32)
+        return plaintext, self.encrypt(plaintext)
+
+
+def make_backend(name, config, key=None):
+    """Create a key management backend.
+
+    Args:
+        name: Backend name: kms, local or fake-kms
+        config: The application config
+        key: Fallback secret for the local backends if EMOL_LOCAL_KEY
+            is not configured
+
+    Returns:
+        A backend object
+
+    Raises:
+        ValueError if the backend name is unknown
+
+    """
+    if name == 'kms':
+        return KmsBackend(
+            region=config['AWS_REGION'],
+            access_key=config['AWS_ACCESS_KEY'],
+            secret_key=config['AWS_SECRET_KEY'],
+            key_id=config['EMOL_KMS_KEY']
+        )
+
+    master_key = config.get('EMOL_LOCAL_KEY') or key
+    if name == 'local':
+        return LocalBackend(master_key)
+    elif name == 'fake-kms':
+        return FakeKmsBackend(
+            master_key,
+            latency=config.get('EMOL_FAKE_KMS_LATENCY', 20),
+            jitter=config.get('EMOL_FAKE_KMS_JITTER', 0)
+        )
+
+    raise ValueError('Unknown cipher backend {0}'.format(name))
+
 
 class AESCipher(object):
     """Class to encapsulate AES encryption and decryption.
@@ -20,11 +399,19 @@ class AESCipher(object):
     constructor. If eMoL was set up correctly, that file should be readable
     only by the user that eMoL runs under in the httpd/WSGI environment.
 
+    Envelope encryption is enabled with EMOL_ENVELOPE_ENCRYPTION in config.py.
+    EMOL_DATA_KEY_TTL (seconds) and EMOL_DATA_KEY_MAX_USES bound how long
+    and how often a data key is used. Decryption handles both formats
+    regardless of the setting.
+
+    EMOL_DECRYPT_WORKERS sets the number of threads decrypt_raw_batch and
+    decrypt_json_batch use for records that need a KMS round trip.
+
     """
 
-    _client = None
+    _backend = None
 
-    def __init__(self, key):
+    def __init__(self, key, backend=None, envelope=None):
         """Constructor.
 
         Verify that the keyfile permissions are correct (TODO), then read the
@@ -32,16 +419,119 @@ class AESCipher(object):
 
         Args:
             key: The encryption key
+            backend: Optional backend object, overrides EMOL_CIPHER_BACKEND
+            envelope: Optional boolean, overrides EMOL_ENVELOPE_ENCRYPTION
 
         Raises:
             Exception if the keyfile cannot be read
         """
-        self._client = boto3.client(
-            'kms',
-            region_name=current_app.config['AWS_REGION'],
-            aws_access_key_id=current_app.config['AWS_ACCESS_KEY'],
-            aws_secret_access_key=current_app.config['AWS_SECRET_KEY']
+        config = current_app.config
+        if backend is None:
+            backend = make_backend(
+                config.get('EMOL_CIPHER_BACKEND', 'kms'), config, key)
+        if envelope is None:
+            envelope = config.get('EMOL_ENVELOPE_ENCRYPTION', False)
+
+        self._backend = backend
+        self._envelope = envelope
+        self._key_cache = DataKeyCache(
+            ttl=config.get('EMOL_DATA_KEY_TTL', 300),
+            max_uses=config.get('EMOL_DATA_KEY_MAX_USES', 100000)
         )
+        self._workers = config.get('EMOL_DECRYPT_WORKERS', 8)
+
+    def _envelope_encrypt(self, plaintext):
+        """Encrypt locally under the current data key.
+
+        Args:
+            plaintext: Bytes to encrypt
+
+        Returns:
+            Envelope blob (not base64 encoded)
+
+        """
+        key, wrapped = self._key_cache.encryption_key(
+            self._backend.generate_data_key)
+        header = ENVELOPE_HEADER.pack(
+            ENVELOPE_MAGIC, ENVELOPE_VERSION, len(wrapped)) + wrapped
+
+        nonce = os.urandom(NONCE_SIZE)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+
+        return header + nonce + tag + ciphertext
+
+    def _envelope_decrypt(self, blob):
+        """Decrypt an envelope blob.
+
+        Args:
+            blob: Envelope blob (not base64 encoded)
+
+        Returns:
+            The decrypted plaintext
+
+        Raises:
+            EncryptionException if the blob is malformed or fails
+            authentication
+
+        """
+        _, version, wrapped_length = ENVELOPE_HEADER.unpack_from(blob)
+        if version != ENVELOPE_VERSION:
+            raise EncryptionException(
+                'Unknown envelope version {0}'.format(version))
+
+        offset = ENVELOPE_HEADER.size
+        wrapped = blob[offset:offset + wrapped_length]
+        offset += wrapped_length
+        nonce = blob[offset:offset + NONCE_SIZE]
+        offset += NONCE_SIZE
+        tag = blob[offset:offset + TAG_SIZE]
+        offset += TAG_SIZE
+
+        key = self._key_cache.decryption_key(wrapped, self._backend.decrypt)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(blob[:ENVELOPE_HEADER.size + wrapped_length])
+        try:
+            return cipher.decrypt_and_verify(blob[offset:], tag)
+        except ValueError:
+            raise EncryptionException('Envelope authentication failed')
+
+    def encrypt_raw(self, plaintext):
+        """Encrypt the given data.
+
+        Args:
+            plaintext: Data to be encrypted
+
+        Returns:
+            The encrypted data as bytes, not base64 encoded
+        """
+        if plaintext is None:
+            return None
+
+        if self._envelope:
+            if isinstance(plaintext, str):
+                plaintext = plaintext.encode('utf-8')
+            return self._envelope_encrypt(plaintext)
+
+        return self._backend.encrypt(plaintext)
+
+    def decrypt_raw(self, blob):
+        """Decrypt data encrypted by encrypt_raw.
+
+        Args:
+            blob: Encrypted data, not base64 encoded
+
+        Returns:
+            The decrypted plaintext
+        """
+        if blob is None:
+            return None
+
+        if is_envelope(blob):
+            return self._envelope_decrypt(blob)
+
+        return self._backend.decrypt(blob)
 
     def encrypt(self, plaintext):
         """Encrypt the given data then base64 encode.
@@ -55,11 +545,7 @@ class AESCipher(object):
         if plaintext is None:
             return None
 
-        metadata = self._client.encrypt(
-            KeyId=current_app.config['EMOL_KMS_KEY'],
-            Plaintext=plaintext
-        )
-        return base64.b64encode(metadata['CiphertextBlob'])
+        return base64.b64encode(self.encrypt_raw(plaintext))
 
     def decrypt(self, ciphertext):
         """Base64 decode the given ciphertext and then decrypt.
@@ -73,10 +559,25 @@ class AESCipher(object):
         if ciphertext is None:
             return None
 
-        metadata = self._client.decrypt(
-            CiphertextBlob=base64.b64decode(ciphertext)
-        )
-        return metadata['Plaintext']
+        return self.decrypt_raw(base64.b64decode(ciphertext))
+
+    def needs_migration(self, ciphertext):
+        """Check if ciphertext is not in the format currently written.
+
+        Records for which this is True will be rewritten in the current format
+        the next time they are saved.
+
+        Args:
+            ciphertext: Encrypted data, base64 encoded
+
+        Returns:
+            Boolean
+
+        """
+        if ciphertext is None:
+            return False
+
+        return is_envelope(base64.b64decode(ciphertext)) != self._envelope
 
     def encrypt_json(self, data):
         """Convert dump data to a JSON string and encrypt.
@@ -106,3 +607,59 @@ class AESCipher(object):
         """
         plaintext = self.decrypt(ciphertext)
         return json.loads(plaintext)
+
+    def decrypt_raw_batch(self, blobs):
+        """Decrypt a batch of blobs encrypted by encrypt_raw.
+
+        Identical blobs are decrypted once. Blobs that need a KMS round
+        trip are decrypted concurrently on a thread pool; envelope blobs are
+        decrypted inline since their data keys are normally cached.
+
+        Args:
+            blobs: Iterable of encrypted data, not base64 encoded
+
+        Returns:
+            List of plaintexts in the same order as blobs. None blobs
+            produce None.
+
+        """
+        blobs = [None if b is None else bytes(b) for b in blobs]
+        unique = set(b for b in blobs if b is not None)
+
+        plaintexts = {}
+        remote = []
+        for blob in unique:
+            if is_envelope(blob):
+                plaintexts[blob] = self._envelope_decrypt(blob)
+            else:
+                remote.append(blob)
+
+        if len(remote) == 1:
+            plaintexts[remote[0]] = self.decrypt_raw(remote[0])
+        elif remote:
+            workers = min(self._workers, len(remote))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for blob, plaintext in zip(
+                        remote, executor.map(self.decrypt_raw, remote)):
+                    plaintexts[blob] = plaintext
+
+        return [None if b is None else plaintexts[b] for b in blobs]
+
+    def decrypt_json_batch(self, ciphertexts):
+        """Decrypt and deserialize a batch of JSON ciphertexts.
+
+        See decrypt_raw_batch.
+
+        Args:
+            ciphertexts: Iterable of encrypted JSON-serializable data
+
+        Returns:
+            List of decrypted data in the same order as ciphertexts. None
+            ciphertexts produce None.
+
+        """
+        plaintexts = self.decrypt_raw_batch(
+            None if c is None else base64.b64decode(c) for c in ciphertexts)
+
+        # Each record gets its own dict, callers may modify them
+        return [None if p is None else json.loads(p) for p in plaintexts]
@@ -3,6 +3,7 @@
 
 # standard library imports
 import hashlib
+import hmac
 
 # third-party imports
 from flask import current_app
@@ -31,3 +32,59 @@ class Sha256(object):
     def validate_hash(cls, payload, compare):
         """Validate a hash."""
         return cls.generate_hash(str(payload)) == compare
+
+
+class BlindIndex(object):
+    """Keyed HMAC-SHA256 blind index.
+
+    A blind index lets encrypted values be found by exact match without
+    decrypting anything: the index of the search term is compared against
+    an indexed column holding the index of each stored value.
+
+    The key used is BLIND_INDEX_KEY in config.py, or HASH_SALT if that is not
+    defined. Changing the key invalidates every stored index; run the
+    backfill_blind_index command afterwards.
+
+    """
+
+    @classmethod
+    def normalize(cls, value, strip_spaces=False):
+        """Normalize a value so that trivially different inputs match.
+
+        Args:
+            value: The value to normalize
+            strip_spaces: Remove all whitespace instead of collapsing it
+
+        Returns:
+            The normalized string
+
+        """
+        joiner = '' if strip_spaces else ' '
+        return joiner.join(str(value).split()).casefold()
+
+    @classmethod
+    def generate(cls, value, strip_spaces=False):
+        """Generate the blind index for a value.
+
+        Args:
+            value: The value to index
+            strip_spaces: Remove all whitespace before indexing
+
+        Returns:
+            Hex digest, or None for a blank value
+
+        """
+        if value is None:
+            return None
+
+        normalized = cls.normalize(value, strip_spaces)
+        if not normalized:
+            return None
+
+        key = (current_app.config.get('BLIND_INDEX_KEY') or
+               current_app.config.get('HASH_SALT'))
+        return hmac.new(
+            bytes(key, 'UTF-8'),
+            bytes(normalized, 'UTF-8'),
+            hashlib.sha256
+        ).hexdigest()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Compact binary serialization for encrypted payloads.
+
+A record is serialized as its values in a fixed field order, with no field
+names. Each value is a one byte type tag followed by the value:
+
+    ABSENT: Field not present in the record
+    NONE: None
+    STR: Varint byte length, then UTF-8
+    DATE: datetime.date as a 4 byte day ordinal
+    DATE_STR: A DATE_FORMAT date string as a 4 byte day ordinal, read back
+        as the same string
+    INT: 8 byte signed integer
+    JSON: Varint byte length, then JSON, for anything else
+
+A payload is a set of separately encrypted sections, each identified by a
+one byte section code:
+
+    version (1) | code (1) | varint length | ciphertext | code (1) | ...
+
+The version byte covers both layouts. The meaning of section codes and the
+field order belong to the caller and must never change within a version.
+
+"""
+
+# standard library imports
+import json
+import re
+import struct
+from datetime import date
+
+# third-party imports
+
+# application imports
+
+__all__ = ['pack_record', 'unpack_record', 'pack_sections', 'unpack_sections']
+
+ABSENT = 0
+NONE = 1
+STR = 2
+DATE = 3
+DATE_STR = 4
+INT = 5
+JSON = 6
+
+ORDINAL = struct.Struct('>I')
+INTEGER = struct.Struct('>q')
+
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _pack_varint(value):
+    """Encode a non-negative integer as a LEB128 varint."""
+    result = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def _unpack_varint(buffer, offset):
+    """Decode a LEB128 varint.
+
+    Returns:
+        A tuple of (value, offset after the varint)
+
+    """
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(buffer):
+            raise ValueError('Truncated payload')
+
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def _date_from_string(value):
+    """Get the date for an ISO date string, if it survives a round trip."""
+    if not ISO_DATE.match(value):
+        return None
+
+    try:
+        result = date(int(value[:4]), int(value[5:7]), int(value[8:]))
+    except ValueError:
+        return None
+
+    return result if result.isoformat() == value else None
+
+
+def _pack_value(value):
+    """Tag and encode one value."""
+    if value is None:
+        return bytes((NONE,))
+
+    if isinstance(value, str):
+        as_date = _date_from_string(value)
+        if as_date is not None:
+            return bytes((DATE_STR,)) + ORDINAL.pack(as_date.toordinal())
+
+        encoded = value.encode('utf-8')
+        return bytes((STR,)) + _pack_varint(len(encoded)) + encoded
+
+    # bool is an int, leave it to JSON so it comes back as a bool
+    if type(value) is date:
+        return bytes((DATE,)) + ORDINAL.pack(value.toordinal())
+
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return bytes((INT,)) + INTEGER.pack(value)
+
+    encoded = json.dumps(value).encode('utf-8')
+    return bytes((JSON,)) + _pack_varint(len(encoded)) + encoded
+
+
+def pack_record(data, fields):
+    """Serialize a record.
+
+    Args:
+        data: Dict of field values
+        fields: The field order
+
+    Returns:
+        The serialized record
+
+    Raises:
+        ValueError if data has fields not in the field order
+
+    """
+    unknown = set(data) - set(fields)
+    if unknown:
+        raise ValueError('Fields not in payload field order: {0}'.format(
+            ', '.join(sorted(unknown))))
+
+    return b''.join(
+        _pack_value(data[field]) if field in data else bytes((ABSENT,))
+        for field in fields
+    )
+
+
+def unpack_record(buffer, fields):
+    """Deserialize a record.
+
+    Args:
+        buffer: A record serialized by pack_record
+        fields: The field order it was serialized with
+
+    Returns:
+        Dict of field values
+
+    Raises:
+        ValueError if the record is malformed
+
+    """
+    buffer = memoryview(buffer)
+    result = {}
+    offset = 0
+    for field in fields:
+        if offset >= len(buffer):
+            raise ValueError('Truncated payload')
+
+        tag = buffer[offset]
+        offset += 1
+
+        if tag == ABSENT:
+            continue
+        elif tag == NONE:
+            result[field] = None
+        elif tag in (DATE, DATE_STR):
+            if offset + ORDINAL.size > len(buffer):
+                raise ValueError('Truncated payload')
+            value = date.fromordinal(ORDINAL.unpack_from(buffer, offset)[0])
+            offset += ORDINAL.size
+            result[field] = value if tag == DATE else value.isoformat()
+        elif tag == INT:
+            if offset + INTEGER.size > len(buffer):
+                raise ValueError('Truncated payload')
+            result[field] = INTEGER.unpack_from(buffer, offset)[0]
+            offset += INTEGER.size
+        elif tag in (STR, JSON):
+            length, offset = _unpack_varint(buffer, offset)
+            if offset + length > len(buffer):
+                raise ValueError('Truncated payload')
+            value = bytes(buffer[offset:offset + length]).decode('utf-8')
+            offset += length
+            result[field] = value if tag == STR else json.loads(value)
+        else:
+            raise ValueError('Unknown payload type tag {0}'.format(tag))
+
+    if offset != len(buffer):
+        raise ValueError('Trailing data in payload')
+
+    return result
+
+
+def pack_sections(version, sections):
+    """Assemble a payload from encrypted sections.
+
+    Args:
+        version: Payload format version (0-255)
+        sections: Dict of section code (0-255) to ciphertext bytes
+
+    Returns:
+        The payload
+
+    """
+    parts = [bytes((version,))]
+    for code in sorted(sections):
+        ciphertext = sections[code]
+        parts.append(bytes((code,)) + _pack_varint(len(ciphertext)))
+        parts.append(ciphertext)
+
+    return b''.join(parts)
+
+
+def unpack_sections(payload):
+    """Split a payload into its encrypted sections.
+
+    Args:
+        payload: A payload assembled by pack_sections
+
+    Returns:
+        A tuple of (version, dict of section code to ciphertext bytes)
+
+    Raises:
+        ValueError if the payload is malformed
+
+    """
+    payload = bytes(payload)
+    if not payload:
+        raise ValueError('Empty payload')
+
+    version = payload[0]
+    sections = {}
+    offset = 1
+    while offset < len(payload):
+        code = payload[offset]
+        length, offset = _unpack_varint(payload, offset + 1)
+        if offset + length > len(payload):
+            raise ValueError('Truncated payload')
+        sections[code] = payload[offset:offset + length]
+        offset += length
+
+    return version, sections
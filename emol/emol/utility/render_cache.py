@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Caches for rendered pages.
+
+A rendered page is stored under a key along with the version of the data it
+was rendered from. A cached page is only returned when asked for with the
+same version, so bumping the version is enough to stop a stale page being
+served. invalidate removes a key outright, whatever its version.
+
+Two backends:
+
+    MemoryRenderCache: In-process, bounded LRU. Each worker process has its
+        own copy.
+
+    FilesystemRenderCache: One file per key in a directory, shared between
+        worker processes on the same host.
+
+"""
+
+# standard library imports
+import hashlib
+import os
+import tempfile
+
+# third-party imports
+
+# application imports
+from .cache import LRUCache
+
+__all__ = [
+    'MemoryRenderCache',
+    'FilesystemRenderCache',
+    'NullRenderCache',
+    'make_render_cache'
+]
+
+
+class NullRenderCache(object):
+    """A render cache that caches nothing."""
+
+    def get(self, key, version):
+        """Always a miss."""
+        return None
+
+    def set(self, key, version, content):
+        """Discard the page."""
+
+    def invalidate(self, key):
+        """Nothing to invalidate."""
+
+    def clear(self):
+        """Nothing to clear."""
+
+
+class MemoryRenderCache(object):
+    """In-process render cache."""
+
+    def __init__(self, max_size):
+        """Constructor.
+
+        Args:
+            max_size: Maximum number of pages held
+
+        """
+        self._cache = LRUCache(max_size)
+
+    def get(self, key, version):
+        """Get a cached page.
+
+        Args:
+            key: The page key
+            version: The current version of the page's data
+
+        Returns:
+            The page, or None if not cached at this version
+
+        """
+        entry = self._cache.get(key)
+        if entry is None or entry[0] != version:
+            return None
+
+        return entry[1]
+
+    def set(self, key, version, content):
+        """Cache a page.
+
+        Args:
+            key: The page key
+            version: The version of the data the page was rendered from
+            content: The rendered page
+
+        """
+        self._cache.set(key, (version, content))
+
+    def invalidate(self, key):
+        """Remove a page from the cache."""
+        self._cache.invalidate(key)
+
+    def clear(self):
+        """Empty the cache."""
+        self._cache.clear()
+
+
+class FilesystemRenderCache(object):
+    """Render cache keeping one file per key in a directory.
+
+    Files are named for a hash of the key, and the version is stored on the
+    first line. Writes go to a temporary file that is renamed into place so
+    readers never see a partial page.
+
+    """
+
+    def __init__(self, directory):
+        """Constructor.
+
+        Args:
+            directory: Directory to keep the cache in, created if needed
+
+        """
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        """File path for a key."""
+        name = hashlib.sha256(str(key).encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, name + '.html')
+
+    def get(self, key, version):
+        """Get a cached page.
+
+        Args:
+            key: The page key
+            version: The current version of the page's data
+
+        Returns:
+            The page, or None if not cached at this version
+
+        """
+        try:
+            with open(self._path(key), encoding='utf-8', newline='') as cached:
+                stored_version = cached.readline().rstrip('\n')
+                if stored_version != str(version):
+                    return None
+
+                return cached.read()
+        except OSError:
+            return None
+
+    def set(self, key, version, content):
+        """Cache a page.
+
+        Args:
+            key: The page key
+            version: The version of the data the page was rendered from
+            content: The rendered page
+
+        """
+        handle, temp_path = tempfile.mkstemp(dir=self._directory)
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8', newline='') as temp:
+                temp.write('{0}\n'.format(version))
+                temp.write(content)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def invalidate(self, key):
+        """Remove a page from the cache."""
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Empty the cache."""
+        for name in os.listdir(self._directory):
+            if name.endswith('.html'):
+                try:
+                    os.unlink(os.path.join(self._directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+def make_render_cache(backend, size=1000, directory=None):
+    """Create a render cache.
+
+    Args:
+        backend: 'memory', 'filesystem' or 'none'
+        size: Maximum pages held by the memory backend
+        directory: Directory for the filesystem backend
+
+    Returns:
+        A render cache
+
+    Raises:
+        ValueError for an unknown backend
+
+    """
+    if backend == 'memory':
+        return MemoryRenderCache(size)
+    elif backend == 'filesystem':
+        if directory is None:
+            raise ValueError('The filesystem render cache needs a directory')
+        return FilesystemRenderCache(directory)
+    elif backend in (None, 'none'):
+        return NullRenderCache()
+
+    raise ValueError('Unknown render cache backend {0}'.format(backend))
@@ -4,6 +4,8 @@ from importlib import __import__
 import pytest
 import sys
 
+from sqlalchemy import event
+
 
 class Mocktoday(object):
     """A context manager for to fake out datetime.date.today.
@@ -99,6 +101,7 @@ class Mockmail(object):
             @classmethod
             def send_email(cls, a, b, c):
                 self.mocked = True
+                return True
 
             @classmethod
             def send_waiver_expiry(cls, combatant, expiry_days):
@@ -147,3 +150,43 @@ class Mockmail(object):
 
         if self.mocked != self.expected_result:
             pytest.fail(self.messages[self.expected_result])
+
+
+class QueryCounter(object):
+    """A context manager counting the SQL statements executed.
+
+    Usage:
+
+       from emol.utility.testing import QueryCounter
+
+       def test_not_chatty(app):
+          with QueryCounter(app.db.engine) as counter:
+             # do something
+          assert counter.count <= 5
+
+    """
+
+    def __init__(self, engine):
+        """Constructor.
+
+        Args:
+           engine: The SQLAlchemy engine to listen on
+
+        """
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _count(self, conn, cursor, statement, *args, **kwargs):
+        """Record a statement."""
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        """Start counting."""
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Stop counting."""
+        event.remove(self.engine, 'before_cursor_execute', self._count)
@@ -0,0 +1,53 @@
+"""Unit tests for the LRU cache."""
+from emol.utility import cache as cache_module
+from emol.utility.cache import LRUCache
+
+
+def test_lru_eviction():
+    """Least recently used entry is evicted and handed to on_evict."""
+    evicted = []
+    cache = LRUCache(max_size=2, on_evict=evicted.append)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert evicted == [2]
+
+
+def test_lru_expiry(monkeypatch):
+    """Entries older than the TTL are misses."""
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+
+    evicted = []
+    cache = LRUCache(max_size=10, ttl=5, on_evict=evicted.append)
+    cache.set('a', {'legal_name': 'Fred'})
+    assert cache.get('a') == {'legal_name': 'Fred'}
+
+    now[0] += 6
+    assert cache.get('a') is None
+    assert evicted == [{'legal_name': 'Fred'}]
+
+
+def test_lru_invalidate():
+    """Invalidated entries are gone and evicted."""
+    evicted = []
+    cache = LRUCache(max_size=10, on_evict=evicted.append)
+    cache.set('a', 1)
+    cache.invalidate('a')
+    cache.invalidate('missing')
+
+    assert cache.get('a') is None
+    assert evicted == [1]
+
+
+def test_lru_disabled():
+    """A zero-sized cache stores nothing."""
+    cache = LRUCache(max_size=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
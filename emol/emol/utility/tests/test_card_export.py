@@ -0,0 +1,98 @@
+"""Unit tests for the static card export."""
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from emol.models import Discipline
+from emol.utility.date import add_years, today
+from emol.utility.card_export import export_cards
+
+
+@pytest.fixture
+def exported_combatant(app, combatant):
+    """The combatant fixture with a card ID, a card and privacy accepted."""
+    combatant.card_id = 'card-export-test'
+    combatant.privacy_acceptance.accepted = datetime.utcnow()
+    discipline = Discipline.find('rapier')
+    card = combatant.get_card(discipline, create=True)
+    card.authorizations.extend(discipline.authorizations)
+    app.db.session.commit()
+
+    yield combatant
+
+
+def _index(directory):
+    with open(os.path.join(directory, 'index.json')) as f:
+        return json.load(f)
+
+
+def test_export_html(app, exported_combatant, tmpdir):
+    """Every card is written along with an index."""
+    directory = str(tmpdir)
+    rendered, unchanged, removed = export_cards(directory, processes=1)
+
+    assert rendered >= 1 and unchanged == 0 and removed == 0
+    entry = _index(directory)['cards']['card-export-test']
+    assert entry['version'] == exported_combatant.card_version
+    with open(os.path.join(directory, entry['file'])) as f:
+        assert 'Heavy Rapier' in f.read()
+    assert os.path.exists(
+        os.path.join(directory, 'static', 'images', 'ealdormere32.png'))
+
+
+def test_export_incremental(app, exported_combatant, tmpdir):
+    """Only changed cards are rendered again, removed cards are deleted."""
+    directory = str(tmpdir)
+    export_cards(directory, file_format='json', processes=1)
+
+    rendered, unchanged, removed = export_cards(
+        directory, file_format='json', processes=1)
+    assert rendered == 0 and unchanged >= 1
+
+    exported_combatant.card_changed()
+    app.db.session.commit()
+    rendered, _, _ = export_cards(directory, file_format='json', processes=1)
+    assert rendered == 1
+
+    path = os.path.join(directory, 'cards', 'card-export-test.json')
+    with open(path) as f:
+        card = json.load(f)
+    assert card['sca_name'] == exported_combatant.sca_name
+    assert card['sections'][0]['slug'] == 'rapier'
+
+    exported_combatant.card_id = None
+    app.db.session.commit()
+    _, _, removed = export_cards(directory, file_format='json', processes=1)
+    assert removed == 1
+    assert not os.path.exists(path)
+    assert 'card-export-test' not in _index(directory)['cards']
+
+
+def test_export_active_only(app, exported_combatant, tmpdir):
+    """Cards without privacy acceptance or a current card are left out."""
+    directory = str(tmpdir)
+
+    exported_combatant.privacy_acceptance.accepted = None
+    app.db.session.commit()
+    export_cards(directory, file_format='json', processes=1)
+    assert 'card-export-test' not in _index(directory)['cards']
+
+    exported_combatant.privacy_acceptance.accepted = datetime.utcnow()
+    for card in exported_combatant.cards:
+        card.card_date = add_years(today(), -2, -1)
+    app.db.session.commit()
+    export_cards(directory, file_format='json', processes=1)
+    assert 'card-export-test' not in _index(directory)['cards']
+
+    exported_combatant.cards[0].card_date = today()
+    app.db.session.commit()
+    export_cards(directory, file_format='json', processes=1)
+    assert 'card-export-test' in _index(directory)['cards']
+
+
+def test_export_unknown_format(app, tmpdir):
+    """Only HTML and JSON are supported."""
+    with pytest.raises(ValueError):
+        export_cards(str(tmpdir), file_format='pdf')
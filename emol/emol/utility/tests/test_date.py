@@ -0,0 +1,20 @@
+"""Unit tests for the date utilities."""
+from datetime import date, timedelta
+
+from emol.utility.date import add_years, base_date_for_expiry
+
+
+def test_base_date_for_expiry():
+    """The latest date expiring by a day, around February 29 too."""
+    assert base_date_for_expiry(date(2021, 6, 15), 2) == date(2019, 6, 15)
+    # Both February 28 and 29 2016 expire on February 28 2018
+    assert base_date_for_expiry(date(2018, 2, 28), 2) == date(2016, 2, 29)
+    # Nothing expires on February 29 2020 from 2 years earlier
+    assert base_date_for_expiry(date(2020, 2, 29), 2) == date(2018, 2, 28)
+
+    day = date(2019, 1, 1)
+    for _ in range(1500):
+        base = base_date_for_expiry(day, 7)
+        assert add_years(base, 7) <= day
+        assert add_years(base + timedelta(days=1), 7) > day
+        day += timedelta(days=1)
@@ -1,3 +1,4 @@
+import base64
 import json
 import os
 import tempfile
@@ -5,7 +6,8 @@ import uuid
 
 import pytest
 
-from emol.utility.encryption import AESCipher
+from emol.exception.encryption_exception import EncryptionException
+from emol.utility.encryption import AESCipher, FakeKmsBackend, LocalBackend
 
 KEY_SIZE = 256
 PLAINTEXT = '01234567890123456'
@@ -75,3 +77,131 @@ def test_encrypt_wrong_key(cipher, cipher2):
         assert decrypted != PLAINTEXT
     except UnicodeDecodeError:
         assert True
+
+
+class FakeKms(object):
+    """Stand-in for the boto3 KMS client that counts round trips."""
+
+    def __init__(self):
+        self.calls = 0
+        self._keys = {}
+
+    def generate_data_key(self, KeyId, KeySpec):
+        self.calls += 1
+        plaintext = os.urandom(32)
+        wrapped = b'wrapped-' + uuid.uuid4().bytes
+        self._keys[wrapped] = plaintext
+        return {'Plaintext': plaintext, 'CiphertextBlob': wrapped}
+
+    def encrypt(self, KeyId, Plaintext):
+        self.calls += 1
+        return {'CiphertextBlob': b'kms-' + Plaintext.encode('utf-8')}
+
+    def decrypt(self, CiphertextBlob):
+        self.calls += 1
+        if CiphertextBlob.startswith(b'kms-'):
+            return {'Plaintext': CiphertextBlob[4:]}
+        return {'Plaintext': self._keys[CiphertextBlob]}
+
+
+@pytest.fixture(scope='function')
+def envelope_cipher(app, monkeypatch):
+    """A cipher in envelope mode backed by FakeKms."""
+    kms = FakeKms()
+    monkeypatch.setattr(
+        'emol.utility.encryption.boto3.client', lambda *args, **kwargs: kms)
+    monkeypatch.setitem(app.config, 'AWS_REGION', 'nowhere')
+    monkeypatch.setitem(app.config, 'AWS_ACCESS_KEY', 'access')
+    monkeypatch.setitem(app.config, 'AWS_SECRET_KEY', 'secret')
+    monkeypatch.setitem(app.config, 'EMOL_KMS_KEY', 'key')
+    monkeypatch.setitem(app.config, 'EMOL_ENVELOPE_ENCRYPTION', True)
+    monkeypatch.setitem(app.config, 'EMOL_DATA_KEY_MAX_USES', 3)
+
+    yield AESCipher(None), kms
+
+
+def test_envelope_data_key_cached(envelope_cipher):
+    """Many envelope records cost one KMS call per data key."""
+    cipher, kms = envelope_cipher
+    ciphertexts = [cipher.encrypt(PLAINTEXT) for _ in range(3)]
+    assert kms.calls == 1
+
+    for ciphertext in ciphertexts:
+        assert cipher.decrypt(ciphertext) == PLAINTEXT.encode('utf-8')
+    assert kms.calls == 1
+
+    # Usage cap reached, next encrypt rotates the data key
+    cipher.encrypt(PLAINTEXT)
+    assert kms.calls == 2
+
+
+def test_envelope_reads_kms_blobs(envelope_cipher):
+    """Legacy KMS blobs decrypt alongside envelope blobs."""
+    cipher, kms = envelope_cipher
+    legacy = base64.b64encode(kms.encrypt('key', PLAINTEXT)['CiphertextBlob'])
+
+    assert cipher.needs_migration(legacy) is True
+    assert cipher.decrypt(legacy) == PLAINTEXT.encode('utf-8')
+
+    envelope = cipher.encrypt(PLAINTEXT)
+    assert cipher.needs_migration(envelope) is False
+
+
+def test_envelope_tamper(envelope_cipher):
+    """A modified envelope blob fails authentication."""
+    cipher, _ = envelope_cipher
+    blob = bytearray(base64.b64decode(cipher.encrypt(PLAINTEXT)))
+    blob[-1] ^= 0xff
+
+    with pytest.raises(EncryptionException):
+        cipher.decrypt(base64.b64encode(bytes(blob)))
+
+
+def test_decrypt_json_batch(envelope_cipher):
+    """Batch decrypt preserves order and decrypts duplicates once."""
+    cipher, kms = envelope_cipher
+    legacy = base64.b64encode(
+        kms.encrypt('key', json.dumps({'n': 1}))['CiphertextBlob'])
+    envelope = cipher.encrypt_json({'n': 2})
+    calls = kms.calls
+
+    results = cipher.decrypt_json_batch([legacy, None, envelope, legacy])
+    assert results == [{'n': 1}, None, {'n': 2}, {'n': 1}]
+    assert results[0] is not results[3]
+    assert kms.calls == calls + 1
+
+
+def test_encrypt_raw(envelope_cipher):
+    """Raw ciphertexts skip base64 and decrypt in batches."""
+    cipher, _ = envelope_cipher
+    blob = cipher.encrypt_raw(b'\x00compact')
+
+    assert bytes(cipher.decrypt_raw(blob)) == b'\x00compact'
+    assert base64.b64decode(cipher.encrypt(b'x')) != b'x'
+    assert cipher.decrypt_raw_batch([None, blob]) == [None, b'\x00compact']
+
+
+def test_local_backend(app):
+    """The local backend round trips and rejects the wrong key."""
+    cipher = AESCipher(None, backend=LocalBackend('one'), envelope=True)
+    other = AESCipher(None, backend=LocalBackend('two'), envelope=True)
+
+    data = dict(foo='bar', baz=True, quux=7)
+    ciphertext = cipher.encrypt_json(data)
+    assert cipher.decrypt_json(ciphertext) == data
+
+    with pytest.raises(EncryptionException):
+        other.decrypt_json(ciphertext)
+
+
+def test_fake_kms_backend(app):
+    """The fake KMS backend is only called for data keys in envelope mode."""
+    backend = FakeKmsBackend('one', latency=0)
+    cipher = AESCipher(None, backend=backend, envelope=True)
+
+    ciphertexts = [cipher.encrypt(PLAINTEXT) for _ in range(10)]
+    cipher.decrypt_json_batch([])
+    for ciphertext in ciphertexts:
+        cipher.decrypt(ciphertext)
+
+    assert backend.calls == 1
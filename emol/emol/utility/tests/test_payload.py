@@ -0,0 +1,61 @@
+"""Unit tests for the compact payload format."""
+import json
+from datetime import date
+
+import pytest
+
+from emol.utility.payload import (pack_record, pack_sections, unpack_record,
+                                  unpack_sections)
+
+FIELDS = ('name', 'dob', 'expiry', 'number', 'note', 'flags')
+
+
+def test_record_round_trip():
+    """Values come back with the same types."""
+    record = dict(
+        name='Frédéric',
+        dob='1990-01-31',
+        expiry=date(2030, 1, 1),
+        number=123456,
+        note=None,
+        flags=[True, 'x']
+    )
+    packed = pack_record(record, FIELDS)
+
+    assert unpack_record(packed, FIELDS) == record
+    assert len(packed) < len(json.dumps(record, default=str))
+
+
+def test_record_absent_and_odd_dates():
+    """Absent fields stay absent and only canonical dates are packed."""
+    record = dict(name='1990-1-1', dob='1990-02-30')
+    assert unpack_record(pack_record(record, FIELDS), FIELDS) == record
+
+
+def test_record_unknown_field():
+    """Fields outside the field order are refused rather than dropped."""
+    with pytest.raises(ValueError):
+        pack_record(dict(shoe_size=12), FIELDS)
+
+
+def test_record_malformed():
+    """Truncated or padded records are rejected."""
+    packed = pack_record(dict(name='Fred'), FIELDS)
+
+    with pytest.raises(ValueError):
+        unpack_record(packed[:-1], FIELDS)
+
+    with pytest.raises(ValueError):
+        unpack_record(packed + b'\x00', FIELDS)
+
+
+def test_sections_round_trip():
+    """Sections survive packing, including long ones."""
+    sections = {0: b'', 1: b'a' * 300, 4: b'\x00\xff'}
+    version, unpacked = unpack_sections(pack_sections(1, sections))
+
+    assert version == 1
+    assert unpacked == sections
+
+    with pytest.raises(ValueError):
+        unpack_sections(pack_sections(1, sections)[:-1])
@@ -0,0 +1,40 @@
+"""Unit tests for the rendered page caches."""
+import pytest
+
+from emol.utility.render_cache import make_render_cache
+
+
+@pytest.fixture(params=['memory', 'filesystem'])
+def render_cache(request, tmpdir):
+    """Each render cache backend."""
+    yield make_render_cache(request.param, size=2, directory=str(tmpdir))
+
+
+def test_versioned_get(render_cache):
+    """Pages are only returned at the version they were cached at."""
+    render_cache.set('fred', 3, '<p>Fred</p>\n<p>McFred</p>')
+
+    assert render_cache.get('fred', 3) == '<p>Fred</p>\n<p>McFred</p>'
+    assert render_cache.get('fred', 4) is None
+    assert render_cache.get('barney', 3) is None
+
+
+def test_invalidate(render_cache):
+    """Invalidated and cleared pages are gone."""
+    render_cache.set('fred', 1, 'Fred')
+    render_cache.set('barney', 1, 'Barney')
+
+    render_cache.invalidate('fred')
+    assert render_cache.get('fred', 1) is None
+    assert render_cache.get('barney', 1) == 'Barney'
+
+    render_cache.invalidate('wilma')
+
+    render_cache.clear()
+    assert render_cache.get('barney', 1) is None
+
+
+def test_unknown_backend():
+    """Unknown backends are refused."""
+    with pytest.raises(ValueError):
+        make_render_cache('punch-cards')
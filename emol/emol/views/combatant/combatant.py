@@ -2,21 +2,57 @@
 """Combatant self-serve views."""
 
 # standard library imports
+import hashlib
 import uuid
 from datetime import datetime
 
 # third-party imports
-from flask import Blueprint, render_template, current_app
+from flask import (Blueprint, render_template, current_app, make_response,
+                   request)
 from flask_login import current_user
 
 # application imports
-from emol.models import Combatant, Discipline, UpdateRequest
+from emol.models import CardView, Combatant, UpdateRequest
 from emol.models.faux_user import FauxUserSwitch
 from emol.utility.hash import Sha256
 
 BLUEPRINT = Blueprint('combatant', __name__)
 
 
+def _card_not_found(card_id):
+    """The message view for an unknown card ID."""
+    current_app.logger.error(
+        'No combatant record for card ID: {}'.format(card_id)
+    )
+    return render_template(
+        'message/message.html',
+        message='Could not find the specified combatant'
+    )
+
+
+def _card_etag(card_id, version):
+    """Strong ETag for a card at a card version."""
+    return hashlib.sha1(
+        '{0}:{1}'.format(card_id, version).encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag, updated):
+    """Check if a conditional request can be answered with 304.
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 7232.
+
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    since = request.if_modified_since
+    if since is None or updated is None:
+        return False
+
+    # HTTP dates have one second resolution
+    return updated.replace(microsecond=0) <= since.replace(tzinfo=None)
+
+
 @BLUEPRINT.route('/card/<card_id>', methods=['GET'])
 def view_card(card_id):
     """Handle requests to view a combatant's card.
@@ -24,28 +60,52 @@ def view_card(card_id):
     Args:
         card_id: A combatant card ID
 
+    The rendered card is cached in current_app.card_cache under the
+    combatant's card_version, see Combatant.card_changed.
+
+    Responses carry a strong ETag derived from the card version, and
+    Last-Modified from the time the card last changed, so that conditional
+    requests for an unchanged card get a 304 without rendering. Browsers may
+    reuse a card for CARD_MAX_AGE seconds before checking back.
+
     Returns:
         - The message view if the card ID is invalid
         - The combatant's card if the card ID is valid
+        - 304 if the card is unchanged since the client last fetched it
 
     """
     current_app.logger.info('Card for {}'.format(card_id))
-    combatant = Combatant.query.filter(Combatant.card_id == card_id).one_or_none()
-    if combatant is None:
-        current_app.logger.error(
-            'No combatant record for card ID: {}'.format(card_id)
-        )
-        return render_template(
-            'message/message.html',
-            message='Could not find the specified combatant'
-        )
-
-    return render_template(
-        'combatant/card.html',
-        success=True,
-        disciplines=Discipline.query.all(),
-        combatant=combatant
-    )
+    state = Combatant.card_state(card_id)
+    if state is None:
+        return _card_not_found(card_id)
+
+    version, updated = state
+    etag = _card_etag(card_id, version)
+    if _not_modified(etag, updated):
+        response = current_app.response_class(status=304)
+    else:
+        page = current_app.card_cache.get(card_id, version)
+        if page is None:
+            card_view = CardView.load(card_id)
+            if card_view is None:
+                return _card_not_found(card_id)
+
+            page = render_template(
+                'combatant/card.html',
+                success=True,
+                card_view=card_view
+            )
+            current_app.card_cache.set(card_id, version, page)
+
+        response = make_response(page)
+
+    response.set_etag(etag)
+    if updated is not None:
+        response.last_modified = updated
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config.get(
+        'CARD_MAX_AGE', 300)
+    return response
 
 
 @BLUEPRINT.route('/update/<token>', methods=['GET'])
@@ -55,7 +55,7 @@ def combatant_detail(uuid):
         'combatant/combatant_detail.html',
         combatant=combatant,
         user=current_user,
-        disciplines=Discipline.query.all(),
+        disciplines=Discipline.template_list(),
         # TODO: Take these out when testing is done
         test_card_reminder=add_years(date.today(), -2, 31),
         test_card_expiry=add_years(date.today(), -2, 1),
@@ -0,0 +1,99 @@
+import pytest
+
+from emol.models import Authorization, CardView, Discipline
+from emol.utility.testing import QueryCounter
+
+# Queries CardView.load may run, however many cards and authorizations
+CARD_QUERY_CEILING = 8
+
+
+@pytest.fixture
+def carded_combatant(app, combatant, admin_user):
+    """The combatant fixture with a card ID and a full set of cards."""
+    combatant.card_id = 'card-view-test'
+    for discipline in Discipline.query.all():
+        card = combatant.get_card(discipline, create=True)
+        card.authorizations.extend(discipline.authorizations)
+        card.warrants.extend(discipline.marshals)
+    app.db.session.commit()
+
+    yield combatant
+
+
+def test_card_view(app, carded_combatant):
+    """The card view model reflects the combatant's cards."""
+    rapier = Discipline.find('rapier')
+    card = carded_combatant.get_card(rapier)
+    card.authorizations.remove(Authorization.find(rapier, 'two-weapon'))
+    app.db.session.commit()
+
+    card_view = CardView.load('card-view-test')
+    section = [s for s in card_view.sections if s.slug == 'rapier'][0]
+    held = dict((a.name, a.held) for a in section.authorizations)
+
+    assert card_view.legal_name == carded_combatant.decrypted['legal_name']
+    assert held['Two Weapon'] is False
+    assert held['Heavy Rapier'] is True
+    assert all(m.held for m in section.marshals)
+
+    assert CardView.load('no-such-card') is None
+
+
+def test_card_page_query_ceiling(app, carded_combatant):
+    """Rendering a card runs a fixed, small number of queries."""
+    app.db.session.expire_all()
+    client = app.test_client()
+
+    with QueryCounter(app.db.engine) as counter:
+        response = client.get('/card/card-view-test')
+
+    assert response.status_code == 200
+    assert 'Heavy Rapier' in response.data.decode()
+    assert counter.count <= CARD_QUERY_CEILING, counter.statements
+
+
+def test_card_page_cache(app, carded_combatant):
+    """Card pages are cached until something on the card changes."""
+    client = app.test_client()
+    client.get('/card/card-view-test')
+
+    with QueryCounter(app.db.engine) as counter:
+        response = client.get('/card/card-view-test')
+    assert 'Heavy Rapier' in response.data.decode()
+    assert counter.count == 1
+
+    version = carded_combatant.card_version
+    card = carded_combatant.get_card('rapier')
+    card.remove_authorization('heavy-rapier')
+    assert carded_combatant.card_version > version
+
+    response = client.get('/card/card-view-test')
+    assert response.data.decode().count('fa-close') >= 1
+    assert app.card_cache.get('card-view-test', version) is None
+
+
+def test_card_page_conditional(app, carded_combatant):
+    """Unchanged cards are answered with 304."""
+    client = app.test_client()
+    response = client.get('/card/card-view-test')
+    etag = response.headers['ETag']
+    last_modified = response.headers['Last-Modified']
+
+    assert 'private' in response.headers['Cache-Control']
+    assert 'max-age' in response.headers['Cache-Control']
+
+    response = client.get(
+        '/card/card-view-test', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+    response = client.get(
+        '/card/card-view-test', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    carded_combatant.get_card('rapier').renew()
+
+    response = client.get(
+        '/card/card-view-test', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
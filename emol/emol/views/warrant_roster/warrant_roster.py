@@ -52,23 +52,27 @@ def create_warrant_roster():
 
         marshal_info = []
 
+        warrants = []
         for marshal in discipline.marshals:
-            warrants = Warrant.query.filter(
+            warrants.extend(Warrant.query.filter(
                 Warrant.marshal_id == marshal.id
-            ).all()
+            ).all())
 
-            for warrant in warrants:
-                combatant = warrant.card.combatant
-                print(combatant)
-                marshal_info.append(MarshalInfo(
-                    sca_name=combatant.sca_name,
-                    legal_name=combatant.decrypted.get('legal_name'),
-                    address=combatant.one_line_address,
-                    email=combatant.email,
-                    phone=combatant.decrypted.get('phone'),
-                    member_number=combatant.decrypted.get('member_number'),
-                    member_expiry=combatant.decrypted.get('member_expiry')
-                ))
+        # Decrypt the whole roster in one pass
+        combatants = Combatant.decrypt_many(
+            warrant.card.combatant for warrant in warrants
+        )
+
+        for combatant in combatants:
+            marshal_info.append(MarshalInfo(
+                sca_name=combatant.sca_name,
+                legal_name=combatant.decrypted.get('legal_name'),
+                address=combatant.one_line_address,
+                email=combatant.email,
+                phone=combatant.decrypted.get('phone'),
+                member_number=combatant.decrypted.get('member_number'),
+                member_expiry=combatant.decrypted.get('member_expiry')
+            ))
 
         # return things discretely so that people messing with the template
         # don't need to work with objects and properties
@@ -42,6 +42,9 @@ SECRET_KEY = '123456'
 AUTHOMATIC_SECRET = 'top.secret.'
 # This one is used by eMoL
 HASH_SALT = 'mmmm, salty'
+# This one keys the blind indexes used to look up encrypted fields.
+# If you change it, run flask backfill_blind_index
+BLIND_INDEX_KEY = 'something else long'
 
 ##################################################################
 # AWS credential info.
@@ -63,8 +66,58 @@ AWS_SECRET_KEY = '<some secret key>'
 ##################################################################
 # Encryption key, stored in Amazon KMS
 ##################################################################
+# Key management backend: kms, local or fake-kms. The local backends
+# keep the master key in this file and are for development only.
+EMOL_CIPHER_BACKEND = 'kms'
+# Master key secret for the local and fake-kms backends
+# EMOL_LOCAL_KEY = '<some long secret>'
+# Simulated round trip time in milliseconds for fake-kms
+# EMOL_FAKE_KMS_LATENCY = 20
 # ARN of a KMS key to use for encryption of data
 EMOL_KMS_KEY = 'arn:aws:kms:...'
+# Encrypt records locally under a KMS-generated data key instead of
+# calling KMS for every record. Existing records stay readable either way.
+EMOL_ENVELOPE_ENCRYPTION = True
+# Seconds an unwrapped data key may be held in memory
+EMOL_DATA_KEY_TTL = 300
+# Number of records that may be encrypted under one data key
+EMOL_DATA_KEY_MAX_USES = 100000
+# Encrypt combatant personal information in separate field groups so
+# that reading one field doesn't decrypt them all. Existing records are
+# converted as they are saved, or all at once with
+# flask migrate_encryption_layout
+EMOL_FIELD_ENCRYPTION = False
+# Store combatant personal information as a compact binary payload rather
+# than base64 encoded JSON. Existing records are converted the same way.
+EMOL_COMPACT_PAYLOAD = False
+# Number of decrypted combatant records kept in memory (0 disables)
+DECRYPTED_CACHE_SIZE = 1024
+# Seconds a decrypted combatant record may stay in memory
+DECRYPTED_CACHE_TTL = 300
+
+##################################################################
+# Caching
+##################################################################
+# Where rendered card pages are cached: memory (per process),
+# filesystem (shared by processes on one host) or none
+CARD_CACHE_BACKEND = 'memory'
+# Number of card pages the memory backend holds
+CARD_CACHE_SIZE = 1000
+# Directory for the filesystem backend, defaults to card_cache in the
+# instance folder
+# CARD_CACHE_DIR = '/var/cache/emol/cards'
+# Seconds a browser may reuse a card page before checking for changes
+# (Cache-Control: private, max-age)
+CARD_MAX_AGE = 300
+# Seconds between checks for config items changed by other processes
+CONFIG_CHECK_INTERVAL = 10
+# Seconds between checks for changes to disciplines, authorizations,
+# marshals and roles made by other processes
+REFERENCE_DATA_CHECK_INTERVAL = 30
+# Number of logged in users (with their roles) cached per process, 0 to
+# disable, and the seconds each may stay cached
+USER_CACHE_SIZE = 256
+USER_CACHE_TTL = 60
 
 ##################################################################
 # Mail settings
@@ -82,4 +135,45 @@ MAIL_DEFAULT_SENDER = 'eMoL <emol@example.com>'
 # True if your mail server requires SSL
 MAIL_USE_SSL = True/False
 # True if your mail server requires TLS
-MAIL_USE_TLS = True/False
\ No newline at end of file
+MAIL_USE_TLS = True/False
+# Number of idle SMTP connections kept open per process, messages sent on
+# a connection before it is replaced, and seconds a connection may sit
+# idle before it is checked
+MAIL_POOL_SIZE = 2
+MAIL_MAX_MESSAGES = 100
+MAIL_KEEPALIVE = 30
+# Number of threads delivering a batch of email (the daily check, the
+# send_mail worker) in parallel, 1 to send one at a time
+MAIL_CONCURRENCY = 4
+# Most connections open to the mail server at once, and most messages sent
+# to it per second (None for no limit). Set these to what your mail server
+# allows so that it doesn't throttle eMoL
+MAIL_HOST_CONCURRENCY = 4
+MAIL_RATE = None
+# Queue email in the database instead of sending it during the request.
+# Queued email is sent by "flask send_mail", which must be kept running
+# (or run from cron with --once) when this is True
+MAIL_OUTBOX = False
+# Seconds the send_mail command holds a batch of queued email before
+# another run may claim it. Raised automatically to twice the time
+# MAIL_RATE allows for sending a batch
+MAIL_LEASE = 300
+# Seconds before the first retry of a message that failed to send. The
+# delay doubles with each failure up to MAIL_RETRY_MAX_DELAY, and the
+# message is given up on after MAIL_MAX_ATTEMPTS failures
+MAIL_RETRY_DELAY = 60
+MAIL_RETRY_MAX_DELAY = 3600
+MAIL_MAX_ATTEMPTS = 8
+
+##################################################################
+# Reminder settings
+##################################################################
+# How card and waiver expiry reminders are scheduled: 'stored' keeps a row
+# per reminder, written when a card or waiver is renewed; 'computed' works
+# out due reminders from card and waiver dates in the daily check, and
+# keeps a small record of reminders sent. Rows stored before switching to
+# 'computed' are ignored.
+REMINDER_SCHEDULE = 'stored'
+# With the computed schedule, days after expiry that an expiry notice is
+# still sent if the daily check didn't run on the day
+REMINDER_CATCH_UP_DAYS = 7